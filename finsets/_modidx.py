@@ -5,11 +5,19 @@ d = { 'settings': { 'branch': 'main',
                 'doc_host': 'https://ionmihai.github.io',
                 'git_url': 'https://github.com/ionmihai/finsets',
                 'lib_path': 'finsets'},
-  'syms': { 'finsets.cli': {'finsets.cli.search': ('cli.html#search', 'finsets/cli.py')},
+  'syms': { 'finsets.cache_tools': { 'finsets.cache_tools.cache_path': ('cache_tools.html#cache_path', 'finsets/cache_tools.py'),
+                                     'finsets.cache_tools.clear_cache': ('cache_tools.html#clear_cache', 'finsets/cache_tools.py'),
+                                     'finsets.cache_tools.is_fresh': ('cache_tools.html#is_fresh', 'finsets/cache_tools.py')},
+            'finsets.cli': {'finsets.cli.search': ('cli.html#search', 'finsets/cli.py')},
+            'finsets.feature_graph': { 'finsets.feature_graph.compute': ('feature_graph.html#compute', 'finsets/feature_graph.py'),
+                                       'finsets.feature_graph.raw_inputs': ('feature_graph.html#raw_inputs', 'finsets/feature_graph.py'),
+                                       'finsets.feature_graph.resolve': ('feature_graph.html#resolve', 'finsets/feature_graph.py')},
             'finsets.fetch_tools': { 'finsets.fetch_tools.get_text_file_from_url': ( 'fetch_tools.html#get_text_file_from_url',
                                                                                      'finsets/fetch_tools.py')},
-            'finsets.fred.fred': { 'finsets.fred.fred.default_raw_vars': ('00_fred/fred.html#default_raw_vars', 'finsets/fred/fred.py'),
+            'finsets.fred.fred': { 'finsets.fred.fred._replace': ('00_fred/fred.html#_replace', 'finsets/fred/fred.py'),
+                                   'finsets.fred.fred.default_raw_vars': ('00_fred/fred.html#default_raw_vars', 'finsets/fred/fred.py'),
                                    'finsets.fred.fred.get_raw_data': ('00_fred/fred.html#get_raw_data', 'finsets/fred/fred.py'),
+                                   'finsets.fred.fred.get_series': ('00_fred/fred.html#get_series', 'finsets/fred/fred.py'),
                                    'finsets.fred.fred.get_series_info': ('00_fred/fred.html#get_series_info', 'finsets/fred/fred.py'),
                                    'finsets.fred.fred.parse_varlist': ('00_fred/fred.html#parse_varlist', 'finsets/fred/fred.py'),
                                    'finsets.fred.fred.process_raw_data': ('00_fred/fred.html#process_raw_data', 'finsets/fred/fred.py'),
@@ -19,10 +27,16 @@ d = { 'settings': { 'branch': 'main',
                                                                                           'finsets/fred/fred_api.py'),
                                        'finsets.fred.fred_api.Fred.__fetch_data': ( '00_fred/fred_api.html#fred.__fetch_data',
                                                                                     'finsets/fred/fred_api.py'),
+                                       'finsets.fred.fred_api.Fred.__fetch_json': ( '00_fred/fred_api.html#fred.__fetch_json',
+                                                                                    'finsets/fred/fred_api.py'),
                                        'finsets.fred.fred_api.Fred.__get_search_results': ( '00_fred/fred_api.html#fred.__get_search_results',
                                                                                             'finsets/fred/fred_api.py'),
                                        'finsets.fred.fred_api.Fred.__init__': ( '00_fred/fred_api.html#fred.__init__',
                                                                                 'finsets/fred/fred_api.py'),
+                                       'finsets.fred.fred_api.Fred.__observations': ( '00_fred/fred_api.html#fred.__observations',
+                                                                                      'finsets/fred/fred_api.py'),
+                                       'finsets.fred.fred_api.Fred.__request': ( '00_fred/fred_api.html#fred.__request',
+                                                                                 'finsets/fred/fred_api.py'),
                                        'finsets.fred.fred_api.Fred._parse': ( '00_fred/fred_api.html#fred._parse',
                                                                               'finsets/fred/fred_api.py'),
                                        'finsets.fred.fred_api.Fred.get_series': ( '00_fred/fred_api.html#fred.get_series',
@@ -44,7 +58,48 @@ d = { 'settings': { 'branch': 'main',
                                        'finsets.fred.fred_api.Fred.search_by_category': ( '00_fred/fred_api.html#fred.search_by_category',
                                                                                           'finsets/fred/fred_api.py'),
                                        'finsets.fred.fred_api.Fred.search_by_release': ( '00_fred/fred_api.html#fred.search_by_release',
-                                                                                         'finsets/fred/fred_api.py')},
+                                                                                         'finsets/fred/fred_api.py'),
+                                       'finsets.fred.fred_api.RateLimiter': ( '00_fred/fred_api.html#ratelimiter',
+                                                                              'finsets/fred/fred_api.py'),
+                                       'finsets.fred.fred_api.RateLimiter.__init__': ( '00_fred/fred_api.html#ratelimiter.__init__',
+                                                                                       'finsets/fred/fred_api.py'),
+                                       'finsets.fred.fred_api.RateLimiter.acquire': ( '00_fred/fred_api.html#ratelimiter.acquire',
+                                                                                      'finsets/fred/fred_api.py')},
+            'finsets.fred.vintages': { 'finsets.fred.vintages.Vintages': ('00_fred/vintages.html#vintages', 'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages.Vintages.__init__': ( '00_fred/vintages.html#vintages.__init__',
+                                                                                    'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages.Vintages._series': ( '00_fred/vintages.html#vintages._series',
+                                                                                   'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages.Vintages.as_of': ( '00_fred/vintages.html#vintages.as_of',
+                                                                                 'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages.Vintages.first_release': ( '00_fred/vintages.html#vintages.first_release',
+                                                                                         'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages.Vintages.latest': ( '00_fred/vintages.html#vintages.latest',
+                                                                                  'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages.Vintages.revision_matrix': ( '00_fred/vintages.html#vintages.revision_matrix',
+                                                                                           'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages.Vintages.vintage_dates': ( '00_fred/vintages.html#vintages.vintage_dates',
+                                                                                         'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages._as_of_vintage': ( '00_fred/vintages.html#_as_of_vintage',
+                                                                                 'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages._days': ('00_fred/vintages.html#_days', 'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages._download': ('00_fred/vintages.html#_download', 'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages._merge': ('00_fred/vintages.html#_merge', 'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages._replace': ('00_fred/vintages.html#_replace', 'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages._write_meta': ( '00_fred/vintages.html#_write_meta',
+                                                                              'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages.load': ('00_fred/vintages.html#load', 'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages.point_in_time_panel': ( '00_fred/vintages.html#point_in_time_panel',
+                                                                                      'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages.read_meta': ('00_fred/vintages.html#read_meta', 'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages.store_path': ('00_fred/vintages.html#store_path', 'finsets/fred/vintages.py'),
+                                       'finsets.fred.vintages.update': ('00_fred/vintages.html#update', 'finsets/fred/vintages.py')},
+            'finsets.panel': { 'finsets.panel._first_needed': ('panel.html#_first_needed', 'finsets/panel.py'),
+                               'finsets.panel._name': ('panel.html#_name', 'finsets/panel.py'),
+                               'finsets.panel._pandas_freq': ('panel.html#_pandas_freq', 'finsets/panel.py'),
+                               'finsets.panel.align': ('panel.html#align', 'finsets/panel.py'),
+                               'finsets.panel.build': ('panel.html#build', 'finsets/panel.py'),
+                               'finsets.panel.plan': ('panel.html#plan', 'finsets/panel.py')},
             'finsets.papers.dickerson_etal_2023': { 'finsets.papers.dickerson_etal_2023.get_raw_data': ( '02_papers/dickerson_etal_2023.html#get_raw_data',
                                                                                                          'finsets/papers/dickerson_etal_2023.py'),
                                                     'finsets.papers.dickerson_etal_2023.process_raw_data': ( '02_papers/dickerson_etal_2023.html#process_raw_data',
@@ -77,8 +132,28 @@ d = { 'settings': { 'branch': 'main',
                                                                                                        'finsets/papers/peters_taylor_2016.py'),
                                                    'finsets.papers.peters_taylor_2016.list_all_vars': ( '02_papers/peters_taylor_2016.html#list_all_vars',
                                                                                                         'finsets/papers/peters_taylor_2016.py'),
+                                                   'finsets.papers.peters_taylor_2016.polars_features': ( '02_papers/peters_taylor_2016.html#polars_features',
+                                                                                                          'finsets/papers/peters_taylor_2016.py'),
                                                    'finsets.papers.peters_taylor_2016.process_raw_data': ( '02_papers/peters_taylor_2016.html#process_raw_data',
                                                                                                            'finsets/papers/peters_taylor_2016.py')},
+            'finsets.polars_tools': { 'finsets.polars_tools.Panel': ('polars_tools.html#panel', 'finsets/polars_tools.py'),
+                                      'finsets.polars_tools.Panel.__init__': ( 'polars_tools.html#panel.__init__',
+                                                                               'finsets/polars_tools.py'),
+                                      'finsets.polars_tools.Panel._periods_back': ( 'polars_tools.html#panel._periods_back',
+                                                                                    'finsets/polars_tools.py'),
+                                      'finsets.polars_tools.Panel.lag': ('polars_tools.html#panel.lag', 'finsets/polars_tools.py'),
+                                      'finsets.polars_tools.Panel.rdiff': ('polars_tools.html#panel.rdiff', 'finsets/polars_tools.py'),
+                                      'finsets.polars_tools.Panel.rpct_change': ( 'polars_tools.html#panel.rpct_change',
+                                                                                  'finsets/polars_tools.py'),
+                                      'finsets.polars_tools.Panel.rrolling': ( 'polars_tools.html#panel.rrolling',
+                                                                               'finsets/polars_tools.py'),
+                                      'finsets.polars_tools.compute': ('polars_tools.html#compute', 'finsets/polars_tools.py'),
+                                      'finsets.polars_tools.from_pandas': ('polars_tools.html#from_pandas', 'finsets/polars_tools.py'),
+                                      'finsets.polars_tools.missing_as_null': ( 'polars_tools.html#missing_as_null',
+                                                                                'finsets/polars_tools.py'),
+                                      'finsets.polars_tools.require_polars': ( 'polars_tools.html#require_polars',
+                                                                               'finsets/polars_tools.py'),
+                                      'finsets.polars_tools.to_pandas': ('polars_tools.html#to_pandas', 'finsets/polars_tools.py')},
             'finsets.wrds.bondret': { 'finsets.wrds.bondret.get_raw_data': ('01_wrds/bondret.html#get_raw_data', 'finsets/wrds/bondret.py'),
                                       'finsets.wrds.bondret.list_all_vars': ( '01_wrds/bondret.html#list_all_vars',
                                                                               'finsets/wrds/bondret.py'),
@@ -86,11 +161,18 @@ d = { 'settings': { 'branch': 'main',
                                                                               'finsets/wrds/bondret.py'),
                                       'finsets.wrds.bondret.process_raw_data': ( '01_wrds/bondret.html#process_raw_data',
                                                                                  'finsets/wrds/bondret.py')},
-            'finsets.wrds.compa': { 'finsets.wrds.compa.default_raw_vars': ('01_wrds/compa.html#default_raw_vars', 'finsets/wrds/compa.py'),
+            'finsets.wrds.compa': { 'finsets.wrds.compa._polars_exprs': ('01_wrds/compa.html#_polars_exprs', 'finsets/wrds/compa.py'),
+                                    'finsets.wrds.compa._pref_stock': ('01_wrds/compa.html#_pref_stock', 'finsets/wrds/compa.py'),
+                                    'finsets.wrds.compa._shreq': ('01_wrds/compa.html#_shreq', 'finsets/wrds/compa.py'),
+                                    'finsets.wrds.compa._sql_feature': ('01_wrds/compa.html#_sql_feature', 'finsets/wrds/compa.py'),
+                                    'finsets.wrds.compa._sql_features_query': ( '01_wrds/compa.html#_sql_features_query',
+                                                                                'finsets/wrds/compa.py'),
+                                    'finsets.wrds.compa.default_raw_vars': ('01_wrds/compa.html#default_raw_vars', 'finsets/wrds/compa.py'),
                                     'finsets.wrds.compa.features': ('01_wrds/compa.html#features', 'finsets/wrds/compa.py'),
                                     'finsets.wrds.compa.get_raw_data': ('01_wrds/compa.html#get_raw_data', 'finsets/wrds/compa.py'),
                                     'finsets.wrds.compa.list_all_vars': ('01_wrds/compa.html#list_all_vars', 'finsets/wrds/compa.py'),
                                     'finsets.wrds.compa.parse_varlist': ('01_wrds/compa.html#parse_varlist', 'finsets/wrds/compa.py'),
+                                    'finsets.wrds.compa.polars_features': ('01_wrds/compa.html#polars_features', 'finsets/wrds/compa.py'),
                                     'finsets.wrds.compa.process_raw_data': ( '01_wrds/compa.html#process_raw_data',
                                                                              'finsets/wrds/compa.py')},
             'finsets.wrds.compa_ccm': { 'finsets.wrds.compa_ccm.default_raw_vars': ( '01_wrds/compa_ccm.html#default_raw_vars',
@@ -104,11 +186,17 @@ d = { 'settings': { 'branch': 'main',
                                                                                   'finsets/wrds/compa_ccm.py'),
                                         'finsets.wrds.compa_ccm.process_raw_data': ( '01_wrds/compa_ccm.html#process_raw_data',
                                                                                      'finsets/wrds/compa_ccm.py')},
-            'finsets.wrds.compq': { 'finsets.wrds.compq.default_raw_vars': ('01_wrds/compq.html#default_raw_vars', 'finsets/wrds/compq.py'),
+            'finsets.wrds.compq': { 'finsets.wrds.compq._polars_exprs': ('01_wrds/compq.html#_polars_exprs', 'finsets/wrds/compq.py'),
+                                    'finsets.wrds.compq._shreq': ('01_wrds/compq.html#_shreq', 'finsets/wrds/compq.py'),
+                                    'finsets.wrds.compq.default_raw_vars': ('01_wrds/compq.html#default_raw_vars', 'finsets/wrds/compq.py'),
                                     'finsets.wrds.compq.features': ('01_wrds/compq.html#features', 'finsets/wrds/compq.py'),
+                                    'finsets.wrds.compq.fiscal_dates': ('01_wrds/compq.html#fiscal_dates', 'finsets/wrds/compq.py'),
                                     'finsets.wrds.compq.get_raw_data': ('01_wrds/compq.html#get_raw_data', 'finsets/wrds/compq.py'),
                                     'finsets.wrds.compq.list_all_vars': ('01_wrds/compq.html#list_all_vars', 'finsets/wrds/compq.py'),
                                     'finsets.wrds.compq.parse_varlist': ('01_wrds/compq.html#parse_varlist', 'finsets/wrds/compq.py'),
+                                    'finsets.wrds.compq.polars_features': ('01_wrds/compq.html#polars_features', 'finsets/wrds/compq.py'),
+                                    'finsets.wrds.compq.polars_ytd_to_quarterly': ( '01_wrds/compq.html#polars_ytd_to_quarterly',
+                                                                                    'finsets/wrds/compq.py'),
                                     'finsets.wrds.compq.process_raw_data': ('01_wrds/compq.html#process_raw_data', 'finsets/wrds/compq.py'),
                                     'finsets.wrds.compq.ytd_to_quarterly': ( '01_wrds/compq.html#ytd_to_quarterly',
                                                                              'finsets/wrds/compq.py')},
@@ -125,22 +213,43 @@ d = { 'settings': { 'branch': 'main',
                                                                                      'finsets/wrds/compq_ccm.py'),
                                         'finsets.wrds.compq_ccm.ytd_to_quarterly': ( '01_wrds/compq_ccm.html#ytd_to_quarterly',
                                                                                      'finsets/wrds/compq_ccm.py')},
-            'finsets.wrds.crspd': { 'finsets.wrds.crspd.default_raw_vars': ('01_wrds/crspd.html#default_raw_vars', 'finsets/wrds/crspd.py'),
+            'finsets.wrds.crspd': { 'finsets.wrds.crspd._dense_positions': ('01_wrds/crspd.html#_dense_positions', 'finsets/wrds/crspd.py'),
+                                    'finsets.wrds.crspd._rolling_max': ('01_wrds/crspd.html#_rolling_max', 'finsets/wrds/crspd.py'),
+                                    'finsets.wrds.crspd._window_sum': ('01_wrds/crspd.html#_window_sum', 'finsets/wrds/crspd.py'),
+                                    'finsets.wrds.crspd.default_raw_vars': ('01_wrds/crspd.html#default_raw_vars', 'finsets/wrds/crspd.py'),
                                     'finsets.wrds.crspd.delist_adj_ret': ('01_wrds/crspd.html#delist_adj_ret', 'finsets/wrds/crspd.py'),
                                     'finsets.wrds.crspd.features': ('01_wrds/crspd.html#features', 'finsets/wrds/crspd.py'),
                                     'finsets.wrds.crspd.get_raw_data': ('01_wrds/crspd.html#get_raw_data', 'finsets/wrds/crspd.py'),
                                     'finsets.wrds.crspd.list_all_vars': ('01_wrds/crspd.html#list_all_vars', 'finsets/wrds/crspd.py'),
                                     'finsets.wrds.crspd.parse_varlist': ('01_wrds/crspd.html#parse_varlist', 'finsets/wrds/crspd.py'),
-                                    'finsets.wrds.crspd.process_raw_data': ( '01_wrds/crspd.html#process_raw_data',
+                                    'finsets.wrds.crspd.process_raw_data': ('01_wrds/crspd.html#process_raw_data', 'finsets/wrds/crspd.py'),
+                                    'finsets.wrds.crspd.rolling_features': ( '01_wrds/crspd.html#rolling_features',
                                                                              'finsets/wrds/crspd.py')},
-            'finsets.wrds.crspm': { 'finsets.wrds.crspm.default_raw_vars': ('01_wrds/crspm.html#default_raw_vars', 'finsets/wrds/crspm.py'),
+            'finsets.wrds.crspm': { 'finsets.wrds.crspm._floats': ('01_wrds/crspm.html#_floats', 'finsets/wrds/crspm.py'),
+                                    'finsets.wrds.crspm.default_raw_vars': ('01_wrds/crspm.html#default_raw_vars', 'finsets/wrds/crspm.py'),
                                     'finsets.wrds.crspm.delist_adj_ret': ('01_wrds/crspm.html#delist_adj_ret', 'finsets/wrds/crspm.py'),
+                                    'finsets.wrds.crspm.delisting_adjustment': ( '01_wrds/crspm.html#delisting_adjustment',
+                                                                                 'finsets/wrds/crspm.py'),
                                     'finsets.wrds.crspm.features': ('01_wrds/crspm.html#features', 'finsets/wrds/crspm.py'),
                                     'finsets.wrds.crspm.get_raw_data': ('01_wrds/crspm.html#get_raw_data', 'finsets/wrds/crspm.py'),
                                     'finsets.wrds.crspm.list_all_vars': ('01_wrds/crspm.html#list_all_vars', 'finsets/wrds/crspm.py'),
                                     'finsets.wrds.crspm.parse_varlist': ('01_wrds/crspm.html#parse_varlist', 'finsets/wrds/crspm.py'),
+                                    'finsets.wrds.crspm.polars_features': ('01_wrds/crspm.html#polars_features', 'finsets/wrds/crspm.py'),
                                     'finsets.wrds.crspm.process_raw_data': ( '01_wrds/crspm.html#process_raw_data',
                                                                              'finsets/wrds/crspm.py')},
+            'finsets.wrds.fixtures': { 'finsets.wrds.fixtures._companies': ('01_wrds/fixtures.html#_companies', 'finsets/wrds/fixtures.py'),
+                                       'finsets.wrds.fixtures._compustat': ('01_wrds/fixtures.html#_compustat', 'finsets/wrds/fixtures.py'),
+                                       'finsets.wrds.fixtures._crsp': ('01_wrds/fixtures.html#_crsp', 'finsets/wrds/fixtures.py'),
+                                       'finsets.wrds.fixtures._ibes_ltg': ('01_wrds/fixtures.html#_ibes_ltg', 'finsets/wrds/fixtures.py'),
+                                       'finsets.wrds.fixtures._links': ('01_wrds/fixtures.html#_links', 'finsets/wrds/fixtures.py'),
+                                       'finsets.wrds.fixtures._month_end': ('01_wrds/fixtures.html#_month_end', 'finsets/wrds/fixtures.py'),
+                                       'finsets.wrds.fixtures._panel': ('01_wrds/fixtures.html#_panel', 'finsets/wrds/fixtures.py'),
+                                       'finsets.wrds.fixtures._values': ('01_wrds/fixtures.html#_values', 'finsets/wrds/fixtures.py'),
+                                       'finsets.wrds.fixtures.benchmark': ('01_wrds/fixtures.html#benchmark', 'finsets/wrds/fixtures.py'),
+                                       'finsets.wrds.fixtures.load_tables': ( '01_wrds/fixtures.html#load_tables',
+                                                                              'finsets/wrds/fixtures.py'),
+                                       'finsets.wrds.fixtures.synthetic_tables': ( '01_wrds/fixtures.html#synthetic_tables',
+                                                                                   'finsets/wrds/fixtures.py')},
             'finsets.wrds.ibes_ltg': { 'finsets.wrds.ibes_ltg.default_raw_vars': ( '01_wrds/ibes_ltg.html#default_raw_vars',
                                                                                    'finsets/wrds/ibes_ltg.py'),
                                        'finsets.wrds.ibes_ltg.get_raw_data': ( '01_wrds/ibes_ltg.html#get_raw_data',
@@ -149,8 +258,16 @@ d = { 'settings': { 'branch': 'main',
                                                                                 'finsets/wrds/ibes_ltg.py'),
                                        'finsets.wrds.ibes_ltg.parse_varlist': ( '01_wrds/ibes_ltg.html#parse_varlist',
                                                                                 'finsets/wrds/ibes_ltg.py')},
-            'finsets.wrds.linking': { 'finsets.wrds.linking.bond_cusip_permno': ( '01_wrds/linking.html#bond_cusip_permno',
+            'finsets.wrds.linking': { 'finsets.wrds.linking._active_links': ( '01_wrds/linking.html#_active_links',
+                                                                              'finsets/wrds/linking.py'),
+                                      'finsets.wrds.linking._days': ('01_wrds/linking.html#_days', 'finsets/wrds/linking.py'),
+                                      'finsets.wrds.linking._link_index': ('01_wrds/linking.html#_link_index', 'finsets/wrds/linking.py'),
+                                      'finsets.wrds.linking._resolve': ('01_wrds/linking.html#_resolve', 'finsets/wrds/linking.py'),
+                                      'finsets.wrds.linking._resolve_all': ('01_wrds/linking.html#_resolve_all', 'finsets/wrds/linking.py'),
+                                      'finsets.wrds.linking.add_permno': ('01_wrds/linking.html#add_permno', 'finsets/wrds/linking.py'),
+                                      'finsets.wrds.linking.bond_cusip_permno': ( '01_wrds/linking.html#bond_cusip_permno',
                                                                                   'finsets/wrds/linking.py'),
+                                      'finsets.wrds.linking.ccm_links': ('01_wrds/linking.html#ccm_links', 'finsets/wrds/linking.py'),
                                       'finsets.wrds.linking.gvkey_permno_a': ( '01_wrds/linking.html#gvkey_permno_a',
                                                                                'finsets/wrds/linking.py'),
                                       'finsets.wrds.linking.gvkey_permno_m': ( '01_wrds/linking.html#gvkey_permno_m',
@@ -158,7 +275,12 @@ d = { 'settings': { 'branch': 'main',
                                       'finsets.wrds.linking.gvkey_permno_q': ( '01_wrds/linking.html#gvkey_permno_q',
                                                                                'finsets/wrds/linking.py'),
                                       'finsets.wrds.linking.ibes_ticker_permno': ( '01_wrds/linking.html#ibes_ticker_permno',
-                                                                                   'finsets/wrds/linking.py')},
+                                                                                   'finsets/wrds/linking.py'),
+                                      'finsets.wrds.linking.link_chunks': ('01_wrds/linking.html#link_chunks', 'finsets/wrds/linking.py'),
+                                      'finsets.wrds.linking.resolve_gvkey': ( '01_wrds/linking.html#resolve_gvkey',
+                                                                              'finsets/wrds/linking.py'),
+                                      'finsets.wrds.linking.resolve_permno': ( '01_wrds/linking.html#resolve_permno',
+                                                                               'finsets/wrds/linking.py')},
             'finsets.wrds.mergent': { 'finsets.wrds.mergent.default_raw_vars': ( '01_wrds/mergent.html#default_raw_vars',
                                                                                  'finsets/wrds/mergent.py'),
                                       'finsets.wrds.mergent.get_raw_data': ('01_wrds/mergent.html#get_raw_data', 'finsets/wrds/mergent.py'),
@@ -174,7 +296,74 @@ d = { 'settings': { 'branch': 'main',
                                      'finsets.wrds.ratios.list_all_vars': ('01_wrds/ratios.html#list_all_vars', 'finsets/wrds/ratios.py'),
                                      'finsets.wrds.ratios.process_raw_data': ( '01_wrds/ratios.html#process_raw_data',
                                                                                'finsets/wrds/ratios.py')},
+            'finsets.wrds.store': { 'finsets.wrds.store._as_date': ('01_wrds/store.html#_as_date', 'finsets/wrds/store.py'),
+                                    'finsets.wrds.store._fetch': ('01_wrds/store.html#_fetch', 'finsets/wrds/store.py'),
+                                    'finsets.wrds.store._fixed_columns': ('01_wrds/store.html#_fixed_columns', 'finsets/wrds/store.py'),
+                                    'finsets.wrds.store._has_vars': ('01_wrds/store.html#_has_vars', 'finsets/wrds/store.py'),
+                                    'finsets.wrds.store._partition_years': ('01_wrds/store.html#_partition_years', 'finsets/wrds/store.py'),
+                                    'finsets.wrds.store._resolve_vars': ('01_wrds/store.html#_resolve_vars', 'finsets/wrds/store.py'),
+                                    'finsets.wrds.store._write_meta': ('01_wrds/store.html#_write_meta', 'finsets/wrds/store.py'),
+                                    'finsets.wrds.store.dataset_path': ('01_wrds/store.html#dataset_path', 'finsets/wrds/store.py'),
+                                    'finsets.wrds.store.get_raw_data': ('01_wrds/store.html#get_raw_data', 'finsets/wrds/store.py'),
+                                    'finsets.wrds.store.high_water_mark': ('01_wrds/store.html#high_water_mark', 'finsets/wrds/store.py'),
+                                    'finsets.wrds.store.load': ('01_wrds/store.html#load', 'finsets/wrds/store.py'),
+                                    'finsets.wrds.store.read_meta': ('01_wrds/store.html#read_meta', 'finsets/wrds/store.py'),
+                                    'finsets.wrds.store.refresh': ('01_wrds/store.html#refresh', 'finsets/wrds/store.py'),
+                                    'finsets.wrds.store.save': ('01_wrds/store.html#save', 'finsets/wrds/store.py')},
             'finsets.wrds.wrds_api': { 'finsets.wrds.wrds_api.Connection': ('01_wrds/wrds_api.html#connection', 'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.ConnectionPool': ( '01_wrds/wrds_api.html#connectionpool',
+                                                                                 'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.ConnectionPool.__init__': ( '01_wrds/wrds_api.html#connectionpool.__init__',
+                                                                                          'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.ConnectionPool._close': ( '01_wrds/wrds_api.html#connectionpool._close',
+                                                                                        'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.ConnectionPool._is_healthy': ( '01_wrds/wrds_api.html#connectionpool._is_healthy',
+                                                                                             'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.ConnectionPool._pop_idle': ( '01_wrds/wrds_api.html#connectionpool._pop_idle',
+                                                                                           'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.ConnectionPool.acquire': ( '01_wrds/wrds_api.html#connectionpool.acquire',
+                                                                                         'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.ConnectionPool.close_all': ( '01_wrds/wrds_api.html#connectionpool.close_all',
+                                                                                           'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.ConnectionPool.release': ( '01_wrds/wrds_api.html#connectionpool.release',
+                                                                                         'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api._decode_types': ( '01_wrds/wrds_api.html#_decode_types',
+                                                                                'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api._evict_query_results': ( '01_wrds/wrds_api.html#_evict_query_results',
+                                                                                       'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api._pyarrow_dtype': ( '01_wrds/wrds_api.html#_pyarrow_dtype',
+                                                                                 'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api._raw_sql': ('01_wrds/wrds_api.html#_raw_sql', 'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api._read_copy': ('01_wrds/wrds_api.html#_read_copy', 'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api._types_mapper': ( '01_wrds/wrds_api.html#_types_mapper',
+                                                                                'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.apply_dtypes': ( '01_wrds/wrds_api.html#apply_dtypes',
+                                                                               'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.backend_like': ( '01_wrds/wrds_api.html#backend_like',
+                                                                               'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.cached_query': ( '01_wrds/wrds_api.html#cached_query',
+                                                                               'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.categorical': ( '01_wrds/wrds_api.html#categorical',
+                                                                              'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.clear_query_cache': ( '01_wrds/wrds_api.html#clear_query_cache',
+                                                                                    'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.clear_schema_cache': ( '01_wrds/wrds_api.html#clear_schema_cache',
+                                                                                     'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.concat': ('01_wrds/wrds_api.html#concat', 'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.connection': ('01_wrds/wrds_api.html#connection', 'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.copy_query': ('01_wrds/wrds_api.html#copy_query', 'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.date_shards': ( '01_wrds/wrds_api.html#date_shards',
+                                                                              'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.describe_table': ( '01_wrds/wrds_api.html#describe_table',
+                                                                                 'finsets/wrds/wrds_api.py'),
                                        'finsets.wrds.wrds_api.download': ('01_wrds/wrds_api.html#download', 'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.download_sharded': ( '01_wrds/wrds_api.html#download_sharded',
+                                                                                   'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.dtype_plan': ('01_wrds/wrds_api.html#dtype_plan', 'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.pyarrow_backed': ( '01_wrds/wrds_api.html#pyarrow_backed',
+                                                                                 'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.query_key': ('01_wrds/wrds_api.html#query_key', 'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.stream': ('01_wrds/wrds_api.html#stream', 'finsets/wrds/wrds_api.py'),
+                                       'finsets.wrds.wrds_api.to_arrow': ('01_wrds/wrds_api.html#to_arrow', 'finsets/wrds/wrds_api.py'),
                                        'finsets.wrds.wrds_api.validate_dates': ( '01_wrds/wrds_api.html#validate_dates',
                                                                                  'finsets/wrds/wrds_api.py')}}}
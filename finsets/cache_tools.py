@@ -0,0 +1,42 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/cache_tools.ipynb.
+
+# %% ../nbs/cache_tools.ipynb 3
+from __future__ import annotations
+import os
+import time
+import shutil
+from pathlib import Path
+
+# %% auto 0
+__all__ = ['CACHE_DIR', 'cache_path', 'is_fresh', 'clear_cache']
+
+# %% ../nbs/cache_tools.ipynb 5
+CACHE_DIR = Path(os.getenv('FINSETS_CACHE_DIR', Path.home() / '.cache' / 'finsets'))
+
+# %% ../nbs/cache_tools.ipynb 6
+def cache_path(*parts: str, # Path components, relative to `CACHE_DIR`
+               ) -> Path:
+    "Returns the path to `parts` inside `CACHE_DIR`, creating its parent directories if needed"
+
+    path = Path(CACHE_DIR).joinpath(*parts)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+# %% ../nbs/cache_tools.ipynb 7
+def is_fresh(path: Path,
+             ttl: float=None, # Maximum age of the file, in seconds. If None, files never expire
+             ) -> bool:
+    "True if `path` exists and was last modified less than `ttl` seconds ago"
+
+    path = Path(path)
+    if not path.exists(): return False
+    return ttl is None or (time.time() - path.stat().st_mtime) < ttl
+
+# %% ../nbs/cache_tools.ipynb 8
+def clear_cache(*parts: str, # Path components, relative to `CACHE_DIR`; if none given, the whole cache is deleted
+                ):
+    "Deletes the file or directory `parts` from `CACHE_DIR`"
+
+    path = Path(CACHE_DIR).joinpath(*parts)
+    if path.is_dir(): shutil.rmtree(path)
+    elif path.exists(): path.unlink()
@@ -0,0 +1,52 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/feature_graph.ipynb.
+
+# %% ../nbs/feature_graph.ipynb 3
+from __future__ import annotations
+from typing import List
+
+import pandas as pd
+
+# %% auto 0
+__all__ = ['resolve', 'raw_inputs', 'compute']
+
+# %% ../nbs/feature_graph.ipynb 5
+def resolve(registry: dict, # Maps feature names to `(raw_inputs, deps, func)` tuples
+            only: List[str]=None, # Features to compute. If None, all features in `registry`
+            known: List[str]=(), # Features that are already computed; they and their dependencies are left out
+            ) -> List[str]:
+    "Names of the features needed to compute `only`, each listed after all its dependencies"
+
+    order, done, visiting = [], set(), set()
+    def visit(name):
+        if name in done or name in known: return
+        if name not in registry: raise ValueError(f"Unknown feature: {name}")
+        if name in visiting: raise ValueError(f"Circular dependency involving feature: {name}")
+        visiting.add(name)
+        for dep in registry[name][1]: visit(dep)
+        visiting.discard(name)
+        done.add(name)
+        order.append(name)
+
+    for name in (registry if only is None else only): visit(name)
+    return order
+
+# %% ../nbs/feature_graph.ipynb 6
+def raw_inputs(registry: dict, # Maps feature names to `(raw_inputs, deps, func)` tuples
+               only: List[str]=None, # Features to compute. If None, all features in `registry`
+               ) -> List[str]:
+    "Raw variables needed to compute `only`"
+
+    return list(dict.fromkeys(v for name in resolve(registry, only) for v in registry[name][0]))
+
+# %% ../nbs/feature_graph.ipynb 7
+def compute(registry: dict, # Maps feature names to `(raw_inputs, deps, func)` tuples
+            df: pd.DataFrame, # Raw data
+            only: List[str]=None, # Features to compute. If None, all features in `registry`
+            given: pd.DataFrame=None, # Features computed elsewhere (e.g. by WRDS), with the index of `df`; used as they are
+            ) -> pd.DataFrame:
+    "Computes `only` from `df`, along with the features they depend on (each one once); returns the requested features"
+
+    out = pd.DataFrame(index=df.index) if given is None else given.copy()
+    for name in resolve(registry, only, known=list(out.columns)):
+        out[name] = registry[name][2](df, out)
+    return out[list(registry) if only is None else list(only)]
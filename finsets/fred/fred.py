@@ -3,52 +3,76 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/00_fred/00_fred.ipynb.
 
 # %% auto 0
-__all__ = ['PROVIDER', 'URL', 'get_series_info', 'default_raw_vars', 'parse_varlist', 'get_raw_data', 'process_raw_data',
-           'search']
+__all__ = ['PROVIDER', 'URL', 'INFO_TTL', 'get_series_info', 'default_raw_vars', 'parse_varlist', 'get_series', 'get_raw_data',
+           'process_raw_data', 'search']
 
 # %% ../../nbs/00_fred/00_fred.ipynb 4
 from typing import List, Dict
+import os
+import json
 import time
+import threading
 import copy
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 
 import pandasmore as pdm
+from .. import cache_tools
 from .fred_api import Fred
 
 # %% ../../nbs/00_fred/00_fred.ipynb 5
 PROVIDER = 'Federal Reserve Economic Data (FRED)'
 URL = 'https://fred.stlouisfed.org/'
 
-# %% ../../nbs/00_fred/00_fred.ipynb 6
+# %% ../../nbs/00_fred/00_fred.ipynb 7
+INFO_TTL = 3600 # Seconds after which cached series metadata is downloaded again
+
+def _replace(path, write):
+    "Calls `write` on a temporary file next to `path` and then moves it to `path`, so that concurrent readers never see a partly written file"
+    tmp_path = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
 def get_series_info(series: str, # FRED series name
-                    api_key: str=None # FRED api key. If None, will use os.getenv("FRED_API_KEY")
+                    api_key: str=None, # FRED api key. If None, will use os.getenv("FRED_API_KEY")
+                    refresh: bool=False, # If True, ignores the cached metadata and downloads it again
+                    ttl: float=None, # Maximum age (in seconds) of the cached metadata; if None, uses `INFO_TTL`
                     ) -> pd.Series:
-    """Get metadata from FRED for given `series` from FRED"""
+    """Get metadata from FRED for given `series` from FRED. Cached on disk."""
     
-    return Fred(api_key=api_key).get_series_info(series)
+    path = cache_tools.cache_path('fred_series', f'{series}.json')
+    if not refresh and cache_tools.is_fresh(path, INFO_TTL if ttl is None else ttl):
+        with open(path) as f: return pd.Series(json.load(f))
 
-# %% ../../nbs/00_fred/00_fred.ipynb 8
+    info = Fred(api_key=api_key).get_series_info(series)
+    _replace(path, lambda tmp: tmp.write_text(json.dumps(info.to_dict())))
+    return info
+
+# %% ../../nbs/00_fred/00_fred.ipynb 9
 def default_raw_vars() -> pd.DataFrame:
     """List of FRED series that will be used in `get_raw_data()` if none are specified"""
 
     return ['TB3MS','DTB3','GS10','DGS10','GS1','DGS1','AAA','BAA','DAAA','DBAA','FEDFUNDS','DFF','CPIAUCSL','CPIAUCNS','INDPRO','IPB50001SQ','UNRATE','GDP','GDPC1','GNP','GNPC96','GDPPOT','USREC','RECPROUSM156N','CFNAI','UMCSENT','MICH','USEPUINDXM','USEPUNEWSINDXM','USEPUINDXD','VIXCLS','VXOCLS']
 
 
-# %% ../../nbs/00_fred/00_fred.ipynb 10
+# %% ../../nbs/00_fred/00_fred.ipynb 11
 def parse_varlist(vars: List[str]=None, #list of variables requested by user; if None, will use `default_raw_vars()`
-                  api_key: str=None # FRED api key. If None, will use os.getenv("FRED_API_KEY")
+                  api_key: str=None, # FRED api key. If None, will use os.getenv("FRED_API_KEY")
+                  max_workers: int=8, # Number of series whose metadata is downloaded at the same time
+                  refresh: bool=False, # If True, ignores the cached metadata (see `get_series_info`)
                   ) -> Dict[str, list]:
     "Splits `vars` by frequency and returns dict with one pd.DataFrame per frequency"
      
     if vars is None: vars = default_raw_vars()
     if isinstance(vars, str): vars = [vars]
 
-    # Collect frequency data for all series
+    # Collect frequency data for all series (cached on disk; requests are rate-limited, see `fred_api.RateLimiter`)
+    with ThreadPoolExecutor(max_workers) as pool:
+        infos = list(pool.map(lambda series: get_series_info(series, api_key, refresh), vars))
     freq_store = []
     info_store = []
-    for series in vars:
-        info = get_series_info(series, api_key)
+    for series, info in zip(vars, infos):
         info_store.append(info.to_frame().T)
         freq_store.append(pd.DataFrame({'series': [series], 'freq': [info['frequency_short']]}))
 
@@ -63,24 +87,57 @@ def parse_varlist(vars: List[str]=None, #list of variables requested by user; if
 
     return out
 
-# %% ../../nbs/00_fred/00_fred.ipynb 16
+# %% ../../nbs/00_fred/00_fred.ipynb 18
+def get_series(series: str, # FRED series name
+               api_key: str=None, # FRED api key. If None, will use os.getenv("FRED_API_KEY")
+               refresh: bool=False, # If True, ignores the stored observations and downloads all of them again
+               append_only: bool=False, # If True, an updated series is only downloaded from the last stored date on, so earlier revisions are missed
+               ) -> pd.Series:
+    """Observations of `series`, downloaded from FRED only if it was updated since they were stored"""
+
+    last_updated = get_series_info(series, api_key)['last_updated']
+    path = cache_tools.cache_path('fred_series', f'{series}.parquet')
+    meta_path = path.with_suffix('.observations.json')
+
+    stored = None
+    if not refresh and path.exists() and meta_path.exists():
+        stored = pd.read_parquet(path)['value']
+        with open(meta_path) as f:
+            if json.load(f)['last_updated'] == last_updated: return stored
+
+    api = Fred(api_key=api_key)
+    if not append_only or stored is None or stored.empty: data = api.get_series(series)
+    else:
+        data = api.get_series(series, observation_start=stored.index[-1])
+        data = pd.concat([stored[stored.index < stored.index[-1]], data])
+
+    # the observations go first: if the run stops in between, the old `last_updated` makes the next run download them again
+    _replace(path, lambda tmp: data.to_frame(name='value').to_parquet(tmp))
+    _replace(meta_path, lambda tmp: tmp.write_text(json.dumps({'last_updated': last_updated})))
+    return data
+
+# %% ../../nbs/00_fred/00_fred.ipynb 20
 def get_raw_data(vars: str=None, # FRED series name
-               api_key: str=None # FRED api key. If None, will use os.getenv("FRED_API_KEY")
+               api_key: str=None, # FRED api key. If None, will use os.getenv("FRED_API_KEY")
+               max_workers: int=8, # Number of series downloaded at the same time
+               refresh: bool=False, # If True, ignores cached metadata and stored observations and downloads everything again
+               append_only: bool=False, # If True, updated series are only downloaded from their last stored date on (see `get_series`)
                ) -> Dict[str, pd.DataFrame]: 
     """Retrieves `vars` from FRED, splits them by frequency and returns dict with one pd.DataFrame per frequency"""
 
-    api = Fred(api_key=api_key)
-
-    varlist = parse_varlist(vars)
+    varlist = parse_varlist(vars, api_key=api_key, max_workers=max_workers, refresh=refresh)
 
     out = {'info':varlist['info']}
     varlist.pop('info')
+    all_series = [series for vars in varlist.values() for series in vars]
+    with ThreadPoolExecutor(max_workers) as pool:
+        data = dict(zip(all_series, pool.map(lambda series: get_series(series, api_key, refresh, append_only), all_series)))
     for freq, vars in varlist.items():
-        out[freq] = pd.concat([api.get_series(series).to_frame(name=series) for series in vars], axis=1).dropna(how='all')
+        out[freq] = pd.concat([data[series].to_frame(name=series) for series in vars], axis=1).dropna(how='all')
         
     return out
 
-# %% ../../nbs/00_fred/00_fred.ipynb 21
+# %% ../../nbs/00_fred/00_fred.ipynb 25
 def process_raw_data(
         data: dict=None,  # keys are frequency str literals; same format as the output of `get_raw_data`
 ) -> pd.DataFrame: 
@@ -96,7 +153,7 @@ def process_raw_data(
 
     return out
 
-# %% ../../nbs/00_fred/00_fred.ipynb 25
+# %% ../../nbs/00_fred/00_fred.ipynb 29
 def search(search_text: str=None, # What to search for
               order_by: str='popularity', # How to order search results; try `search_rank` if you don't find what you were looking for
               nr_results: int=10, # How many results to output
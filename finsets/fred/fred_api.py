@@ -3,10 +3,13 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/00_fred/01_fred_api.ipynb.
 
 # %% auto 0
-__all__ = ['urlopen', 'quote_plus', 'urlencode', 'HTTPError', 'Fred']
+__all__ = ['urlopen', 'quote_plus', 'urlencode', 'HTTPError', 'RateLimiter', 'Fred']
 
 # %% ../../nbs/00_fred/01_fred_api.ipynb 3
 import os
+import json
+import time
+import threading
 import xml.etree.ElementTree as ET
 import urllib.request as url_request
 import urllib.parse as url_parse
@@ -20,23 +23,53 @@ quote_plus = url_parse.quote_plus
 urlencode = url_parse.urlencode
 HTTPError = url_error.HTTPError
 
-# %% ../../nbs/00_fred/01_fred_api.ipynb 5
+# %% ../../nbs/00_fred/01_fred_api.ipynb 6
+class RateLimiter:
+    "Token bucket: allows `rate` requests per second on average, and bursts of at most `capacity` requests"
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate, self.capacity = rate, capacity
+        self.tokens, self.updated = capacity, time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        "Waits until one more request is allowed"
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1 # may go below zero: later requests wait for the tokens they need
+            wait = -self.tokens / self.rate
+        if wait > 0: time.sleep(wait)
+
+# %% ../../nbs/00_fred/01_fred_api.ipynb 9
 class Fred:
     earliest_realtime_start = '1776-07-04'
     latest_realtime_end = '9999-12-31'
     nan_char = '.'
     max_results_per_request = 1000
     root_url = 'https://api.stlouisfed.org/fred'
+    max_requests_per_minute = 120 # FRED's limit per API key
+    max_retries = 5 # of requests that fail with HTTP 429 or 5xx
+    retry_wait = 1 # seconds before the first retry; doubles with each retry
+    _limiters = {} # API key -> RateLimiter shared by all Fred objects that use it
+    _limiters_lock = threading.Lock()
 
     def __init__(self,
                  api_key=None,
-                 api_key_file=None):
+                 api_key_file=None,
+                 file_type='json'):
         """
         Initialize the Fred class that provides useful functions to query the Fred dataset. You need to specify a valid
         API key in one of 3 ways: pass the string via api_key, or set api_key_file to a file with the api key in the
         first line, or set the environment variable `FRED_API_KEY` to the value of your api key. You can sign up for a
         free api key on the Fred website at http://research.stlouisfed.org/fred2/
+
+        Observations are downloaded as JSON (`file_type='json'`) or XML (`file_type='xml'`); both give the same results.
         """
+        if file_type not in ('json', 'xml'):
+            raise ValueError("file_type must be 'json' or 'xml'")
+        self.file_type = file_type
         self.api_key = None
         if api_key is not None:
             self.api_key = api_key
@@ -57,18 +90,75 @@ class Fred:
                     api key. You can sign up for a free api key on the Fred
                     website at http://research.stlouisfed.org/fred2/"""))
 
+        with self._limiters_lock:
+            if self.api_key not in self._limiters:
+                # bursts of up to half the limit, and never more than the limit in any minute
+                burst = self.max_requests_per_minute // 2
+                self._limiters[self.api_key] = RateLimiter((self.max_requests_per_minute - burst) / 60, burst)
+            self.limiter = self._limiters[self.api_key]
+
     def __fetch_data(self, url):
         """
         helper function for fetching data given a request URL
         """
+        return ET.fromstring(self.__request(url))
+
+    def __fetch_json(self, url):
+        """
+        helper function for fetching JSON data given a request URL
+        """
+        return json.loads(self.__request(url + '&file_type=json'))
+
+    def __request(self, url):
+        """
+        helper function for sending a rate-limited request, retried if FRED is busy, and returning the body of the response
+        """
         url += '&api_key=' + self.api_key
-        try:
-            response = urlopen(url)
-            root = ET.fromstring(response.read())
-        except HTTPError as exc:
-            root = ET.fromstring(exc.read())
-            raise ValueError(root.get('message'))
-        return root
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                response = urlopen(url)
+                return response.read()
+            except HTTPError as exc:
+                if (exc.code == 429 or exc.code >= 500) and attempt < self.max_retries:
+                    retry_after = exc.headers.get('Retry-After') if exc.headers is not None else None
+                    time.sleep(float(retry_after) if retry_after and retry_after.isdigit() else self.retry_wait * 2 ** attempt)
+                    continue
+                body = exc.read()
+                try:
+                    message = json.loads(body)['error_message']
+                except (ValueError, KeyError, TypeError):
+                    try:
+                        message = ET.fromstring(body).get('message')
+                    except ET.ParseError:
+                        message = 'HTTP error %d: %s' % (exc.code, exc.reason)
+                raise ValueError(message)
+
+    def __observations(self, url):
+        """
+        helper function for getting all observations of a request URL, in as many requests as needed (FRED returns at
+        most 100000 per request), as a DataFrame with columns 'realtime_start', 'realtime_end', 'date' and 'value'.
+        Dates and values are converted all at once; dates out of the range of pandas timestamps (e.g. a 'realtime_end'
+        of 9999-12-31) become NaT
+        """
+        records, offset = [], 0
+        while True:
+            page_url = url + '&offset=%d' % offset
+            if self.file_type == 'json':
+                page = self.__fetch_json(page_url)
+                count, observations = int(page['count']), page['observations']
+            else:
+                root = self.__fetch_data(page_url)
+                count, observations = int(root.get('count', 0)), [child.attrib for child in root]
+            records.extend(observations)
+            offset += len(observations)
+            if not observations or offset >= count:
+                break
+        data = pd.DataFrame.from_records(records, columns=['realtime_start', 'realtime_end', 'date', 'value'])
+        for field in ['realtime_start', 'realtime_end', 'date']:
+            data[field] = pd.to_datetime(data[field], format='%Y-%m-%d', errors='coerce')
+        data['value'] = pd.to_numeric(data['value'].mask(data['value'] == self.nan_char)).astype('float64')
+        return data
 
     def _parse(self, date_str, format='%Y-%m-%d'):
         """
@@ -130,18 +220,8 @@ class Fred:
             url += '&observation_end=' + observation_end.strftime('%Y-%m-%d')
         if kwargs.keys():
             url += '&' + urlencode(kwargs)
-        root = self.__fetch_data(url)
-        if root is None:
-            raise ValueError('No data exists for series id: ' + series_id)
-        data = {}
-        for child in root:
-            val = child.get('value')
-            if val == self.nan_char:
-                val = float('NaN')
-            else:
-                val = float(val)
-            data[self._parse(child.get('date'))] = val
-        return pd.Series(data)
+        data = self.__observations(url)
+        return pd.Series(data['value'].values, index=pd.DatetimeIndex(data['date'].values))
 
     def get_series_latest_release(self, series_id):
         """
@@ -202,7 +282,7 @@ class Fred:
         data = df[df['realtime_start'] <= as_of_date]
         return data
 
-    def get_series_all_releases(self, series_id, realtime_start=None, realtime_end=None):
+    def get_series_all_releases(self, series_id, realtime_start=None, realtime_end=None, include_realtime_end=False):
         """
         Get all data for a Fred series id including first releases and all revisions. This returns a DataFrame
         with three columns: 'date', 'realtime_start', and 'value'. For instance, the US GDP for Q4 2013 was first released
@@ -219,6 +299,9 @@ class Fred:
             specifies the realtime_start value used in the query, defaults to the earliest possible start date allowed by Fred
         realtime_end : str, optional
             specifies the realtime_end value used in the query, defaults to the latest possible end date allowed by Fred
+        include_realtime_end : bool, optional
+            if True, also returns a 'realtime_end' column with the last date on which each value was current (NaT for
+            values that are still current)
 
         Returns
         -------
@@ -234,30 +317,10 @@ class Fred:
                                                                                          series_id,
                                                                                          realtime_start,
                                                                                          realtime_end)
-        root = self.__fetch_data(url)
-        if root is None:
-            raise ValueError('No data exists for series id: ' + series_id)
-        data = {}
-        i = 0
-        for child in root:
-            val = child.get('value')
-            if val == self.nan_char:
-                val = float('NaN')
-            else:
-                val = float(val)
-            realtime_start = self._parse(child.get('realtime_start'))
-            # realtime_end = self._parse(child.get('realtime_end'))
-            date = self._parse(child.get('date'))
-
-            data[i] = {'realtime_start': realtime_start,
-                       # 'realtime_end': realtime_end,
-                       'date': date,
-                       'value': val}
-            i += 1
-        data = pd.DataFrame(data).T
-        return data
+        data = self.__observations(url)
+        return data[['realtime_start', 'realtime_end', 'date', 'value'] if include_realtime_end else ['realtime_start', 'date', 'value']]
 
-    def get_series_vintage_dates(self, series_id):
+    def get_series_vintage_dates(self, series_id, realtime_start=None):
         """
         Get a list of vintage dates for a series. Vintage dates are the dates in history when a
         series' data values were revised or new data values were released.
@@ -266,6 +329,8 @@ class Fred:
         ----------
         series_id : str
             Fred series id such as 'CPIAUCSL'
+        realtime_start : datetime or datetime-like str such as '7/1/2014', optional
+            earliest vintage date, defaults to the earliest possible start date allowed by Fred
 
         Returns
         -------
@@ -273,13 +338,21 @@ class Fred:
             list of vintage dates
         """
         url = "%s/series/vintagedates?series_id=%s" % (self.root_url, series_id)
-        root = self.__fetch_data(url)
-        if root is None:
-            raise ValueError('No vintage date exists for series id: ' + series_id)
-        dates = []
-        for child in root:
-            dates.append(self._parse(child.text))
-        return dates
+        if realtime_start is not None:
+            url += '&realtime_start=' + pd.to_datetime(realtime_start, errors='raise').strftime('%Y-%m-%d')
+        dates, offset = [], 0
+        while True: # FRED returns at most 10000 vintage dates per request
+            if self.file_type == 'json':
+                page = self.__fetch_json(url + '&offset=%d' % offset)
+                count, page_dates = int(page['count']), page['vintage_dates']
+            else:
+                root = self.__fetch_data(url + '&offset=%d' % offset)
+                count, page_dates = int(root.get('count', 0)), [child.text for child in root]
+            dates.extend(page_dates)
+            offset += len(page_dates)
+            if not page_dates or offset >= count:
+                break
+        return pd.to_datetime(pd.Index(dates, dtype='object'), format='%Y-%m-%d', errors='coerce').to_pydatetime().tolist()
 
     def __do_series_search(self, url):
         """
@@ -450,4 +523,3 @@ class Fred:
         if info is None:
             raise ValueError('No series exists for category id: ' + str(category_id))
         return info
-
@@ -0,0 +1,197 @@
+"""Local store of ALFRED vintages of FRED series, with point-in-time queries"""
+
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/00_fred/02_vintages.ipynb.
+
+# %% ../../nbs/00_fred/02_vintages.ipynb 2
+from __future__ import annotations
+import os
+import json
+import threading
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from .. import cache_tools
+from .fred_api import Fred
+
+# %% auto 0
+__all__ = ['STORE_DIR', 'store_path', 'read_meta', 'update', 'Vintages', 'load', 'point_in_time_panel']
+
+# %% ../../nbs/00_fred/02_vintages.ipynb 4
+STORE_DIR = 'fred_vintages'
+
+def store_path(series_id: str, # FRED series name, e.g. 'GDP'
+               ) -> Path:
+    "Returns the Parquet file that holds the local vintages of `series_id`"
+
+    return cache_tools.cache_path(STORE_DIR, f'{series_id}.parquet')
+
+def read_meta(series_id: str, # FRED series name, e.g. 'GDP'
+              ) -> dict:
+    "Returns the description of what is stored locally for `series_id`, or None if nothing is"
+
+    path = store_path(series_id).with_suffix('.json')
+    if not path.exists(): return None
+    with open(path) as f:
+        return json.load(f)
+
+def _replace(path, write):
+    "Calls `write` on a temporary file next to `path` and then moves it to `path`, so that readers never see a partly written file"
+    tmp_path = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+def _write_meta(series_id, meta):
+    _replace(store_path(series_id).with_suffix('.json'), lambda tmp: tmp.write_text(json.dumps(meta, indent=1)))
+
+# %% ../../nbs/00_fred/02_vintages.ipynb 6
+def _download(api, series_id, realtime_start=None):
+    data = api.get_series_all_releases(series_id, realtime_start=realtime_start, include_realtime_end=True)
+    return data[['date', 'realtime_start', 'realtime_end', 'value']]
+
+def _as_of_vintage(stored, last):
+    "`stored` as it was on vintage date `last`: rows released later are dropped and rows closed later are current again"
+    stored = stored[stored['realtime_start'] <= last].reset_index(drop=True)
+    stored.loc[stored['realtime_end'] >= last, 'realtime_end'] = pd.NaT
+    return stored
+
+def _merge(stored, new, cut):
+    current = stored[stored['realtime_end'].isna()].reset_index()
+    first = new[new['realtime_start'] == cut].reset_index()
+    continued = current.merge(first, on=['date', 'value'], suffixes=('', '_new'))
+    stored, new = stored.copy(), new.drop(continued['index_new'])
+    stored.loc[current['index'], 'realtime_end'] = cut - pd.Timedelta(days=1)
+    stored.loc[continued['index'], 'realtime_end'] = continued['realtime_end_new'].values
+    return pd.concat([stored, new], ignore_index=True)
+
+def update(series_id: str, # FRED series name, e.g. 'GDP'
+           api_key: str=None, # FRED api key. If None, will use os.getenv("FRED_API_KEY")
+           refresh: bool=False, # If True, discards the local vintages and downloads all of them again
+           ) -> pd.DataFrame:
+    "Downloads the vintages of `series_id` that are not stored locally yet and returns all of them, sorted by `date` and `realtime_start`"
+
+    api = Fred(api_key=api_key)
+    path = store_path(series_id)
+    meta = None if refresh or not path.exists() else read_meta(series_id)
+
+    if meta is None:
+        data = _download(api, series_id)
+        vintage_dates = api.get_series_vintage_dates(series_id)
+    else:
+        last = pd.Timestamp(meta['last_vintage'])
+        vintage_dates = [d for d in api.get_series_vintage_dates(series_id, realtime_start=last) if d > last]
+        if not vintage_dates: return pd.read_parquet(path)
+        cut = pd.Timestamp(vintage_dates[0])
+        stored = _as_of_vintage(pd.read_parquet(path), last)
+        data = _merge(stored, _download(api, series_id, cut.strftime('%Y-%m-%d')), cut)
+
+    data = data.sort_values(['date', 'realtime_start'], ignore_index=True)
+    _replace(path, lambda tmp: data.to_parquet(tmp, index=False))
+    last = max(vintage_dates, default=None) or (meta or {}).get('last_vintage') or data['realtime_start'].max()
+    _write_meta(series_id, {'last_vintage': pd.Timestamp(last).strftime('%Y-%m-%d'),
+                            'updated': datetime.datetime.now().isoformat(timespec='seconds')})
+    return data
+
+# %% ../../nbs/00_fred/02_vintages.ipynb 8
+_DAY_SPAN = 2**18 # more days than pandas timestamps can span (1677-2262), so date codes never overlap
+_NOT_ENDED = np.iinfo('int64').max
+
+def _days(dates) -> np.ndarray:
+    return np.asarray(pd.to_datetime(dates).values.astype('datetime64[D]').astype('int64')) + _DAY_SPAN // 2
+
+class Vintages:
+    "Point-in-time views of the ALFRED history of one series (as returned by `update`)"
+
+    def __init__(self,
+                 data: pd.DataFrame, # Columns 'date', 'realtime_start', 'realtime_end' (NaT if still current) and 'value'
+                 name: str=None, # Name of the Series returned by the queries, e.g. the FRED series name
+                 ):
+        data = data.sort_values(['date', 'realtime_start'], ignore_index=True)
+        self.data, self.name = data, name
+        dates = data['date'].values
+        self.dates = pd.DatetimeIndex(pd.unique(dates), name='date')
+        self._code = np.searchsorted(self.dates.values, dates)
+        self._first = np.searchsorted(dates, self.dates.values)
+        self._key = self._code * _DAY_SPAN + _days(data['realtime_start'])
+        ended = data['realtime_end'].notna().values
+        self._end = np.where(ended, _days(data['realtime_end'].fillna(pd.Timestamp(0))), _NOT_ENDED)
+        self._value = data['value'].to_numpy(dtype=float)
+
+    @property
+    def vintage_dates(self) -> pd.DatetimeIndex:
+        "Dates on which some value of the series was released or revised"
+        return pd.DatetimeIndex(np.unique(self.data['realtime_start'].values))
+
+    def _series(self, rows, keep):
+        return pd.Series(self._value[rows[keep]], index=self.dates[keep], name=self.name)
+
+    def as_of(self, as_of_date) -> pd.Series:
+        "The series as it was known on `as_of_date`: one value per observation date released by then"
+        day = _days([as_of_date])[0]
+        rows = np.searchsorted(self._key, np.arange(len(self.dates)) * _DAY_SPAN + day, side='right') - 1
+        keep = rows >= self._first
+        keep[keep] = self._end[rows[keep]] >= day
+        return self._series(rows, keep)
+
+    def first_release(self) -> pd.Series:
+        "The first published value of every observation date"
+        return self._series(self._first, np.ones(len(self.dates), dtype=bool))
+
+    def revision_matrix(self, 
+                        vintage_dates=None, # As-of dates (columns of the output). If None, uses `self.vintage_dates`
+                        ) -> pd.DataFrame:
+        "Observation dates in rows, `vintage_dates` in columns, and the value of each observation as known on each vintage date"
+        vintage_dates = self.vintage_dates if vintage_dates is None else pd.DatetimeIndex(sorted(pd.to_datetime(vintage_dates)))
+        days = _days(vintage_dates)
+        lo = np.searchsorted(days, self._key - self._code * _DAY_SPAN, side='left')
+        hi = np.searchsorted(days, self._end, side='right')
+        counts = np.maximum(hi - lo, 0)
+        steps = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        out = np.full((len(self.dates), len(days)), np.nan)
+        out[np.repeat(self._code, counts), np.repeat(lo, counts) + steps] = np.repeat(self._value, counts)
+        return pd.DataFrame(out, index=self.dates, columns=pd.DatetimeIndex(vintage_dates, name='vintage_date'))
+
+    def latest(self, 
+               as_of_dates, # Dates on which the series is observed, in any order
+               ) -> pd.Series:
+        "The value of the most recent observation date known on each of `as_of_dates` (NaN before the first release)"
+        start = self._key - self._code * _DAY_SPAN
+        frontier = pd.Series(self._code).groupby(start).max().cummax()
+        rows = np.searchsorted(self._key, frontier.values * _DAY_SPAN + frontier.index.values, side='right') - 1
+        releases = pd.DataFrame({'day': frontier.index.values, 'value': self._value[rows]})
+        releases.loc[self._end[rows] < releases['day'], 'value'] = np.nan
+        as_of_dates = pd.DatetimeIndex(pd.to_datetime(as_of_dates), name='as_of_date')
+        asked = pd.DataFrame({'day': _days(as_of_dates), 'order': np.arange(len(as_of_dates))}).sort_values('day')
+        known = pd.merge_asof(asked, releases, on='day').sort_values('order')
+        return pd.Series(known['value'].values, index=as_of_dates, name=self.name)
+
+# %% ../../nbs/00_fred/02_vintages.ipynb 9
+def load(series_id: str, # FRED series name, e.g. 'GDP'
+         api_key: str=None, # FRED api key. If None, will use os.getenv("FRED_API_KEY")
+         offline: bool=False, # If True, uses the local vintages without checking FRED for new ones
+         ) -> Vintages:
+    "`Vintages` of `series_id`, brought up to date with `update` first (unless `offline`)"
+
+    data = pd.read_parquet(store_path(series_id)) if offline else update(series_id, api_key)
+    return Vintages(data, name=series_id)
+
+# %% ../../nbs/00_fred/02_vintages.ipynb 11
+def point_in_time_panel(series: List[str], # FRED series names
+                        as_of_dates, # Dates of the rows of the panel, e.g. `pd.date_range('2000-01-01', '2020-12-31', freq='MS')`
+                        api_key: str=None, # FRED api key. If None, will use os.getenv("FRED_API_KEY")
+                        local: bool=False, # If True, uses (and updates) the local vintage store instead of downloading all releases each time
+                        max_workers: int=8, # Number of series downloaded at the same time
+                        ) -> pd.DataFrame:
+    "As-of dates in rows, `series` in columns, and the latest value of each series known on each as-of date"
+
+    if isinstance(series, str): series = [series]
+    api = Fred(api_key=api_key)
+    def history(series_id):
+        data = update(series_id, api_key) if local else _download(api, series_id)
+        return Vintages(data, name=series_id).latest(as_of_dates)
+    with ThreadPoolExecutor(max_workers) as pool:
+        return pd.concat(list(pool.map(history, series)), axis=1)
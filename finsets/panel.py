@@ -0,0 +1,124 @@
+"""Merged panels of several WRDS datasets, downloaded concurrently with one shared plan"""
+
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/panel.ipynb.
+
+# %% ../nbs/panel.ipynb 2
+from __future__ import annotations
+from typing import List
+from types import ModuleType
+from concurrent.futures import ThreadPoolExecutor
+import inspect
+
+import numpy as np
+import pandas as pd
+
+from .wrds import wrds_api
+
+# %% auto 0
+__all__ = ['PERIOD_MONTHS', 'REPORTING_LAGS', 'plan', 'align', 'build']
+
+# %% ../nbs/panel.ipynb 4
+PERIOD_MONTHS = {'M': 1, 'Q': 3, 'A': 12, 'Y': 12} # Frequencies a panel can have, and the length of their periods in months
+REPORTING_LAGS = {'Q': 3, 'A': 6, 'Y': 6} # Default months after the end of a period before data of that frequency are public
+
+def _name(module: ModuleType) -> str:
+    return module.__name__.split('.')[-1]
+
+def _pandas_freq(freq: str) -> str:
+    return 'Y' if freq == 'A' else freq # pandas deprecated 'A'
+
+def _first_needed(start_date: str, freq: str, lag: int) -> str:
+    "Start of the first period of frequency `freq` whose data are used at `start_date` if they are used from `lag` months after it ends"
+    if start_date is None: return None
+    months = lag + PERIOD_MONTHS[freq] - 1
+    return pd.Period(pd.Timestamp(start_date) - pd.DateOffset(months=months), _pandas_freq(freq)).start_time.strftime('%m/%d/%Y')
+
+# %% ../nbs/panel.ipynb 5
+def plan(modules: List[ModuleType], # Modules with PERMNO as entity, e.g. `[crspm, compa_ccm, ratios]`
+         start_date: str=None, # Start date of the panel in MM/DD/YYYY format
+         end_date: str=None, # End date of the panel in MM/DD/YYYY format
+         freq: str=None, # Frequency of the panel ('M', 'Q' or 'Y'). If None, the highest frequency among `modules`
+         vars: dict=None, # Module name (e.g. 'compa_ccm') -> `vars` for its `get_raw_data`
+         lags: dict=None, # Module name -> months after the end of a period before its data are used; defaults to `REPORTING_LAGS`
+         ) -> dict:
+    "Module name -> the module, the arguments for its `get_raw_data` and the lag (in panel periods) that `align` should use"
+
+    wrds_api.validate_dates([start_date, end_date])
+    freq = freq or min(modules, key=lambda m: PERIOD_MONTHS.get(m.FREQ, 0)).FREQ
+    if freq not in PERIOD_MONTHS: raise ValueError(f"Panel frequency must be one of {list(PERIOD_MONTHS)}, not {freq}")
+    freq = _pandas_freq(freq)
+
+    steps = {}
+    for module in modules:
+        name = _name(module)
+        if not hasattr(module, 'process_raw_data'):
+            raise ValueError(f"{name} has no `process_raw_data`, so its data cannot be aligned to a panel")
+        if module.ENTITY_ID_IN_CLEAN_DSET != 'permno':
+            raise ValueError(f"{name} is not indexed by permno; use its CCM version if there is one (e.g. compa_ccm)")
+        if PERIOD_MONTHS.get(module.FREQ, 0) < PERIOD_MONTHS[freq]:
+            raise ValueError(f"{name} has a higher frequency ({module.FREQ}) than the panel ({freq})")
+        lag = (lags or {}).get(name, REPORTING_LAGS.get(module.FREQ, 0))
+        kwargs = {'start_date': _first_needed(start_date, module.FREQ, lag), 'end_date': end_date}
+        if vars and name in vars: kwargs['vars'] = vars[name]
+        if 'link_locally' in inspect.signature(module.get_raw_data).parameters: kwargs['link_locally'] = True
+        steps[name] = {'module': module, 'kwargs': kwargs, 'freq': freq, 'lag': -(-lag // PERIOD_MONTHS[freq])}
+    return steps
+
+# %% ../nbs/panel.ipynb 11
+def align(df: pd.DataFrame, # Panel indexed by entity and period date, e.g. output of `process_raw_data`
+          freq: str, # Frequency of the result, e.g. 'M'; cannot be higher than that of `df`
+          lag: int=0, # Periods of frequency `freq` between the end of a period of `df` and the first period its data are used
+          ) -> pd.DataFrame:
+    "`df` indexed by entity and period date of frequency `freq`, with each row repeated for all the periods in which it is the latest available"
+
+    entity = df.index.names[0]
+    dates = pd.PeriodIndex(df.index.get_level_values(1))
+    ends = dates.asfreq(freq, how='end')
+    span = (dates + 1).asfreq(freq, how='end').asi8 - ends.asi8
+    if (span < 1).any(): raise ValueError(f"Cannot align {dates.freqstr} data to the lower frequency {freq}")
+
+    codes = pd.factorize(df.index.get_level_values(0))[0]
+    order = np.lexsort((ends.asi8, codes))
+    codes, start, span = codes[order], ends.asi8[order] + lag, span[order]
+    # rows are used until the next row of the same entity is available
+    same = np.append(codes[1:] == codes[:-1], False)
+    n = np.where(same, np.minimum(span, np.append(np.diff(start), 0)), span)
+    offsets = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+
+    out = df.iloc[np.repeat(order, n)]
+    periods = pd.PeriodIndex.from_ordinals(np.repeat(start, n) + offsets, freq=freq)
+    out.index = pd.MultiIndex.from_arrays([out.index.get_level_values(0), periods], names=[entity, f'{freq}date'])
+    return out
+
+# %% ../nbs/panel.ipynb 14
+def build(modules: List[ModuleType], # Modules with PERMNO as entity; the first one sets the rows of the panel (e.g. `[crspm, compa_ccm, ratios, peters_taylor_2016]`)
+          start_date: str=None, # Start date in MM/DD/YYYY format
+          end_date: str=None, # End date in MM/DD/YYYY format
+          freq: str=None, # Frequency of the panel ('M', 'Q' or 'Y'). If None, the highest frequency among `modules`
+          vars: dict=None, # Module name (e.g. 'compa_ccm') -> `vars` for its `get_raw_data`
+          lags: dict=None, # Module name -> months after the end of a period before its data are used; defaults to `REPORTING_LAGS`
+          features: bool=False, # If True, uses the output of `features` instead of `process_raw_data` for modules that have one
+          max_workers: int=None, # Number of modules downloaded at the same time. If None, all of them
+          ) -> pd.DataFrame:
+    "Panel with the data of all `modules` (see `plan`), indexed by PERMNO and period date of frequency `freq`"
+
+    steps = plan(modules, start_date=start_date, end_date=end_date, freq=freq, vars=vars, lags=lags)
+
+    def run(step: dict) -> pd.DataFrame:
+        module = step['module']
+        df = module.process_raw_data(module.get_raw_data(**step['kwargs']))
+        if features and hasattr(module, 'features'): df = module.features(df)
+        df = align(df, step['freq'], step['lag'])
+        df.index = df.index.set_levels(df.index.levels[0].astype('Int64'), level=0)
+        return df
+
+    with ThreadPoolExecutor(max_workers or len(steps)) as pool:
+        panels = dict(zip(steps, pool.map(run, steps.values())))
+
+    names = list(panels)
+    out = panels[names[0]]
+    for name in names[1:]: out = out.join(panels[name], rsuffix=f'_{name}')
+    dates = out.index.get_level_values(1)
+    if start_date is not None: out = out[dates >= pd.Period(start_date, dates.freq)]
+    if end_date is not None: out = out[out.index.get_level_values(1) <= pd.Period(end_date, dates.freq)]
+    return out.sort_index()
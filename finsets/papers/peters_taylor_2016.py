@@ -10,12 +10,13 @@ import pandas as pd
 import numpy as np
 
 import pandasmore as pdm
-from ..wrds import wrds_api
+from .. import polars_tools
+from ..wrds import wrds_api, linking
 
 # %% auto 0
 __all__ = ['PROVIDER', 'URL', 'LIBRARY', 'TABLE', 'LINK_LIBRARY', 'LINK_TABLE', 'FREQ', 'MIN_YEAR', 'MAX_YEAR',
            'ENTITY_ID_IN_RAW_DSET', 'ENTITY_ID_IN_CLEAN_DSET', 'TIME_VAR_IN_RAW_DSET', 'TIME_VAR_IN_CLEAN_DSET',
-           'list_all_vars', 'get_raw_data', 'process_raw_data', 'features']
+           'list_all_vars', 'get_raw_data', 'process_raw_data', 'features', 'polars_features']
 
 # %% ../../nbs/02_papers/peters_taylor_2016.ipynb 3
 PROVIDER = 'Wharton Research Data Services (WRDS)'
@@ -36,11 +37,7 @@ TIME_VAR_IN_CLEAN_DSET = f'{FREQ}date'
 def list_all_vars() -> pd.DataFrame:
     "Collects names of all available variables from WRDS f`{LIBRARY}.{TABLE}` and `{LIBRARY}.{COMPANY_TABLE}`."
 
-    try:
-        db = wrds_api.Connection()
-        funda = db.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
-    finally:
-        db.close()
+    funda = wrds_api.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
 
     return funda[['name','type','wrds_library','wrds_table']].copy()
 
@@ -50,27 +47,37 @@ def get_raw_data(
         required_vars: List[str]=['gvkey','datadate'], #list of variables that will get downloaded, even if not in `vars`
         nrows: int=None, #Number of rows to download. If None, full dataset will be downloaded
         start_date: str=None, # Start date in MM/DD/YYYY format
-        end_date: str=None #End date in MM/DD/YYYY format
+        end_date: str=None, #End date in MM/DD/YYYY format
+        use_copy: bool=False, # If True, downloads through Postgres `COPY` (faster for many variables, see `wrds_api.copy_query`)
+        link_locally: bool=False, # If True, downloads the data without the CCM join and adds the links locally (see `linking.add_permno`)
 ) -> pd.DataFrame:
     """Downloads `vars` from `start_date` to `end_date` from WRDS `{LIBRARY}.{TABLE}` library and adds PERMNO and PERMCO as in CCM"""
  
     wrds_api.validate_dates([start_date, end_date])
 
-    sql_string=f"""SELECT c.lpermno as permno, c.lpermco as permco, c.liid, c.linkprim as linkprim, 
+    link_vars = "" if link_locally else "c.lpermno as permno, c.lpermco as permco, c.liid, c.linkprim as linkprim,"
+    sql_string=f"""SELECT {link_vars}
                           a.*, 
                           b.xrd, b.xsga, b.cogs, b.rdip, b.at, b.capx, b.ppegt, b.ppent, b.dp
                     FROM {LIBRARY}.{TABLE} AS a
                     LEFT JOIN comp.funda AS b ON a.gvkey = b.gvkey AND a.datadate = b.datadate
-                    INNER JOIN {LINK_LIBRARY}.{LINK_TABLE} AS c ON a.gvkey = c.gvkey 
+                """
+    if link_locally: sql_string += " WHERE 1 = 1"
+    else: sql_string += f"""INNER JOIN {LINK_LIBRARY}.{LINK_TABLE} AS c ON a.gvkey = c.gvkey 
                     WHERE a.datadate BETWEEN c.linkdt AND COALESCE(c.linkenddt, CURRENT_DATE)
                             AND c.linktype IN ('LU','LC') AND c.linkprim IN ('P','C')
                 """
     if start_date is not None: sql_string += r" AND a.datadate >= %(start_date)s"
     if end_date is not None: sql_string += r" AND a.datadate <= %(end_date)s"
+    params = {'start_date':start_date, 'end_date':end_date, 'nrows':nrows}
+    if link_locally and nrows is not None:
+        # `nrows` counts linked rows, as on the server, so the unlinked data is streamed until there are enough of them
+        linking.ccm_links() # downloaded first: the stream holds its connection until it is closed
+        return wrds_api.concat(linking.link_chunks(wrds_api.stream(sql_string, params=params, chunksize=max(nrows, 10_000)), nrows=nrows))
     if nrows is not None: sql_string += r" LIMIT %(nrows)s"
     
-    return wrds_api.download(sql_string,
-                             params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows})
+    df = wrds_api.download(sql_string, params=params, use_copy=use_copy)
+    return linking.add_permno(df) if link_locally else df
 
 # %% ../../nbs/02_papers/peters_taylor_2016.ipynb 9
 def process_raw_data(
@@ -127,3 +134,21 @@ def features(df: pd.DataFrame=None
     out = out.replace([np.inf, -np.inf], np.nan)
     return out 
 
+
+# %% ../../nbs/02_papers/peters_taylor_2016.ipynb 15
+def polars_features(lf: pl.LazyFrame, # Output of `process_raw_data`, as a LazyFrame (see `polars_tools.from_pandas`)
+                    ) -> pl.LazyFrame:
+    """Polars version of `features`"""
+
+    pl = polars_tools.require_polars()
+    c = pl.col
+    p = polars_tools.Panel(ENTITY_ID_IN_CLEAN_DSET, TIME_VAR_IN_CLEAN_DSET, FREQ)
+
+    lf = (lf.sort(p.index)
+          .with_columns([c(x).fill_null(0).alias(f'{x}0') for x in ['xrd','xsga','rdip']])
+          .with_columns(sga=pl.when(c('xrd0').is_between(c('xsga0'), c('cogs'))).then(c('xsga0')).otherwise(c('xsga0') - c('xrd0') - c('rdip0')),
+                        k_phy=c('ppent'))
+          .with_columns(k_tot=c('k_phy') + c('k_int'), i_phy=c('capx'), i_int=c('xrd0') + 0.3*c('sga'))
+          .with_columns(i_tot=c('i_phy') + c('i_int'), i2k_int=c('i_int') / p.lag(c('k_tot')), i2k_phy=c('i_phy') / p.lag(c('k_tot')))
+          .with_columns(i2k_tot=c('i2k_int') + c('i2k_phy')))
+    return polars_tools.missing_as_null(lf)
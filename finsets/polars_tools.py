@@ -0,0 +1,99 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/polars_tools.ipynb.
+
+# %% ../nbs/polars_tools.ipynb 3
+from __future__ import annotations
+from typing import List
+from functools import reduce
+import operator
+
+import pandas as pd
+try:
+    import polars as pl
+except ImportError: # Polars is optional; it is only needed for the `polars_features` functions
+    pl = None
+
+from . import feature_graph
+from .wrds import wrds_api
+
+# %% auto 0
+__all__ = ['OFFSETS', 'require_polars', 'from_pandas', 'to_pandas', 'Panel', 'compute', 'missing_as_null']
+
+# %% ../nbs/polars_tools.ipynb 5
+OFFSETS = {'D': 'd', 'W': 'w', 'M': 'mo', 'Q': 'q', 'A': 'y', 'Y': 'y'} # Pandas frequency -> Polars duration unit
+
+def require_polars():
+    "The `polars` module (raises an `ImportError` if it is not installed)"
+    if pl is None: raise ImportError("This function needs Polars: `pip install polars`")
+    return pl
+
+def from_pandas(df: pd.DataFrame, # Panel indexed by entity and period date, e.g. output of `process_raw_data`
+                ) -> pl.LazyFrame:
+    "`df` as a Polars LazyFrame, with the index levels as the first columns and period dates as the timestamps of their start"
+    return require_polars().from_arrow(wrds_api.to_arrow(df)).lazy()
+
+def to_pandas(lf: pl.LazyFrame|pl.DataFrame,
+              index: List[str], # Entity and date columns, e.g. `['permno', 'Mdate']`
+              freq: str, # Frequency of the date column, e.g. 'M'
+              ) -> pd.DataFrame:
+    "Collects `lf` into a `pandas` panel indexed by `index`, with the date column converted back to periods of frequency `freq`"
+    df = (lf.collect() if isinstance(lf, require_polars().LazyFrame) else lf).to_pandas()
+    df[index[1]] = df[index[1]].dt.to_period(freq)
+    return df.set_index(index)
+
+# %% ../nbs/polars_tools.ipynb 7
+class Panel:
+    "Polars expressions that match `pdm.lag`, `pdm.rdiff`, `pdm.rpct_change` and `pdm.rrolling`, for data sorted by `entity` and `time`"
+
+    def __init__(self, 
+                 entity: str, # Entity column, e.g. 'permno'
+                 time: str, # Date column, with the start of each period (see `from_pandas`)
+                 freq: str, # Frequency of `time`, e.g. 'M'
+                 ):
+        self.entity, self.time, self.unit = entity, time, OFFSETS[freq[0]]
+        self.index = [entity, time]
+
+    def _periods_back(self, rows: int, periods: int) -> pl.Expr:
+        "True where the row `rows` rows up is the same entity's observation from `periods` periods earlier"
+        e, t = pl.col(self.entity), pl.col(self.time)
+        return (e.shift(rows) == e) & (t.shift(rows) == t.dt.offset_by(f'-{periods}{self.unit}'))
+
+    def lag(self, x: pl.Expr, n: int=1) -> pl.Expr:
+        "`x` from `n` periods earlier (null if there is no observation of the entity then)"
+        return pl.coalesce([pl.when(self._periods_back(j, n)).then(x.shift(j)) for j in range(1, n + 1)])
+
+    def rdiff(self, x: pl.Expr, n: int=1) -> pl.Expr:
+        return x - self.lag(x, n)
+
+    def rpct_change(self, x: pl.Expr, n: int=1) -> pl.Expr:
+        return x / self.lag(x, n) - 1
+
+    def rrolling(self, x: pl.Expr, 
+                 func: str, # 'prod', or the name of a Polars rolling aggregation, e.g. 'std' for `rolling_std`
+                 window: int,
+                 ) -> pl.Expr:
+        "`func` of `x` over the last `window` periods; null if any of them is missing (as `pdm.rrolling` with `skipna=False`)"
+        if func == 'prod': value = reduce(operator.mul, [x.shift(k) for k in range(window)])
+        else: value = getattr(x, f'rolling_{func}')(window, min_samples=window)
+        return pl.when(self._periods_back(window - 1, window - 1)).then(value)
+
+# %% ../nbs/polars_tools.ipynb 9
+def compute(registry: dict, # Maps feature names to `(raw_inputs, deps, func)` tuples (see `feature_graph`)
+            exprs: dict, # Maps feature names to Polars expressions
+            lf: pl.LazyFrame, # Raw data
+            only: List[str]=None, # Features to compute. If None, all features in `registry`
+            ) -> pl.LazyFrame:
+    "`lf` with `only` and the features they depend on added as columns"
+    names = feature_graph.resolve(registry, only)
+    level = {}
+    for name in names: level[name] = 1 + max([level[dep] for dep in registry[name][1]], default=-1)
+    for l in range(max(level.values(), default=-1) + 1):
+        lf = lf.with_columns([exprs[name].alias(name) for name in names if level[name] == l])
+    return lf
+
+def missing_as_null(lf: pl.LazyFrame, 
+                    columns: List[str]=None, # If None, all float columns
+                    ) -> pl.LazyFrame:
+    "Replaces NaN and infinite values in the float `columns` of `lf` with nulls (the `pandas` features have NaN for both)"
+    schema = lf.collect_schema()
+    return lf.with_columns([pl.when(pl.col(c).is_finite()).then(pl.col(c)).alias(c) 
+                            for c in (columns or schema.names()) if schema[c].is_float()])
@@ -35,11 +35,7 @@ TIME_VAR_IN_CLEAN_DSET = f'{FREQ}date'
 def list_all_vars() -> pd.DataFrame:
     "Collects names of all available variables from WRDS f`{LIBRARY}.{TABLE}`."
 
-    try:
-        db = wrds_api.Connection()
-        df = db.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
-    finally:
-        db.close()
+    df = wrds_api.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
 
     return df[['name','type','wrds_library','wrds_table']].copy()
 
@@ -52,7 +48,7 @@ def parse_varlist(vars: List[str]=None,
     # Get all available variables and add suffixes needed for the SQL query
     suffix_mapping = {TABLE: 'a.'}
     all_avail_vars = list_all_vars().drop_duplicates(subset='name',keep='first').copy()
-    all_avail_vars['w_prefix'] = all_avail_vars.apply(lambda row: suffix_mapping[row['wrds_table']] + row['name'] , axis=1)
+    all_avail_vars['w_prefix'] = all_avail_vars['wrds_table'].map(suffix_mapping) + all_avail_vars['name']
 
     if vars == '*' or vars is None: return ','.join(list(all_avail_vars['w_prefix']))
     
@@ -60,7 +56,8 @@ def parse_varlist(vars: List[str]=None,
     vars_to_get =  required_vars + [x for x in list(set(vars)) if x not in required_vars]
 
     # Validate variables to be downloaded (make sure that they are in the target database)
-    invalid_vars = [v for v in vars_to_get if v not in list(all_avail_vars.name)]
+    avail_names = set(all_avail_vars['name'])
+    invalid_vars = [v for v in vars_to_get if v not in avail_names]
     if invalid_vars: raise ValueError(f"These vars are not in the database: {invalid_vars}") 
 
     # Extract information on which variable comes from which wrds table, so we know what prefix to use
@@ -75,11 +72,19 @@ def get_raw_data(
         required_vars: List[str]=['cusip','date'], #list of variables that will get downloaded, even if not in `vars`
         nrows: int=None, #Number of rows to download. If None, full dataset will be downloaded
         start_date: str=None, # Start date in MM/DD/YYYY format
-        end_date: str=None #End date in MM/DD/YYYY format
+        end_date: str=None, #End date in MM/DD/YYYY format
+        chunksize: int=None, # If not None, returns an iterator of DataFrames with `chunksize` rows each
+        shard_freq: str=None, # If 'Y' or 'M', splits the date range into yearly or monthly shards that are downloaded concurrently
+        max_workers: int=4, # Number of shards downloaded at the same time (if `shard_freq` is not None)
 ) -> pd.DataFrame:
     """Downloads `vars` from `start_date` to `end_date` from WRDS `{LIBRARY}.{TABLE}` library and adds PERMNO and PERMCO"""
  
     wrds_api.validate_dates([start_date, end_date])
+    if shard_freq is not None: # shards need both ends of the date range
+        if nrows is not None or chunksize is not None: raise ValueError("`nrows` and `chunksize` can not be used with `shard_freq`")
+        start_date = start_date or f'01/01/{MIN_YEAR}'
+        end_date = end_date or pd.Timestamp.today().strftime('%m/%d/%Y')
+
     vars = parse_varlist(vars, required_vars=required_vars)
 
     sql_string=f"""SELECT c.permno as permno, c.permco as permco, {vars}
@@ -91,8 +96,13 @@ def get_raw_data(
     if end_date is not None: sql_string += r" AND date <= %(end_date)s"
     if nrows is not None: sql_string += r" LIMIT %(nrows)s"
     
+    if shard_freq is not None:
+        return wrds_api.download_sharded(sql_string, shards=wrds_api.date_shards(start_date, end_date, freq=shard_freq),
+                                         max_workers=max_workers)
+
     return wrds_api.download(sql_string,
-                             params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows})
+                             params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows},
+                             chunksize=chunksize)
 
 # %% ../../nbs/01_wrds/07_bondret.ipynb 13
 def process_raw_data(
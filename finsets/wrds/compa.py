@@ -5,17 +5,20 @@
 # %% ../../nbs/01_wrds/03_compa.ipynb 2
 from __future__ import annotations
 from typing import List
+import re
 
 import pandas as pd
 import numpy as np
 
 import pandasmore as pdm
+from .. import feature_graph, polars_tools
 from . import wrds_api
 
 # %% auto 0
 __all__ = ['PROVIDER', 'URL', 'LIBRARY', 'TABLE', 'COMPANY_TABLE', 'FREQ', 'MIN_YEAR', 'MAX_YEAR', 'ENTITY_ID_IN_RAW_DSET',
-           'ENTITY_ID_IN_CLEAN_DSET', 'TIME_VAR_IN_RAW_DSET', 'TIME_VAR_IN_CLEAN_DSET', 'list_all_vars',
-           'default_raw_vars', 'parse_varlist', 'get_raw_data', 'process_raw_data', 'features']
+           'ENTITY_ID_IN_CLEAN_DSET', 'TIME_VAR_IN_RAW_DSET', 'TIME_VAR_IN_CLEAN_DSET', 'DTYPES', 'FEATURES',
+           'SQL_FEATURES', 'list_all_vars', 'default_raw_vars', 'parse_varlist', 'get_raw_data', 'process_raw_data',
+           'features', 'polars_features']
 
 # %% ../../nbs/01_wrds/03_compa.ipynb 3
 PROVIDER = 'Wharton Research Data Services (WRDS)'
@@ -30,17 +33,16 @@ ENTITY_ID_IN_RAW_DSET = 'gvkey'
 ENTITY_ID_IN_CLEAN_DSET = 'gvkey'
 TIME_VAR_IN_RAW_DSET = 'datadate'
 TIME_VAR_IN_CLEAN_DSET = f'{FREQ}date'
+# Compact dtypes of raw variables, applied while downloading with `get_raw_data(compact=True)` (see `wrds_api.dtype_plan`)
+DTYPES = {'gvkey': 'category', 'cusip': 'category', 'cik': 'category', 'tic': 'category', 'fic': 'category', 'sic': 'category', 
+          'naics': 'category', 'sich': 'category', 'naicsh': 'category'}
 
 # %% ../../nbs/01_wrds/03_compa.ipynb 4
 def list_all_vars() -> pd.DataFrame:
     "Collects names of all available variables from WRDS f`{LIBRARY}.{TABLE}` and `{LIBRARY}.{COMPANY_TABLE}`."
 
-    try:
-        db = wrds_api.Connection()
-        funda = db.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
-        fundn = db.describe_table(LIBRARY,COMPANY_TABLE).assign(wrds_library=LIBRARY, wrds_table=COMPANY_TABLE)
-    finally:
-        db.close()
+    funda = wrds_api.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
+    fundn = wrds_api.describe_table(LIBRARY,COMPANY_TABLE).assign(wrds_library=LIBRARY, wrds_table=COMPANY_TABLE)
 
     return pd.concat([funda,fundn])[['name','type','wrds_library','wrds_table']].copy()
 
@@ -67,7 +69,7 @@ def parse_varlist(vars: List[str]=None,
     # Get all available variables and add suffixes needed for the SQL query
     suffix_mapping = {TABLE: 'a.', COMPANY_TABLE: 'b.'}
     all_avail_vars = list_all_vars().drop_duplicates(subset='name',keep='first').copy()
-    all_avail_vars['w_prefix'] = all_avail_vars.apply(lambda row: suffix_mapping[row['wrds_table']] + row['name'] , axis=1)
+    all_avail_vars['w_prefix'] = all_avail_vars['wrds_table'].map(suffix_mapping) + all_avail_vars['name']
 
     if vars == '*': return ','.join(list(all_avail_vars['w_prefix']))
     
@@ -76,7 +78,8 @@ def parse_varlist(vars: List[str]=None,
     vars_to_get =  required_vars + [x for x in list(set(vars)) if x not in required_vars]
 
     # Validate variables to be downloaded (make sure that they are in the target database)
-    invalid_vars = [v for v in vars_to_get if v not in list(all_avail_vars.name)]
+    avail_names = set(all_avail_vars['name'])
+    invalid_vars = [v for v in vars_to_get if v not in avail_names]
     if invalid_vars: raise ValueError(f"These vars are not in the database: {invalid_vars}") 
 
     # Extract information on which variable comes from which wrds table, so we know what prefix to use
@@ -91,12 +94,26 @@ def get_raw_data(
         required_vars: List[str]=['gvkey','datadate'], #list of variables that will get downloaded, even if not in `vars`
         nrows: int=None, #Number of rows to download. If None, full dataset will be downloaded
         start_date: str=None, # Start date in MM/DD/YYYY format
-        end_date: str=None #End date in MM/DD/YYYY format
+        end_date: str=None, #End date in MM/DD/YYYY format
+        chunksize: int=None, # If not None, returns an iterator of DataFrames with `chunksize` rows each
+        compact: bool=False, # If True, decodes columns into the compact dtypes in `DTYPES` (e.g. categoricals, 32-bit ids) while downloading
+        dtype_backend: str='numpy_nullable', # If 'pyarrow', columns are backed by pyarrow arrays, which `process_raw_data` and `features` keep (see `wrds_api.pyarrow_backed`)
+        for_features: List[str]=None, # If given, also downloads the raw variables needed to compute these features (see `FEATURES`); `vars=None` then means no other variables
+        sql_features: List[str]=None, # If given, WRDS computes these features (see `SQL_FEATURES`) and only they are downloaded, not their raw variables; `vars=None` then means no other variables
 ) -> pd.DataFrame:
     """Downloads `vars` from `start_date` to `end_date` from WRDS `{LIBRARY}.{TABLE}` library """
  
     wrds_api.validate_dates([start_date, end_date])
+    dtypes = wrds_api.dtype_plan(DTYPES, [(LIBRARY, TABLE), (LIBRARY, COMPANY_TABLE)]) if compact else None
+    if for_features is not None and vars != '*':
+        vars = list(dict.fromkeys((vars or []) + feature_graph.raw_inputs(FEATURES, for_features)))
+    if sql_features is not None and vars is None: vars = []
     vars = parse_varlist(vars, required_vars=required_vars)
+    if sql_features is not None:
+        return wrds_api.download(_sql_features_query(vars, sql_features, start_date, end_date, nrows),
+                                 params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows, 
+                                         'lag_start_date': start_date and f'01/01/{pd.Timestamp(start_date).year - 1}'},
+                                 chunksize=chunksize, dtypes=dtypes, dtype_backend=dtype_backend)
 
     sql_string=f"""SELECT  {vars}  
                     FROM {LIBRARY}.{TABLE} as a 
@@ -108,7 +125,8 @@ def get_raw_data(
     if nrows is not None: sql_string += r" LIMIT %(nrows)s"
     
     return wrds_api.download(sql_string,
-                             params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows})
+                             params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows},
+                             chunksize=chunksize, dtypes=dtypes, dtype_backend=dtype_backend)
 
 # %% ../../nbs/01_wrds/03_compa.ipynb 19
 def process_raw_data(
@@ -120,13 +138,13 @@ def process_raw_data(
     # Change some variables to categorical
     for col in ['gvkey','naics','sic','fic','cik','tic','cusip']:
         if col in df.columns:
-            df[col] = df[col].astype('string').astype('category')
+            df[col] = wrds_api.categorical(df[col])
 
     if 'sich' in df.columns:
-        df['sich'] = df['sich'].astype('Int64').astype('string').str.zfill(4).astype('category')
+        df['sich'] = wrds_api.categorical(df['sich'], lambda x: x.astype('Int64').astype('string').str.zfill(4))
 
     if 'naicsh' in df.columns:
-        df['naicsh'] = df['naicsh'].astype('Int64').astype('string').astype('category')
+        df['naicsh'] = wrds_api.categorical(df['naicsh'], lambda x: x.astype('Int64').astype('string'))
 
     # Set up panel structure
     df = pdm.setup_panel(df, panel_ids=ENTITY_ID_IN_RAW_DSET, time_var=TIME_VAR_IN_RAW_DSET, freq=FREQ, 
@@ -134,67 +152,186 @@ def process_raw_data(
                          **clean_kwargs)
     return df 
 
-# %% ../../nbs/01_wrds/03_compa.ipynb 22
-def features(df: pd.DataFrame=None
-             ) -> pd.DataFrame:
+# %% ../../nbs/01_wrds/03_compa.ipynb 23
+def _pref_stock(df, out):
+    pref_stock = np.where(df['pstkrv'].isnull(), df['pstkl'], df['pstkrv'])
+    return np.where(pd.isnull(pref_stock), out['pstk0'], pref_stock)
 
-    out = pd.DataFrame(index=df.index)
+def _shreq(df, out):
+    shreq = np.where(df['seq'].isnull(), df['ceq'] + out['pstk0'], df['seq'])
+    return np.where(pd.isnull(shreq), df['at'] - df['lt'] - df['mib'].fillna(0), shreq)
 
+FEATURES = {
     # industry 
-    out['sic_full'] = df['sich'].astype('object').fillna(df['sic'].astype('object')).astype('category')
-    out['naics_full'] = df['naicsh'].astype('object').fillna(df['naics'].astype('object')).astype('category')
+    'sic_full': (['sich','sic'], [], lambda df, out: df['sich'].astype('object').fillna(df['sic'].astype('object')).astype('category')),
+    'naics_full': (['naicsh','naics'], [], lambda df, out: df['naicsh'].astype('object').fillna(df['naics'].astype('object')).astype('category')),
 
     # size 
-    out['stock_price'] = np.abs(df['prcc_f'])
-    out['lag_at'] = pdm.lag(df[['at']])
-    out['mktcap'] = out['stock_price'] * df['csho']
+    'stock_price': (['prcc_f'], [], lambda df, out: np.abs(df['prcc_f'])),
+    'lag_at': (['at'], [], lambda df, out: pdm.lag(df['at'])),
+    'mktcap': (['csho'], ['stock_price'], lambda df, out: out['stock_price'] * df['csho']),
 
     # book equity vars
-    out['pstk0'] = df['pstk'].fillna(0)
-    out['pref_stock'] = np.where(df['pstkrv'].isnull(), df['pstkl'], df['pstkrv'])
-    out['pref_stock'] = np.where(out['pref_stock'].isnull(),out['pstk0'], out['pref_stock'])
-    out['shreq'] = np.where(df['seq'].isnull(), df['ceq'] + out['pstk0'], df['seq'])
-    out['shreq'] = np.where(out['shreq'].isnull(), df['at'] - df['lt'] - df['mib'].fillna(0), out['shreq'])
-    out['bookeq'] = out['shreq'] + df['txditc'].fillna(0) + df['itcb'].fillna(0) - out['pref_stock']
-    #out['bookeq_w_itcb'] = out['bookeq'] + df['itcb'].fillna(0)
+    'pstk0': (['pstk'], [], lambda df, out: df['pstk'].fillna(0)),
+    'pref_stock': (['pstkrv','pstkl'], ['pstk0'], _pref_stock),
+    'shreq': (['seq','ceq','at','lt','mib'], ['pstk0'], _shreq),
+    'bookeq': (['txditc','itcb'], ['shreq','pref_stock'], 
+               lambda df, out: out['shreq'] + df['txditc'].fillna(0) + df['itcb'].fillna(0) - out['pref_stock']),
 
-    out['tobinq'] = (df['at'] - out['bookeq'] + out['stock_price'] * df['csho']) / df['at']
+    'tobinq': (['at','csho'], ['bookeq','stock_price'], lambda df, out: (df['at'] - out['bookeq'] + out['stock_price'] * df['csho']) / df['at']),
 
     # issuance vars
-    out['equityiss_tot'] = (pdm.rdiff(out['bookeq']) - pdm.rdiff(df['re'])) 
-    out['equityiss_cfs'] = (df['sstk'].fillna(0) - df['prstkc'].fillna(0))
-    out['debtiss_tot'] = (pdm.rdiff(df['at']) - pdm.rdiff(out['bookeq'])) 
-    out['debtiss_cfs'] = (df['dltis'].fillna(0) - df['dltr'].fillna(0)) 
-    out['debtiss_bs'] = (pdm.rdiff(df['dltt']) + pdm.rdiff(df['dlc'].fillna(0))) 
-    for v in ['equityiss_tot','equityiss_cfs','debtiss_tot','debtiss_cfs','debtiss_bs']:
-        out[f'{v}_2la'] = out[v] / out['lag_at']
+    'equityiss_tot': (['re'], ['bookeq'], lambda df, out: pdm.rdiff(out['bookeq']) - pdm.rdiff(df['re'])),
+    'equityiss_cfs': (['sstk','prstkc'], [], lambda df, out: df['sstk'].fillna(0) - df['prstkc'].fillna(0)),
+    'debtiss_tot': (['at'], ['bookeq'], lambda df, out: pdm.rdiff(df['at']) - pdm.rdiff(out['bookeq'])),
+    'debtiss_cfs': (['dltis','dltr'], [], lambda df, out: df['dltis'].fillna(0) - df['dltr'].fillna(0)),
+    'debtiss_bs': (['dltt','dlc'], [], lambda df, out: pdm.rdiff(df['dltt']) + pdm.rdiff(df['dlc'].fillna(0))),
+    **{f'{v}_2la': ([], [v,'lag_at'], lambda df, out, v=v: out[v] / out['lag_at']) 
+       for v in ['equityiss_tot','equityiss_cfs','debtiss_tot','debtiss_cfs','debtiss_bs']},
 
     # investment vars
-    out['ppent_pch'] = pdm.rpct_change(df['ppent'])
-    out['capx_2la'] = df['capx'] / out['lag_at']
+    'ppent_pch': (['ppent'], [], lambda df, out: pdm.rpct_change(df['ppent'])),
+    'capx_2la': (['capx'], ['lag_at'], lambda df, out: df['capx'] / out['lag_at']),
 
     # profitability vars
-    out['roa'] = df['ib'] / df['at']
+    'roa': (['ib','at'], [], lambda df, out: df['ib'] / df['at']),
 
     # cash flow vars
-    out['cflow_is'] = df['ib']+df['dp']
-    out['cflow_cfs'] = df['oancf'] 
-    out['cflow_full'] = np.where(df.dtdate.dt.year<=1987, out['cflow_is'], out['cflow_cfs'])
-    for v in ['cflow_is','cflow_cfs','cflow_full']:
-        out[f'{v}_2la'] = out[v] / out['lag_at']
+    'cflow_is': (['ib','dp'], [], lambda df, out: df['ib'] + df['dp']),
+    'cflow_cfs': (['oancf'], [], lambda df, out: df['oancf']),
+    'cflow_full': ([], ['cflow_is','cflow_cfs'], lambda df, out: np.where(df.dtdate.dt.year<=1987, out['cflow_is'], out['cflow_cfs'])),
+    **{f'{v}_2la': ([], [v,'lag_at'], lambda df, out, v=v: out[v] / out['lag_at']) for v in ['cflow_is','cflow_cfs','cflow_full']},
 
     # liquidity vars
-    out['cash_2a'] = df['che'] / df['at']
+    'cash_2a': (['che','at'], [], lambda df, out: df['che'] / df['at']),
 
     # leverage vars
-    out['booklev'] = (df['dltt'] + df['dlc']) / df['at']
-    out.loc[out.booklev<0, 'booklev'] = 0
-    out.loc[out.booklev>1, 'booklev'] = 1
+    'booklev': (['dltt','dlc','at'], [], lambda df, out: ((df['dltt'] + df['dlc']) / df['at']).clip(0, 1)),
 
     # payout vars
-    out['dividends_2la'] = (df['dvc'].fillna(0) + df['dvp'].fillna(0)) / out['lag_at']
-    out['repurchases_2la'] = (df['prstkc'].fillna(0) - pdm.rdiff(df['pstkrv']).fillna(0)) / out['lag_at']
-
-    out = out.replace([np.inf, -np.inf], np.nan)
-    return out 
+    'dividends_2la': (['dvc','dvp'], ['lag_at'], lambda df, out: (df['dvc'].fillna(0) + df['dvp'].fillna(0)) / out['lag_at']),
+    'repurchases_2la': (['prstkc','pstkrv'], ['lag_at'], 
+                        lambda df, out: (df['prstkc'].fillna(0) - pdm.rdiff(df['pstkrv']).fillna(0)) / out['lag_at']),
+}
+
+# %% ../../nbs/01_wrds/03_compa.ipynb 24
+def features(df: pd.DataFrame=None,
+             only: List[str]=None, # Features to compute (keys of `FEATURES`). If None, computes all of them
+             ) -> pd.DataFrame:
+    """Computes `only` (or all features in `FEATURES`) from `df`"""
+
+    given = df[[f for f in SQL_FEATURES if f in df.columns]]
+    out = feature_graph.compute(FEATURES, df, only, given=given if len(given.columns) else None)
+    return wrds_api.backend_like(out.replace([np.inf, -np.inf], np.nan), df)
+
+# %% ../../nbs/01_wrds/03_compa.ipynb 28
+SQL_FEATURES = {
+    'stock_price': "ABS(prcc_f)",
+    'lag_at': "LAG[at]",
+    'mktcap': "{stock_price} * csho",
+    'pstk0': "COALESCE(pstk, 0)",
+    'pref_stock': "COALESCE(pstkrv, pstkl, {pstk0})",
+    'shreq': "COALESCE(seq, ceq + {pstk0}, at - lt - COALESCE(mib, 0))",
+    'bookeq': "{shreq} + COALESCE(txditc, 0) + COALESCE(itcb, 0) - {pref_stock}",
+    'tobinq': "(at - {bookeq} + {stock_price} * csho) / NULLIF(at, 0)",
+    'equityiss_tot': "({bookeq} - LAG[{bookeq}]) - (re - LAG[re])",
+    'equityiss_cfs': "COALESCE(sstk, 0) - COALESCE(prstkc, 0)",
+    'debtiss_tot': "(at - LAG[at]) - ({bookeq} - LAG[{bookeq}])",
+    'debtiss_cfs': "COALESCE(dltis, 0) - COALESCE(dltr, 0)",
+    'debtiss_bs': "(dltt - LAG[dltt]) + (COALESCE(dlc, 0) - LAG[COALESCE(dlc, 0)])",
+    'ppent_pch': "ppent / NULLIF(LAG[ppent], 0) - 1",
+    'capx_2la': "capx / NULLIF({lag_at}, 0)",
+    'roa': "ib / NULLIF(at, 0)",
+    'cflow_is': "ib + dp",
+    'cflow_cfs': "oancf",
+    'cflow_full': "CASE WHEN EXTRACT(YEAR FROM datadate) <= 1987 THEN {cflow_is} ELSE {cflow_cfs} END",
+    'cash_2a': "che / NULLIF(at, 0)",
+    # as `clip(0, 1)`, which turns the infinite ratios of positive (negative) debt to zero assets into 1 (0)
+    'booklev': """CASE WHEN dltt + dlc IS NULL OR at IS NULL THEN NULL WHEN at <> 0 THEN LEAST(GREATEST((dltt + dlc) / at, 0), 1) 
+                       WHEN dltt + dlc > 0 THEN 1 WHEN dltt + dlc < 0 THEN 0 END""",
+    'dividends_2la': "(COALESCE(dvc, 0) + COALESCE(dvp, 0)) / NULLIF({lag_at}, 0)",
+    'repurchases_2la': "(COALESCE(prstkc, 0) - COALESCE(pstkrv - LAG[pstkrv], 0)) / NULLIF({lag_at}, 0)",
+    **{f'{v}_2la': f"{{{v}}} / NULLIF({{lag_at}}, 0)" 
+       for v in ['equityiss_tot','equityiss_cfs','debtiss_tot','debtiss_cfs','debtiss_bs','cflow_is','cflow_cfs','cflow_full']},
+}
+
+_SQL_LAG = "CASE WHEN EXTRACT(YEAR FROM LAG(datadate) OVER w) = EXTRACT(YEAR FROM datadate) - 1 THEN LAG({}) OVER w END"
+
+def _sql_feature(name: str) -> str:
+    "SQL expression of feature `name`, with the features it uses written out"
+    sql = re.sub(r'\{(\w+)\}', lambda m: f'({_sql_feature(m.group(1))})', SQL_FEATURES[name])
+    return re.sub(r'LAG\[(.*?)\]', lambda m: _SQL_LAG.format(m.group(1)), sql)
+
+def _sql_features_query(vars: str, # Variables to download along with the features, as returned by `parse_varlist`
+                        sql_features: List[str], # Keys of `SQL_FEATURES`
+                        start_date: str=None, end_date: str=None, nrows: int=None,
+                        ) -> str:
+    "Query that computes `sql_features` in WRDS and returns them along with `vars`"
+
+    unknown = [f for f in sql_features if f not in SQL_FEATURES]
+    if unknown: raise ValueError(f"These features cannot be computed by WRDS: {unknown}")
+    inputs = parse_varlist(['gvkey','datadate'] + feature_graph.raw_inputs(FEATURES, sql_features))
+    columns = ','.join(dict.fromkeys(vars.split(',') + inputs.split(',')))
+    features = ', '.join(f'{_sql_feature(f)} AS {f}' for f in sql_features)
+
+    sql_string=f"""SELECT DISTINCT ON (a.gvkey, EXTRACT(YEAR FROM a.datadate)) {columns}
+                    FROM {LIBRARY}.{TABLE} as a 
+                    LEFT JOIN {LIBRARY}.{COMPANY_TABLE} as b ON a.gvkey = b.gvkey
+                    WHERE  indfmt='INDL' AND datafmt='STD' AND popsrc='D' AND consol='C'
+                """
+    if start_date is not None: sql_string += r" AND a.datadate >= %(lag_start_date)s"
+    if end_date is not None: sql_string += r" AND a.datadate <= %(end_date)s"
+    sql_string += " ORDER BY a.gvkey, EXTRACT(YEAR FROM a.datadate), a.datadate DESC"
 
+    sql_string = f"""SELECT {','.join(v.split('.')[-1] for v in vars.split(','))}, {features} 
+                     FROM ({sql_string}) AS a WINDOW w AS (PARTITION BY gvkey ORDER BY datadate)"""
+    sql_string = f"SELECT * FROM ({sql_string}) AS f WHERE 1 = 1"
+    if start_date is not None: sql_string += r" AND datadate >= %(start_date)s"
+    if nrows is not None: sql_string += r" LIMIT %(nrows)s"
+    return sql_string
+
+# %% ../../nbs/01_wrds/03_compa.ipynb 33
+def _polars_exprs(p: polars_tools.Panel) -> dict:
+    "Polars expressions of the features in `FEATURES`"
+    pl = polars_tools.require_polars()
+    c = pl.col
+    exprs = {
+        'sic_full': pl.coalesce(c('sich').cast(pl.String), c('sic').cast(pl.String)).cast(pl.Categorical),
+        'naics_full': pl.coalesce(c('naicsh').cast(pl.String), c('naics').cast(pl.String)).cast(pl.Categorical),
+        'stock_price': c('prcc_f').abs(),
+        'lag_at': p.lag(c('at')),
+        'mktcap': c('stock_price') * c('csho'),
+        'pstk0': c('pstk').fill_null(0),
+        'pref_stock': pl.coalesce(c('pstkrv'), c('pstkl'), c('pstk0')),
+        'shreq': pl.coalesce(c('seq'), c('ceq') + c('pstk0'), c('at') - c('lt') - c('mib').fill_null(0)),
+        'bookeq': c('shreq') + c('txditc').fill_null(0) + c('itcb').fill_null(0) - c('pref_stock'),
+        'tobinq': (c('at') - c('bookeq') + c('stock_price') * c('csho')) / c('at'),
+        'equityiss_tot': p.rdiff(c('bookeq')) - p.rdiff(c('re')),
+        'equityiss_cfs': c('sstk').fill_null(0) - c('prstkc').fill_null(0),
+        'debtiss_tot': p.rdiff(c('at')) - p.rdiff(c('bookeq')),
+        'debtiss_cfs': c('dltis').fill_null(0) - c('dltr').fill_null(0),
+        'debtiss_bs': p.rdiff(c('dltt')) + p.rdiff(c('dlc').fill_null(0)),
+        'ppent_pch': p.rpct_change(c('ppent')),
+        'capx_2la': c('capx') / c('lag_at'),
+        'roa': c('ib') / c('at'),
+        'cflow_is': c('ib') + c('dp'),
+        'cflow_cfs': c('oancf'),
+        'cflow_full': pl.when(c('dtdate').dt.year() <= 1987).then(c('cflow_is')).otherwise(c('cflow_cfs')),
+        'cash_2a': c('che') / c('at'),
+        'booklev': ((c('dltt') + c('dlc')) / c('at')).clip(0, 1),
+        'dividends_2la': (c('dvc').fill_null(0) + c('dvp').fill_null(0)) / c('lag_at'),
+        'repurchases_2la': (c('prstkc').fill_null(0) - p.rdiff(c('pstkrv')).fill_null(0)) / c('lag_at'),
+    }
+    for v in ['equityiss_tot','equityiss_cfs','debtiss_tot','debtiss_cfs','debtiss_bs','cflow_is','cflow_cfs','cflow_full']:
+        exprs[f'{v}_2la'] = c(v) / c('lag_at')
+    return exprs
+
+def polars_features(lf: pl.LazyFrame, # Output of `process_raw_data`, as a LazyFrame (see `polars_tools.from_pandas`)
+                    only: List[str]=None, # Features to compute (keys of `FEATURES`). If None, computes all of them
+                    ) -> pl.LazyFrame:
+    """Polars version of `features`"""
+
+    p = polars_tools.Panel(ENTITY_ID_IN_CLEAN_DSET, TIME_VAR_IN_CLEAN_DSET, FREQ)
+    names = list(FEATURES) if only is None else list(only)
+    lf = polars_tools.compute(FEATURES, _polars_exprs(p), lf.sort(p.index), only)
+    return polars_tools.missing_as_null(lf.select(p.index + names), names)
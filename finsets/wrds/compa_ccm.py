@@ -10,12 +10,14 @@ import pandas as pd
 import numpy as np
 
 import pandasmore as pdm
-from . import wrds_api
+from .. import feature_graph
+from . import wrds_api, linking, compa
 
 # %% auto 0
 __all__ = ['PROVIDER', 'URL', 'LIBRARY', 'TABLE', 'LINK_LIBRARY', 'LINK_TABLE', 'COMPANY_TABLE', 'FREQ', 'MIN_YEAR', 'MAX_YEAR',
            'ENTITY_ID_IN_RAW_DSET', 'ENTITY_ID_IN_CLEAN_DSET', 'TIME_VAR_IN_RAW_DSET', 'TIME_VAR_IN_CLEAN_DSET',
-           'list_all_vars', 'default_raw_vars', 'parse_varlist', 'get_raw_data', 'process_raw_data', 'features']
+           'DTYPES', 'FEATURES', 'list_all_vars', 'default_raw_vars', 'parse_varlist', 'get_raw_data',
+           'process_raw_data', 'features']
 
 # %% ../../nbs/01_wrds/03_compa_ccm.ipynb 3
 PROVIDER = 'Wharton Research Data Services (WRDS)'
@@ -32,17 +34,16 @@ ENTITY_ID_IN_RAW_DSET = 'permno'
 ENTITY_ID_IN_CLEAN_DSET = 'permno'
 TIME_VAR_IN_RAW_DSET = 'datadate'
 TIME_VAR_IN_CLEAN_DSET = f'{FREQ}date'
+# Compact dtypes of raw variables, applied while downloading with `get_raw_data(compact=True)` (see `wrds_api.dtype_plan`)
+DTYPES = {'gvkey': 'category', 'cusip': 'category', 'cik': 'category', 'tic': 'category', 'fic': 'category', 'sic': 'category', 
+          'naics': 'category', 'sich': 'category', 'naicsh': 'category', 'linkprim': 'category', 'liid': 'category'}
 
 # %% ../../nbs/01_wrds/03_compa_ccm.ipynb 4
 def list_all_vars() -> pd.DataFrame:
     "Collects names of all available variables from WRDS f`{LIBRARY}.{TABLE}` and `{LIBRARY}.{COMPANY_TABLE}`."
 
-    try:
-        db = wrds_api.Connection()
-        funda = db.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
-        fundn = db.describe_table(LIBRARY,COMPANY_TABLE).assign(wrds_library=LIBRARY, wrds_table=COMPANY_TABLE)
-    finally:
-        db.close()
+    funda = wrds_api.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
+    fundn = wrds_api.describe_table(LIBRARY,COMPANY_TABLE).assign(wrds_library=LIBRARY, wrds_table=COMPANY_TABLE)
 
     return pd.concat([funda,fundn])[['name','type','wrds_library','wrds_table']].copy()
 
@@ -69,7 +70,7 @@ def parse_varlist(vars: List[str]=None,
     # Get all available variables and add suffixes needed for the SQL query
     suffix_mapping = {TABLE: 'a.', COMPANY_TABLE: 'b.'}
     all_avail_vars = list_all_vars().drop_duplicates(subset='name',keep='first').copy()
-    all_avail_vars['w_prefix'] = all_avail_vars.apply(lambda row: suffix_mapping[row['wrds_table']] + row['name'] , axis=1)
+    all_avail_vars['w_prefix'] = all_avail_vars['wrds_table'].map(suffix_mapping) + all_avail_vars['name']
 
     if vars == '*': return ','.join(list(all_avail_vars['w_prefix']))
     
@@ -78,7 +79,8 @@ def parse_varlist(vars: List[str]=None,
     vars_to_get =  required_vars + [x for x in list(set(vars)) if x not in required_vars]
 
     # Validate variables to be downloaded (make sure that they are in the target database)
-    invalid_vars = [v for v in vars_to_get if v not in list(all_avail_vars.name)]
+    avail_names = set(all_avail_vars['name'])
+    invalid_vars = [v for v in vars_to_get if v not in avail_names]
     if invalid_vars: raise ValueError(f"These vars are not in the database: {invalid_vars}") 
 
     # Extract information on which variable comes from which wrds table, so we know what prefix to use
@@ -93,11 +95,31 @@ def get_raw_data(
         required_vars: List[str]=['gvkey','datadate'], #list of variables that will get downloaded, even if not in `vars`
         nrows: int=None, #Number of rows to download. If None, full dataset will be downloaded
         start_date: str=None, # Start date in MM/DD/YYYY format
-        end_date: str=None #End date in MM/DD/YYYY format
+        end_date: str=None, #End date in MM/DD/YYYY format
+        chunksize: int=None, # If not None, returns an iterator of DataFrames with `chunksize` rows each
+        compact: bool=False, # If True, decodes columns into the compact dtypes in `DTYPES` (e.g. categoricals, 32-bit ids) while downloading
+        dtype_backend: str='numpy_nullable', # If 'pyarrow', columns are backed by pyarrow arrays, which `process_raw_data` and `features` keep (see `wrds_api.pyarrow_backed`)
+        for_features: List[str]=None, # If given, also downloads the raw variables needed to compute these features (see `FEATURES`); `vars=None` then means no other variables
+        link_locally: bool=False, # If True, downloads `compa` data and adds the CCM links locally (see `linking.add_permno`)
 ) -> pd.DataFrame:
     """Downloads `vars` from `start_date` to `end_date` from WRDS `{LIBRARY}.{TABLE}` library and adds PERMNO and PERMCO as in CCM"""
  
     wrds_api.validate_dates([start_date, end_date])
+    dtypes = {**wrds_api.dtype_plan(DTYPES, [(LIBRARY, TABLE), (LIBRARY, COMPANY_TABLE), (LINK_LIBRARY, LINK_TABLE)]), 'permno': 'Int32', 'permco': 'Int32'} if compact else None
+    if for_features is not None and vars != '*':
+        vars = list(dict.fromkeys((vars or []) + feature_graph.raw_inputs(FEATURES, for_features)))
+    if link_locally:
+        linking.ccm_links() # downloaded first: a chunked download holds its connection until it is exhausted
+        link = lambda chunk: wrds_api.apply_dtypes(linking.add_permno(chunk, linkprim=None).reset_index(drop=True), dtypes, dtype_backend)
+        if chunksize is None and nrows is None:
+            return link(compa.get_raw_data(vars, required_vars=required_vars, start_date=start_date, end_date=end_date, 
+                                          compact=compact, dtype_backend=dtype_backend))
+        # `nrows` counts linked rows, as on the server, so the unlinked data is streamed until there are enough of them
+        chunks = compa.get_raw_data(vars, required_vars=required_vars, start_date=start_date, end_date=end_date, 
+                                   chunksize=chunksize or max(nrows, 10_000), compact=compact, dtype_backend=dtype_backend)
+        linked = linking.link_chunks(chunks, link, nrows)
+        return linked if chunksize is not None else wrds_api.concat(linked)
+
     vars = parse_varlist(vars, required_vars=required_vars)
 
     sql_string=f"""SELECT c.lpermno as permno, c.lpermco as permco, c.liid, c.linkprim as linkprim, {vars}
@@ -113,7 +135,8 @@ def get_raw_data(
     if nrows is not None: sql_string += r" LIMIT %(nrows)s"
     
     return wrds_api.download(sql_string,
-                             params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows})
+                             params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows},
+                             chunksize=chunksize, dtypes=dtypes, dtype_backend=dtype_backend)
 
 # %% ../../nbs/01_wrds/03_compa_ccm.ipynb 18
 def process_raw_data(
@@ -128,79 +151,28 @@ def process_raw_data(
     # Change some variables to categorical
     for col in ['gvkey','naics','sic','fic','cik','tic','cusip']:
         if col in df.columns:
-            df[col] = df[col].astype('string').astype('category')
+            df[col] = wrds_api.categorical(df[col])
 
     if 'sich' in df.columns:
-        df['sich'] = df['sich'].astype('Int64').astype('string').str.zfill(4).astype('category')
+        df['sich'] = wrds_api.categorical(df['sich'], lambda x: x.astype('Int64').astype('string').str.zfill(4))
 
     if 'naicsh' in df.columns:
-        df['naicsh'] = df['naicsh'].astype('Int64').astype('string').astype('category')
+        df['naicsh'] = wrds_api.categorical(df['naicsh'], lambda x: x.astype('Int64').astype('string'))
 
     # Set up panel structure
     df = pdm.setup_panel(df, panel_ids=ENTITY_ID_IN_RAW_DSET, time_var=TIME_VAR_IN_RAW_DSET, freq=FREQ, panel_ids_toint=False, **clean_kwargs)
     return df 
 
-# %% ../../nbs/01_wrds/03_compa_ccm.ipynb 21
-def features(df: pd.DataFrame=None
-             ) -> pd.DataFrame:
+# %% ../../nbs/01_wrds/03_compa_ccm.ipynb 22
+FEATURES = {**compa.FEATURES, 
+            'cflow_full': ([], ['cflow_is','cflow_cfs'], 
+                           lambda df, out: np.where(df.dtdate.dt.year<1987, out['cflow_is'], out['cflow_cfs']))}
 
-    out = pd.DataFrame(index=df.index)
-
-    # industry 
-    out['sic_full'] = df['sich'].astype('object').fillna(df['sic'].astype('object')).astype('category')
-    out['naics_full'] = df['naicsh'].astype('object').fillna(df['naics'].astype('object')).astype('category')
-
-    # size 
-    out['stock_price'] = np.abs(df['prcc_f'])
-    out['lag_at'] = pdm.lag(df['at'])
-    out['mktcap'] = out['stock_price'] * df['csho']
-
-    # book equity vars
-    out['pstk0'] = df['pstk'].fillna(0)
-    out['pref_stock'] = np.where(df['pstkrv'].isnull(), df['pstkl'], df['pstkrv'])
-    out['pref_stock'] = np.where(out['pref_stock'].isnull(),out['pstk0'], out['pref_stock'])
-    out['shreq'] = np.where(df['seq'].isnull(), df['ceq'] + out['pstk0'], df['seq'])
-    out['shreq'] = np.where(out['shreq'].isnull(), df['at'] - df['lt'] - df['mib'].fillna(0), out['shreq'])
-    out['bookeq'] = out['shreq'] + df['txditc'].fillna(0) + df['itcb'].fillna(0) - out['pref_stock']
-    #out['bookeq_w_itcb'] = out['bookeq'] + df['itcb'].fillna(0)
-
-    out['tobinq'] = (df['at'] - out['bookeq'] + out['mktcap']) / df['at']
-
-    # issuance vars
-    out['equityiss_tot'] = (pdm.rdiff(out['bookeq']) - pdm.rdiff(df['re'])) 
-    out['equityiss_cfs'] = (df['sstk'].fillna(0) - df['prstkc'].fillna(0))
-    out['debtiss_tot'] = (pdm.rdiff(df['at']) - pdm.rdiff(out['bookeq'])) 
-    out['debtiss_cfs'] = (df['dltis'].fillna(0) - df['dltr'].fillna(0)) 
-    out['debtiss_bs'] = (pdm.rdiff(df['dltt']) + pdm.rdiff(df['dlc'].fillna(0))) 
-    for v in ['equityiss_tot','equityiss_cfs','debtiss_tot','debtiss_cfs','debtiss_bs']:
-        out[f'{v}_2la'] = out[v] / out['lag_at']
-
-    # investment vars
-    out['ppent_pch'] = pdm.rpct_change(df['ppent'])
-    out['capx_2la'] = df['capx'] / out['lag_at']
-
-    # profitability vars
-    out['roa'] = df['ib'] / df['at']
-
-    # cash flow vars
-    out['cflow_is'] = (df['ib']+df['dp']) 
-    out['cflow_cfs'] = df['oancf'] 
-    out['cflow_full'] = np.where(df.dtdate.dt.year<1987, out['cflow_is'], out['cflow_cfs'])
-    for v in ['cflow_is','cflow_cfs','cflow_full']:
-        out[f'{v}_2la'] = out[v] / out['lag_at']
-
-    # liquidity vars
-    out['cash_2a'] = df['che'] / df['at']
-
-    # leverage vars
-    out['booklev'] = (df['dltt'] + df['dlc']) / df['at']
-    out.loc[out.booklev<0, 'booklev'] = 0
-    out.loc[out.booklev>1, 'booklev'] = 1
-
-    # payout vars
-    out['dividends_2la'] = (df['dvc'].fillna(0) + df['dvp'].fillna(0)) / out['lag_at']
-    out['repurchases_2la'] = (df['prstkc'].fillna(0) - pdm.rdiff(df['pstkrv']).fillna(0)) / out['lag_at']
-
-    out = out.replace([np.inf, -np.inf], np.nan)
-    return out 
+# %% ../../nbs/01_wrds/03_compa_ccm.ipynb 23
+def features(df: pd.DataFrame=None,
+             only: List[str]=None, # Features to compute (keys of `FEATURES`). If None, computes all of them
+             ) -> pd.DataFrame:
+    """Computes `only` (or all features in `FEATURES`) from `df`"""
 
+    out = feature_graph.compute(FEATURES, df, only)
+    return wrds_api.backend_like(out.replace([np.inf, -np.inf], np.nan), df)
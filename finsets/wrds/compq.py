@@ -10,12 +10,14 @@ import pandas as pd
 import numpy as np
 
 import pandasmore as pdm
+from .. import feature_graph, polars_tools
 from . import wrds_api
 
 # %% auto 0
 __all__ = ['PROVIDER', 'URL', 'LIBRARY', 'TABLE', 'COMPANY_TABLE', 'FREQ', 'MIN_YEAR', 'MAX_YEAR', 'ENTITY_ID_IN_RAW_DSET',
-           'ENTITY_ID_IN_CLEAN_DSET', 'TIME_VAR_IN_RAW_DSET', 'TIME_VAR_IN_CLEAN_DSET', 'list_all_vars',
-           'default_raw_vars', 'parse_varlist', 'get_raw_data', 'process_raw_data', 'ytd_to_quarterly', 'features']
+           'ENTITY_ID_IN_CLEAN_DSET', 'TIME_VAR_IN_RAW_DSET', 'TIME_VAR_IN_CLEAN_DSET', 'DTYPES', 'YTD_VARS',
+           'FEATURES', 'list_all_vars', 'default_raw_vars', 'parse_varlist', 'get_raw_data', 'fiscal_dates',
+           'process_raw_data', 'ytd_to_quarterly', 'features', 'polars_ytd_to_quarterly', 'polars_features']
 
 # %% ../../nbs/01_wrds/04_compq.ipynb 3
 PROVIDER = 'Wharton Research Data Services (WRDS)'
@@ -30,17 +32,16 @@ ENTITY_ID_IN_RAW_DSET = 'gvkey'
 ENTITY_ID_IN_CLEAN_DSET = 'gvkey'
 TIME_VAR_IN_RAW_DSET = 'datadate'
 TIME_VAR_IN_CLEAN_DSET = f'{FREQ}date'
+# Compact dtypes of raw variables, applied while downloading with `get_raw_data(compact=True)` (see `wrds_api.dtype_plan`)
+DTYPES = {'gvkey': 'category', 'cusip': 'category', 'cik': 'category', 'tic': 'category', 'fic': 'category', 'sic': 'category', 
+          'naics': 'category', 'sich': 'category', 'naicsh': 'category'}
 
 # %% ../../nbs/01_wrds/04_compq.ipynb 4
 def list_all_vars() -> pd.DataFrame:
     "Collects names of all available variables from WRDS f`{LIBRARY}.{TABLE}` and `{LIBRARY}.{COMPANY_TABLE}`."
 
-    try:
-        db = wrds_api.Connection()
-        funda = db.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
-        fundn = db.describe_table(LIBRARY,COMPANY_TABLE).assign(wrds_library=LIBRARY, wrds_table=COMPANY_TABLE)
-    finally:
-        db.close()
+    funda = wrds_api.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
+    fundn = wrds_api.describe_table(LIBRARY,COMPANY_TABLE).assign(wrds_library=LIBRARY, wrds_table=COMPANY_TABLE)
 
     return pd.concat([funda,fundn])[['name','type','wrds_library','wrds_table']].copy()
 
@@ -68,7 +69,7 @@ def parse_varlist(vars: List[str]=None,
     # Get all available variables and add suffixes needed for the SQL query
     suffix_mapping = {TABLE: 'a.', COMPANY_TABLE: 'b.', }
     all_avail_vars = list_all_vars().drop_duplicates(subset='name',keep='first').copy()
-    all_avail_vars['w_prefix'] = all_avail_vars.apply(lambda row: suffix_mapping[row['wrds_table']] + row['name'] , axis=1)
+    all_avail_vars['w_prefix'] = all_avail_vars['wrds_table'].map(suffix_mapping) + all_avail_vars['name']
 
     if vars == '*': return ','.join(list(all_avail_vars['w_prefix']))
     
@@ -77,7 +78,8 @@ def parse_varlist(vars: List[str]=None,
     vars_to_get =  required_vars + [x for x in list(set(vars)) if x not in required_vars]
 
     # Validate variables to be downloaded (make sure that they are in the target database)
-    invalid_vars = [v for v in vars_to_get if v not in list(all_avail_vars.name)]
+    avail_names = set(all_avail_vars['name'])
+    invalid_vars = [v for v in vars_to_get if v not in avail_names]
     if invalid_vars: raise ValueError(f"These vars are not in the database: {invalid_vars}") 
 
     # Extract information on which variable comes from which wrds table, so we know what prefix to use
@@ -92,13 +94,20 @@ def get_raw_data(
         required_vars: List[str]=['gvkey','datadate','fyearq','fqtr','rdq'], #list of variables that will get downloaded, even if not in `vars`
         nrows: int=None, #Number of rows to download. If None, full dataset will be downloaded
         start_date: str=None, # Start date in MM/DD/YYYY format
-        end_date: str=None #End date in MM/DD/YYYY format
+        end_date: str=None, #End date in MM/DD/YYYY format
+        chunksize: int=None, # If not None, returns an iterator of DataFrames with `chunksize` rows each
+        compact: bool=False, # If True, decodes columns into the compact dtypes in `DTYPES` (e.g. categoricals, 32-bit ids) while downloading
+        dtype_backend: str='numpy_nullable', # If 'pyarrow', columns are backed by pyarrow arrays, which `process_raw_data` and `features` keep (see `wrds_api.pyarrow_backed`)
+        for_features: List[str]=None, # If given, also downloads the raw variables needed to compute these features (see `FEATURES`); `vars=None` then means no other variables
 ) -> pd.DataFrame:
     """Downloads `vars` from `start_date` to `end_date` from WRDS `{LIBRARY}.{TABLE}` and `{LIBRARY}.{COMPANY_TABLE}`. 
         It also adds `sich` and `naicsh` from the annual table (comp.funda)
     """
  
     wrds_api.validate_dates([start_date, end_date])
+    dtypes = wrds_api.dtype_plan(DTYPES, [(LIBRARY, TABLE), (LIBRARY, COMPANY_TABLE), (LIBRARY, 'funda')]) if compact else None
+    if for_features is not None and vars != '*':
+        vars = list(dict.fromkeys((vars or []) + feature_graph.raw_inputs(FEATURES, for_features)))
     vars = parse_varlist(vars, required_vars=required_vars)
 
     sql_string=f"""SELECT  {vars}, c.sich, c.naicsh  
@@ -116,37 +125,47 @@ def get_raw_data(
     if nrows is not None: sql_string += r" LIMIT %(nrows)s"
     
     return wrds_api.download(sql_string,
-                             params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows})
+                             params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows},
+                             chunksize=chunksize, dtypes=dtypes, dtype_backend=dtype_backend)
 
-# %% ../../nbs/01_wrds/04_compq.ipynb 17
+# %% ../../nbs/01_wrds/04_compq.ipynb 18
+def fiscal_dates(fyearq: np.ndarray, # Fiscal years
+                 fqtr: np.ndarray, # Fiscal quarters (1 to 4)
+                 ) -> tuple:
+    """Calendar quarter (`Period[Q]` array) and last day (`datetime64` array) of fiscal quarter `fqtr` of fiscal year `fyearq`, 
+    computed with integer arithmetic (quarter number `(year-1970)*4 + quarter-1`)"""
+
+    quarters = (np.asarray(fyearq, dtype='int64') - 1970) * 4 + np.asarray(fqtr, dtype='int64') - 1
+    next_month = (quarters * 3 + 3).astype('datetime64[M]')
+    dtdate = (next_month.astype('datetime64[D]') - np.timedelta64(1, 'D')).astype('datetime64[ns]')
+    return pd.arrays.PeriodArray(quarters, dtype=pd.PeriodDtype('Q')), dtdate
+
+# %% ../../nbs/01_wrds/04_compq.ipynb 20
 def process_raw_data(
-        df: pd.DataFrame=None,  # Must contain `permno` and `datadate` columns   
+        df: pd.DataFrame=None,  # Must contain `gvkey` and `datadate` columns   
         clean_kwargs: dict={},  # Params to pass to `pdm.setup_panel` other than `panel_ids`, `time_var`, and `freq`
 ) -> pd.DataFrame:
-    """Drops duplicage, cleans up dates and applies `pandasmore.setup_panel` to `df`"""
+    """Drops duplicates, cleans up dates and applies `pandasmore.setup_panel` to `df`"""
 
-    # Drop gvkey-datadate duplicates by retaining the latest fyearq-fqtr combination
-    df = df.sort_values(['gvkey','datadate','fyearq','fqtr']).drop_duplicates(subset=['gvkey','datadate'], keep='last').copy()
+    # Drop gvkey-datadate duplicates by retaining the latest fyearq-fqtr combination (and rows without fyearq or fqtr)
+    df = df.sort_values(['gvkey','datadate','fyearq','fqtr'])
+    keep = ~df.duplicated(subset=['gvkey','datadate'], keep='last') & df['fyearq'].notna() & df['fqtr'].notna()
+    df = df.take(np.flatnonzero(keep.to_numpy()))
 
-    # Clean up some useful dates (convert rdq to datetime, and extract the fiscal year end date)
-    df = df.dropna(subset=['fyearq','fqtr']).copy()
+    # Clean up some useful dates (convert rdq to datetime, and extract the fiscal quarter and its end date)
     df['rdq'] = pd.to_datetime(df['rdq'])
-    df['dtdate_fiscal'] = pd.to_datetime((df['fyearq'].astype(int).astype(str) + '-' 
-                                          + (df['fqtr'].astype(int)*3).astype(str) 
-                                          + '-1'), format='%Y-%m-%d'
-                                          ) + pd.offsets.MonthEnd(1)
-    df['Qdate_fiscal'] = df['dtdate_fiscal'].dt.to_period('Q')
+    df['Qdate_fiscal'], df['dtdate_fiscal'] = fiscal_dates(df['fyearq'].to_numpy(), df['fqtr'].to_numpy())
 
     # Change some variables to categorical
     for col in ['gvkey','naics','sic','fic','cik','tic','cusip']:
         if col in df.columns:
-            df[col] = df[col].astype('string').astype('category')
+            df[col] = wrds_api.categorical(df[col])
 
     if 'sich' in df.columns:
-        df['sich'] = df['sich'].astype('Int64').astype('string').str.zfill(4).astype('category')
+        df['sich'] = wrds_api.categorical(df['sich'], lambda x: x.astype('Int64').astype('string').str.zfill(4))
 
     if 'naicsh' in df.columns:
-        df['naicsh'] = df['naicsh'].astype('Int64').astype('string').astype('category')
+        df['naicsh'] = wrds_api.categorical(df['naicsh'], lambda x: x.astype('Int64').astype('string'))
 
     # Set up panel structure
     df = pdm.setup_panel(df, panel_ids=ENTITY_ID_IN_RAW_DSET, time_var=TIME_VAR_IN_RAW_DSET, freq=FREQ, 
@@ -154,89 +173,172 @@ def process_raw_data(
                          **clean_kwargs)
     return pdm.order_columns(df,['datadate','dtdate','dtdate_fiscal','Qdate_fiscal','fyearq','fqtr','rdq']) 
 
-# %% ../../nbs/01_wrds/04_compq.ipynb 20
-def ytd_to_quarterly(df: pd.DataFrame=None, 
-                     vars: List[str]=['capxy','oancfy','sstky' ,'prstkcy','dltisy','dltry','dvy','sppey','aqcy','fopty','scstkcy'],
+# %% ../../nbs/01_wrds/04_compq.ipynb 23
+YTD_VARS = ['capxy','oancfy','sstky' ,'prstkcy','dltisy','dltry','dvy','sppey','aqcy','fopty','scstkcy']
+
+def ytd_to_quarterly(df: pd.DataFrame=None, # Indexed by entity and date, with `Qdate_fiscal` and `fqtr` columns (e.g. output of `process_raw_data`)
+                     vars: List[str]=YTD_VARS,
                      suffix: str='_q' # Suffix to add to the new quarterly variables
 ) -> pd.DataFrame:
-    """Convert YTD variables to quarterly variables by taking the difference between the current and previous quarter."""
-
-    #out = df.reset_index().set_index(['gvkey','Qdate_fiscal']).sort_index().copy()
+    """Convert YTD variables to quarterly variables by taking the difference between the current and previous fiscal quarter.
+    Quarterly values are missing if the previous fiscal quarter is not in `df` (except for the first fiscal quarter). 
+    Keeps the first row for each entity and fiscal quarter, sorted by entity and fiscal quarter."""
 
-    out = (df.reset_index().drop_duplicates(subset=['gvkey','Qdate_fiscal'])
-           .set_index(['gvkey','Qdate_fiscal'])
-           .sort_index().copy())
-
-    new_vars = []
     for v in vars:
-        if v in list(out.columns):  
-            new_vars.append(v+suffix)
-            out[v+suffix] = np.where(out['fqtr']==1, out[v],out[v] - pdm.lag(out[v]))
-
-        else:
-            print(f"Variable {v} not found in the dataset")
-
-    return out.reset_index().set_index(['gvkey','Qdate']).copy() #[new_vars]
-
-# %% ../../nbs/01_wrds/04_compq.ipynb 22
-def features(df: pd.DataFrame=None
-             ) -> pd.DataFrame:
-    """Computes a set of features from `df`"""
-    
-    # convert ytd variables to quarterly
-    df = ytd_to_quarterly(df, suffix='_q')
-
+        if v not in df.columns: print(f"Variable {v} not found in the dataset")
+    vars = [v for v in vars if v in df.columns]
+
+    # A single (stable) sort by entity and fiscal quarter; then drop entity-fiscal quarter duplicates
+    entity = pd.factorize(df.index.get_level_values(0), sort=True)[0]
+    fqdate = df['Qdate_fiscal'].array.asi8 # quarter numbers
+    order = np.lexsort((fqdate, entity))
+    same_entity = entity[order][1:] == entity[order][:-1]
+    order = order[np.concatenate([[True], ~(same_entity & (fqdate[order][1:] == fqdate[order][:-1]))])]
+
+    # Rows whose previous row is the same entity's previous fiscal quarter
+    prev_quarter = np.zeros(len(order), dtype=bool)
+    prev_quarter[1:] = (entity[order][1:] == entity[order][:-1]) & (fqdate[order][1:] == fqdate[order][:-1] + 1)
+
+    # De-cumulate all YTD variables at once
+    out = df.take(order)
+    ytd = out[vars].to_numpy(dtype='float64', na_value=np.nan)
+    prev = np.full_like(ytd, np.nan)
+    prev[1:][prev_quarter[1:]] = ytd[:-1][prev_quarter[1:]]
+    first_quarter = out['fqtr'].to_numpy(dtype='float64', na_value=np.nan) == 1
+    quarterly = np.where(first_quarter[:, None], ytd, ytd - prev)
+
+    for j, v in enumerate(vars):
+        out[v+suffix] = quarterly[:, j]
+    return out
+
+# %% ../../nbs/01_wrds/04_compq.ipynb 27
+def _shreq(df, out):
+    shreq = np.where(df['seqq'].isnull(), df['ceqq'] + out['pstkq0'], df['seqq'])
+    return np.where(pd.isnull(shreq), df['atq'] - df['ltq'], shreq)
+
+FEATURES = {
     # industry 
-    df['sic_full'] = df['sich'].astype('object').fillna(df['sic'].astype('object')).astype('category')
-    df['naics_full'] = df['naicsh'].astype('object').fillna(df['naics'].astype('object')).astype('category')
+    'sic_full': (['sic'], [], lambda df, out: df['sich'].astype('object').fillna(df['sic'].astype('object')).astype('category')),
+    'naics_full': (['naics'], [], lambda df, out: df['naicsh'].astype('object').fillna(df['naics'].astype('object')).astype('category')),
 
     # size
-    df['stock_price'] = np.abs(df['prccq'])
-    df['mktcap'] = df['stock_price'] * df['cshoq']
-    df['lag_atq'] = pdm.lag(df['atq'])
+    'stock_price': (['prccq'], [], lambda df, out: np.abs(df['prccq'])),
+    'mktcap': (['cshoq'], ['stock_price'], lambda df, out: out['stock_price'] * df['cshoq']),
+    'lag_atq': (['atq'], [], lambda df, out: pdm.lag(df['atq'])),
 
     # book equity vars
-    df['pstkq0'] = df['pstkq'].fillna(0)
-    df['pref_stock'] = np.where(df['pstkrq'].isnull(), df['pstkq0'], df['pstkrq'])
-    df['shreq'] = np.where(df['seqq'].isnull(), df['ceqq'] + df['pstkq0'], df['seqq'])
-    df['shreq'] = np.where(df['shreq'].isnull(), df['atq'] - df['ltq'], df['shreq'])
-    df['bookeq'] = df['shreq'] + df['txditcq'].fillna(0) - df['pref_stock']
-
-    # issuance vars
-    df['equityiss_tot'] = (pdm.rdiff(df['bookeq']) - pdm.rdiff(df['req'])) 
-    df['equityiss_cfs'] = (df['sstky_q'].fillna(0) - df['prstkcy_q'].fillna(0))
-    df['debtiss_tot'] = (pdm.rdiff(df['atq']) - pdm.rdiff(df['bookeq'])) 
-    df['debtiss_cfs'] = (df['dltisy_q'].fillna(0) - df['dltry_q'].fillna(0)) 
-    df['debtiss_bs'] = (pdm.rdiff(df['dlttq']) + pdm.rdiff(df['dlcq'].fillna(0))) 
-    for v in ['equityiss_tot','equityiss_cfs','debtiss_tot','debtiss_cfs','debtiss_bs']:
-        df[f'{v}_2la'] = df[v] / df['lag_atq']
+    'pstkq0': (['pstkq'], [], lambda df, out: df['pstkq'].fillna(0)),
+    'pref_stock': (['pstkrq'], ['pstkq0'], lambda df, out: np.where(df['pstkrq'].isnull(), out['pstkq0'], df['pstkrq'])),
+    'shreq': (['seqq','ceqq','atq','ltq'], ['pstkq0'], _shreq),
+    'bookeq': (['txditcq'], ['shreq','pref_stock'], lambda df, out: out['shreq'] + df['txditcq'].fillna(0) - out['pref_stock']),
+
+    # issuance vars (YTD variables, e.g. `sstky`, are used through their quarterly versions, e.g. `sstky_q`)
+    'equityiss_tot': (['req'], ['bookeq'], lambda df, out: pdm.rdiff(out['bookeq']) - pdm.rdiff(df['req'])),
+    'equityiss_cfs': (['sstky','prstkcy'], [], lambda df, out: df['sstky_q'].fillna(0) - df['prstkcy_q'].fillna(0)),
+    'debtiss_tot': (['atq'], ['bookeq'], lambda df, out: pdm.rdiff(df['atq']) - pdm.rdiff(out['bookeq'])),
+    'debtiss_cfs': (['dltisy','dltry'], [], lambda df, out: df['dltisy_q'].fillna(0) - df['dltry_q'].fillna(0)),
+    'debtiss_bs': (['dlttq','dlcq'], [], lambda df, out: pdm.rdiff(df['dlttq']) + pdm.rdiff(df['dlcq'].fillna(0))),
+    **{f'{v}_2la': ([], [v,'lag_atq'], lambda df, out, v=v: out[v] / out['lag_atq']) 
+       for v in ['equityiss_tot','equityiss_cfs','debtiss_tot','debtiss_cfs','debtiss_bs']},
 
     # investment vars
-    df['ppent_pch'] = pdm.rpct_change(df['ppentq'])
-    df['capx_2la'] = df['capxy_q'] / df['lag_atq']
-    df['tobinq'] = (df['atq'] - df['bookeq'] + df['mktcap']) / df['atq']
+    'ppent_pch': (['ppentq'], [], lambda df, out: pdm.rpct_change(df['ppentq'])),
+    'capx_2la': (['capxy'], ['lag_atq'], lambda df, out: df['capxy_q'] / out['lag_atq']),
+    'tobinq': (['atq'], ['bookeq','mktcap'], lambda df, out: (df['atq'] - out['bookeq'] + out['mktcap']) / df['atq']),
 
     # profitability vars
-    df['roa'] = df['ibq'] / df['atq']
+    'roa': (['ibq','atq'], [], lambda df, out: df['ibq'] / df['atq']),
 
     # cash flow vars
-    df['cflow_is'] = (df['ibq']+df['dpq']) 
-    df['cflow_cfs'] = df['oancfy_q'] 
-    df['cflow_full'] = np.where(df.dtdate.dt.year<1987, df['cflow_is'], df['cflow_cfs'])
-    for v in ['cflow_is','cflow_cfs','cflow_full']:
-        df[f'{v}_2la'] = df[v] / df['lag_atq']
+    'cflow_is': (['ibq','dpq'], [], lambda df, out: df['ibq'] + df['dpq']),
+    'cflow_cfs': (['oancfy'], [], lambda df, out: df['oancfy_q']),
+    'cflow_full': ([], ['cflow_is','cflow_cfs'], lambda df, out: np.where(df.dtdate.dt.year<1987, out['cflow_is'], out['cflow_cfs'])),
+    **{f'{v}_2la': ([], [v,'lag_atq'], lambda df, out, v=v: out[v] / out['lag_atq']) for v in ['cflow_is','cflow_cfs','cflow_full']},
 
     # liquidity vars
-    df['cash_2a'] = df['cheq'] / df['atq']
+    'cash_2a': (['cheq','atq'], [], lambda df, out: df['cheq'] / df['atq']),
 
     # leverage vars
-    df['booklev'] = (df['dlttq'] + df['dlcq']) / df['atq']
-    df.loc[df.booklev<0, 'booklev'] = 0
-    df.loc[df.booklev>1, 'booklev'] = 1
+    'booklev': (['dlttq','dlcq','atq'], [], lambda df, out: ((df['dlttq'] + df['dlcq']) / df['atq']).clip(0, 1)),
+
+    # payout vars
+    'dividends_2la': (['dvy','dvpq'], ['lag_atq'], lambda df, out: (df['dvy_q'].fillna(0) + df['dvpq'].fillna(0)) / out['lag_atq']),
+    'repurchases_2la': (['prstkcy','pstkrq'], ['lag_atq'], 
+                        lambda df, out: (df['prstkcy_q'].fillna(0) - pdm.rdiff(df['pstkrq']).fillna(0)) / out['lag_atq']),
+}
 
-    # paydf vars
-    df['dividends_2la'] = (df['dvy_q'].fillna(0)+df['dvpq'].fillna(0)) / df['lag_atq']
-    df['repurchases_2la'] = (df['prstkcy_q'].fillna(0) - pdm.rdiff(df['pstkrq']).fillna(0)) / df['lag_atq']
+# %% ../../nbs/01_wrds/04_compq.ipynb 28
+def features(df: pd.DataFrame=None,
+             only: List[str]=None, # Features to compute (keys of `FEATURES`). If None, computes all of them
+             ) -> pd.DataFrame:
+    """Converts YTD variables in `df` to quarterly (see `ytd_to_quarterly`) and adds `only` (or all features in `FEATURES`)"""
     
-    df = df.replace([np.inf, -np.inf], np.nan)
-    return df 
+    # convert ytd variables to quarterly (only those that are needed, if `only` is given)
+    ytd_vars = YTD_VARS if only is None else [v for v in feature_graph.raw_inputs(FEATURES, only) if v in YTD_VARS]
+    df = ytd_to_quarterly(df, vars=ytd_vars, suffix='_q')
+
+    df = df.join(feature_graph.compute(FEATURES, df, only))
+    return wrds_api.backend_like(df.replace([np.inf, -np.inf], np.nan), df)
+
+# %% ../../nbs/01_wrds/04_compq.ipynb 32
+def polars_ytd_to_quarterly(lf: pl.LazyFrame, # Output of `process_raw_data`, as a LazyFrame (see `polars_tools.from_pandas`)
+                            vars: List[str]=YTD_VARS,
+                            suffix: str='_q' # Suffix to add to the new quarterly variables
+                            ) -> pl.LazyFrame:
+    "Polars version of `ytd_to_quarterly`"
+
+    pl = polars_tools.require_polars()
+    vars = [v for v in vars if v in lf.collect_schema().names()]
+    entity, fqdate = ENTITY_ID_IN_CLEAN_DSET, pl.col('Qdate_fiscal')
+    lf = lf.sort([entity, 'Qdate_fiscal'], maintain_order=True).unique([entity, 'Qdate_fiscal'], keep='first', maintain_order=True)
+    prev_quarter = fqdate.shift(1).over(entity) == fqdate.dt.offset_by('-1q')
+    return lf.with_columns([pl.when(pl.col('fqtr') == 1).then(pl.col(v))
+                              .otherwise(pl.col(v) - pl.when(prev_quarter).then(pl.col(v).shift(1).over(entity))).alias(v + suffix) 
+                            for v in vars])
+
+def _polars_exprs(p: polars_tools.Panel) -> dict:
+    "Polars expressions of the features in `FEATURES`"
+    pl = polars_tools.require_polars()
+    c = pl.col
+    exprs = {
+        'sic_full': pl.coalesce(c('sich').cast(pl.String), c('sic').cast(pl.String)).cast(pl.Categorical),
+        'naics_full': pl.coalesce(c('naicsh').cast(pl.String), c('naics').cast(pl.String)).cast(pl.Categorical),
+        'stock_price': c('prccq').abs(),
+        'mktcap': c('stock_price') * c('cshoq'),
+        'lag_atq': p.lag(c('atq')),
+        'pstkq0': c('pstkq').fill_null(0),
+        'pref_stock': pl.coalesce(c('pstkrq'), c('pstkq0')),
+        'shreq': pl.coalesce(c('seqq'), c('ceqq') + c('pstkq0'), c('atq') - c('ltq')),
+        'bookeq': c('shreq') + c('txditcq').fill_null(0) - c('pref_stock'),
+        'equityiss_tot': p.rdiff(c('bookeq')) - p.rdiff(c('req')),
+        'equityiss_cfs': c('sstky_q').fill_null(0) - c('prstkcy_q').fill_null(0),
+        'debtiss_tot': p.rdiff(c('atq')) - p.rdiff(c('bookeq')),
+        'debtiss_cfs': c('dltisy_q').fill_null(0) - c('dltry_q').fill_null(0),
+        'debtiss_bs': p.rdiff(c('dlttq')) + p.rdiff(c('dlcq').fill_null(0)),
+        'ppent_pch': p.rpct_change(c('ppentq')),
+        'capx_2la': c('capxy_q') / c('lag_atq'),
+        'tobinq': (c('atq') - c('bookeq') + c('mktcap')) / c('atq'),
+        'roa': c('ibq') / c('atq'),
+        'cflow_is': c('ibq') + c('dpq'),
+        'cflow_cfs': c('oancfy_q'),
+        'cflow_full': pl.when(c('dtdate').dt.year() < 1987).then(c('cflow_is')).otherwise(c('cflow_cfs')),
+        'cash_2a': c('cheq') / c('atq'),
+        'booklev': ((c('dlttq') + c('dlcq')) / c('atq')).clip(0, 1),
+        'dividends_2la': (c('dvy_q').fill_null(0) + c('dvpq').fill_null(0)) / c('lag_atq'),
+        'repurchases_2la': (c('prstkcy_q').fill_null(0) - p.rdiff(c('pstkrq')).fill_null(0)) / c('lag_atq'),
+    }
+    for v in ['equityiss_tot','equityiss_cfs','debtiss_tot','debtiss_cfs','debtiss_bs','cflow_is','cflow_cfs','cflow_full']:
+        exprs[f'{v}_2la'] = c(v) / c('lag_atq')
+    return exprs
+
+def polars_features(lf: pl.LazyFrame, # Output of `process_raw_data`, as a LazyFrame (see `polars_tools.from_pandas`)
+                    only: List[str]=None, # Features to compute (keys of `FEATURES`). If None, computes all of them
+                    ) -> pl.LazyFrame:
+    """Polars version of `features`"""
+
+    ytd_vars = YTD_VARS if only is None else [v for v in feature_graph.raw_inputs(FEATURES, only) if v in YTD_VARS]
+    lf = polars_ytd_to_quarterly(lf, vars=ytd_vars, suffix='_q')
+
+    p = polars_tools.Panel(ENTITY_ID_IN_CLEAN_DSET, TIME_VAR_IN_CLEAN_DSET, FREQ)
+    lf = polars_tools.compute(FEATURES, _polars_exprs(p), lf.sort(p.index), only)
+    return polars_tools.missing_as_null(lf, list(FEATURES) if only is None else list(only))
@@ -10,13 +10,14 @@ import pandas as pd
 import numpy as np
 
 import pandasmore as pdm
-from . import wrds_api
+from .. import feature_graph
+from . import wrds_api, linking, compq
 
 # %% auto 0
 __all__ = ['PROVIDER', 'URL', 'LIBRARY', 'TABLE', 'LINK_LIBRARY', 'LINK_TABLE', 'COMPANY_TABLE', 'FREQ', 'MIN_YEAR', 'MAX_YEAR',
            'ENTITY_ID_IN_RAW_DSET', 'ENTITY_ID_IN_CLEAN_DSET', 'TIME_VAR_IN_RAW_DSET', 'TIME_VAR_IN_CLEAN_DSET',
-           'list_all_vars', 'default_raw_vars', 'parse_varlist', 'get_raw_data', 'process_raw_data', 'ytd_to_quarterly',
-           'features']
+           'DTYPES', 'YTD_VARS', 'FEATURES', 'list_all_vars', 'default_raw_vars', 'parse_varlist', 'get_raw_data',
+           'process_raw_data', 'ytd_to_quarterly', 'features']
 
 # %% ../../nbs/01_wrds/04_compq_ccm.ipynb 3
 PROVIDER = 'Wharton Research Data Services (WRDS)'
@@ -33,17 +34,16 @@ ENTITY_ID_IN_RAW_DSET = 'permno'
 ENTITY_ID_IN_CLEAN_DSET = 'permno'
 TIME_VAR_IN_RAW_DSET = 'datadate'
 TIME_VAR_IN_CLEAN_DSET = f'{FREQ}date'
+# Compact dtypes of raw variables, applied while downloading with `get_raw_data(compact=True)` (see `wrds_api.dtype_plan`)
+DTYPES = {'gvkey': 'category', 'cusip': 'category', 'cik': 'category', 'tic': 'category', 'fic': 'category', 'sic': 'category', 
+          'naics': 'category', 'sich': 'category', 'naicsh': 'category', 'linkprim': 'category', 'liid': 'category'}
 
 # %% ../../nbs/01_wrds/04_compq_ccm.ipynb 4
 def list_all_vars() -> pd.DataFrame:
     "Collects names of all available variables from WRDS f`{LIBRARY}.{TABLE}` and `{LIBRARY}.{COMPANY_TABLE}`."
 
-    try:
-        db = wrds_api.Connection()
-        funda = db.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
-        fundn = db.describe_table(LIBRARY,COMPANY_TABLE).assign(wrds_library=LIBRARY, wrds_table=COMPANY_TABLE)
-    finally:
-        db.close()
+    funda = wrds_api.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
+    fundn = wrds_api.describe_table(LIBRARY,COMPANY_TABLE).assign(wrds_library=LIBRARY, wrds_table=COMPANY_TABLE)
 
     return pd.concat([funda,fundn])[['name','type','wrds_library','wrds_table']].copy()
 
@@ -71,7 +71,7 @@ def parse_varlist(vars: List[str]=None,
     # Get all available variables and add suffixes needed for the SQL query
     suffix_mapping = {TABLE: 'a.', COMPANY_TABLE: 'b.', }
     all_avail_vars = list_all_vars().drop_duplicates(subset='name',keep='first').copy()
-    all_avail_vars['w_prefix'] = all_avail_vars.apply(lambda row: suffix_mapping[row['wrds_table']] + row['name'] , axis=1)
+    all_avail_vars['w_prefix'] = all_avail_vars['wrds_table'].map(suffix_mapping) + all_avail_vars['name']
 
     if vars == '*': return ','.join(list(all_avail_vars['w_prefix']))
     
@@ -80,7 +80,8 @@ def parse_varlist(vars: List[str]=None,
     vars_to_get =  required_vars + [x for x in list(set(vars)) if x not in required_vars]
 
     # Validate variables to be downloaded (make sure that they are in the target database)
-    invalid_vars = [v for v in vars_to_get if v not in list(all_avail_vars.name)]
+    avail_names = set(all_avail_vars['name'])
+    invalid_vars = [v for v in vars_to_get if v not in avail_names]
     if invalid_vars: raise ValueError(f"These vars are not in the database: {invalid_vars}") 
 
     # Extract information on which variable comes from which wrds table, so we know what prefix to use
@@ -95,13 +96,33 @@ def get_raw_data(
         required_vars: List[str]=['gvkey','datadate','fyearq','fqtr','rdq'], #list of variables that will get downloaded, even if not in `vars`
         nrows: int=None, #Number of rows to download. If None, full dataset will be downloaded
         start_date: str=None, # Start date in MM/DD/YYYY format
-        end_date: str=None #End date in MM/DD/YYYY format
+        end_date: str=None, #End date in MM/DD/YYYY format
+        chunksize: int=None, # If not None, returns an iterator of DataFrames with `chunksize` rows each
+        compact: bool=False, # If True, decodes columns into the compact dtypes in `DTYPES` (e.g. categoricals, 32-bit ids) while downloading
+        dtype_backend: str='numpy_nullable', # If 'pyarrow', columns are backed by pyarrow arrays, which `process_raw_data` and `features` keep (see `wrds_api.pyarrow_backed`)
+        for_features: List[str]=None, # If given, also downloads the raw variables needed to compute these features (see `FEATURES`); `vars=None` then means no other variables
+        link_locally: bool=False, # If True, downloads `compq` data and adds the CCM links locally (see `linking.add_permno`)
 ) -> pd.DataFrame:
     """Downloads `vars` from `start_date` to `end_date` from WRDS `{LIBRARY}.{TABLE}` and `{LIBRARY}.{COMPANY_TABLE}`. 
         It also adds `sich` and `naicsh` from the annual table (comp.funda)
     """
  
     wrds_api.validate_dates([start_date, end_date])
+    dtypes = {**wrds_api.dtype_plan(DTYPES, [(LIBRARY, TABLE), (LIBRARY, COMPANY_TABLE), (LIBRARY, 'funda'), (LINK_LIBRARY, LINK_TABLE)]), 'permno': 'Int32', 'permco': 'Int32'} if compact else None
+    if for_features is not None and vars != '*':
+        vars = list(dict.fromkeys((vars or []) + feature_graph.raw_inputs(FEATURES, for_features)))
+    if link_locally:
+        linking.ccm_links() # downloaded first: a chunked download holds its connection until it is exhausted
+        link = lambda chunk: wrds_api.apply_dtypes(linking.add_permno(chunk).reset_index(drop=True), dtypes, dtype_backend)
+        if chunksize is None and nrows is None:
+            return link(compq.get_raw_data(vars, required_vars=required_vars, start_date=start_date, end_date=end_date, 
+                                          compact=compact, dtype_backend=dtype_backend))
+        # `nrows` counts linked rows, as on the server, so the unlinked data is streamed until there are enough of them
+        chunks = compq.get_raw_data(vars, required_vars=required_vars, start_date=start_date, end_date=end_date, 
+                                   chunksize=chunksize or max(nrows, 10_000), compact=compact, dtype_backend=dtype_backend)
+        linked = linking.link_chunks(chunks, link, nrows)
+        return linked if chunksize is not None else wrds_api.concat(linked)
+
     vars = parse_varlist(vars, required_vars=required_vars)
 
     sql_string=f"""SELECT  {vars}, c.sich, c.naicsh,d.lpermno as permno, d.lpermco as permco, d.liid, d.linkprim as linkprim  
@@ -123,7 +144,8 @@ def get_raw_data(
     if nrows is not None: sql_string += r" LIMIT %(nrows)s"
     
     return wrds_api.download(sql_string,
-                             params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows})
+                             params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows},
+                             chunksize=chunksize, dtypes=dtypes, dtype_backend=dtype_backend)
 
 # %% ../../nbs/01_wrds/04_compq_ccm.ipynb 17
 def process_raw_data(
@@ -132,115 +154,57 @@ def process_raw_data(
 ) -> pd.DataFrame:
     """Drops duplicates, cleans up dates and applies `pandasmore.setup_panel` to `df`"""
 
-    # Drop permno-datadate duplicates by retaining the latest fyearq-fqtr combination
-    df = df.sort_values(['permno','datadate','fyearq','fqtr']).drop_duplicates(subset=['permno','datadate'], keep='last').copy()
+    # Drop permno-datadate duplicates by retaining the latest fyearq-fqtr combination (and rows without fyearq or fqtr)
+    df = df.sort_values(['permno','datadate','fyearq','fqtr'])
+    keep = ~df.duplicated(subset=['permno','datadate'], keep='last') & df['fyearq'].notna() & df['fqtr'].notna()
+    df = df.take(np.flatnonzero(keep.to_numpy()))
 
-    # Clean up some useful dates (convert rdq to datetime, and extract the fiscal year end date)
-    df = df.dropna(subset=['fyearq','fqtr']).copy()
+    # Clean up some useful dates (convert rdq to datetime, and extract the fiscal quarter and its end date)
     df['rdq'] = pd.to_datetime(df['rdq'])
-    df['dtdate_fiscal'] = pd.to_datetime((df['fyearq'].astype(int).astype(str) + '-' 
-                                          + (df['fqtr'].astype(int)*3).astype(str) 
-                                          + '-1'), format='%Y-%m-%d'
-                                          ) + pd.offsets.MonthEnd(1)
-    df['Qdate_fiscal'] = df['dtdate_fiscal'].dt.to_period('Q')
+    df['Qdate_fiscal'], df['dtdate_fiscal'] = compq.fiscal_dates(df['fyearq'].to_numpy(), df['fqtr'].to_numpy())
 
     # Change some variables to categorical
     for col in ['gvkey','naics','sic','fic','cik','tic','cusip']:
         if col in df.columns:
-            df[col] = df[col].astype('string').astype('category')
+            df[col] = wrds_api.categorical(df[col])
 
     if 'sich' in df.columns:
-        df['sich'] = df['sich'].astype('Int64').astype('string').str.zfill(4).astype('category')
+        df['sich'] = wrds_api.categorical(df['sich'], lambda x: x.astype('Int64').astype('string').str.zfill(4))
 
     if 'naicsh' in df.columns:
-        df['naicsh'] = df['naicsh'].astype('Int64').astype('string').astype('category')
+        df['naicsh'] = wrds_api.categorical(df['naicsh'], lambda x: x.astype('Int64').astype('string'))
 
-    # Set up panel structure     
+    # Set up panel structure
     df = pdm.setup_panel(df, panel_ids=ENTITY_ID_IN_RAW_DSET, time_var=TIME_VAR_IN_RAW_DSET, freq=FREQ, 
-                         panel_ids_toint=False, **clean_kwargs)
+                         panel_ids_toint=False,
+                         **clean_kwargs)
     return pdm.order_columns(df,['datadate','dtdate','dtdate_fiscal','Qdate_fiscal','fyearq','fqtr','rdq']) 
 
 # %% ../../nbs/01_wrds/04_compq_ccm.ipynb 20
-def ytd_to_quarterly(df: pd.DataFrame=None, 
-                     vars: List[str]=['capxy','oancfy','sstky' ,'prstkcy','dltisy','dltry','dvy','sppey','aqcy','fopty','scstkcy'],
+YTD_VARS = compq.YTD_VARS
+
+def ytd_to_quarterly(df: pd.DataFrame=None, # Indexed by entity and date, with `Qdate_fiscal` and `fqtr` columns (e.g. output of `process_raw_data`)
+                     vars: List[str]=YTD_VARS,
                      suffix: str='_q' # Suffix to add to the new quarterly variables
 ) -> pd.DataFrame:
-    """Convert YTD variables to quarterly variables by taking the difference between the current and previous quarter."""
+    """Convert YTD variables to quarterly variables by taking the difference between the current and previous fiscal quarter (see `compq.ytd_to_quarterly`)."""
 
-    out = (df.reset_index().drop_duplicates(subset=['permno','Qdate_fiscal'])
-           .set_index(['permno','Qdate_fiscal'])
-           .sort_index().copy())
+    return compq.ytd_to_quarterly(df, vars=vars, suffix=suffix)
 
-    new_vars = []
-    for v in vars:
-        if v in list(out.columns):  
-            new_vars.append(v+suffix)
-            out[v+suffix] = np.where(out['fqtr']==1, out[v],out[v] - pdm.lag(out[v]))
-        else:
-            print(f"Variable {v} not found in the dataset")
+# %% ../../nbs/01_wrds/04_compq_ccm.ipynb 23
+FEATURES = {**compq.FEATURES, 
+            'cflow_full': ([], ['cflow_is','cflow_cfs'], 
+                           lambda df, out: np.where(df.dtdate.dt.year<=1987, out['cflow_is'], out['cflow_cfs']))}
 
-    return out.reset_index().set_index(['permno','Qdate']).copy()
-
-# %% ../../nbs/01_wrds/04_compq_ccm.ipynb 22
-def features(df: pd.DataFrame=None
+# %% ../../nbs/01_wrds/04_compq_ccm.ipynb 24
+def features(df: pd.DataFrame=None,
+             only: List[str]=None, # Features to compute (keys of `FEATURES`). If None, computes all of them
              ) -> pd.DataFrame:
-    """Computes a set of features from `df`"""
-    
-    # convert ytd variables to quarterly
-    df = ytd_to_quarterly(df, suffix='_q')
-
-    # industry 
-    df['sic_full'] = df['sich'].astype('object').fillna(df['sic'].astype('object')).astype('category')
-    df['naics_full'] = df['naicsh'].astype('object').fillna(df['naics'].astype('object')).astype('category')
-
-    # size
-    df['stock_price'] = np.abs(df['prccq'])
-    df['mktcap'] = df['stock_price'] * df['cshoq']
-    df['lag_atq'] = pdm.lag(df['atq'])
-
-    # book equity vars
-    df['pstkq0'] = df['pstkq'].fillna(0)
-    df['pref_stock'] = np.where(df['pstkrq'].isnull(), df['pstkq0'], df['pstkrq'])
-    df['shreq'] = np.where(df['seqq'].isnull(), df['ceqq'] + df['pstkq0'], df['seqq'])
-    df['shreq'] = np.where(df['shreq'].isnull(), df['atq'] - df['ltq'], df['shreq'])
-    df['bookeq'] = df['shreq'] + df['txditcq'].fillna(0) - df['pref_stock']
-
-    # issuance vars
-    df['equityiss_tot'] = (pdm.rdiff(df['bookeq']) - pdm.rdiff(df['req'])) 
-    df['equityiss_cfs'] = (df['sstky_q'].fillna(0) - df['prstkcy_q'].fillna(0))
-    df['debtiss_tot'] = (pdm.rdiff(df['atq']) - pdm.rdiff(df['bookeq'])) 
-    df['debtiss_cfs'] = (df['dltisy_q'].fillna(0) - df['dltry_q'].fillna(0)) 
-    df['debtiss_bs'] = (pdm.rdiff(df['dlttq']) + pdm.rdiff(df['dlcq'].fillna(0))) 
-    for v in ['equityiss_tot','equityiss_cfs','debtiss_tot','debtiss_cfs','debtiss_bs']:
-        df[f'{v}_2la'] = df[v] / df['lag_atq']
-
-    # investment vars
-    df['ppent_pch'] = pdm.rpct_change(df['ppentq'])
-    df['capx_2la'] = df['capxy_q'] / df['lag_atq']
-    df['tobinq'] = (df['atq'] - df['bookeq'] + df['mktcap']) / df['atq']
-
-    # profitability vars
-    df['roa'] = df['ibq'] / df['atq']
-
-    # cash flow vars
-    df['cflow_is'] = (df['ibq']+df['dpq']) 
-    df['cflow_cfs'] = df['oancfy_q'] 
-    df['cflow_full'] = np.where(df.dtdate.dt.year<=1987, df['cflow_is'], df['cflow_cfs'])
-    for v in ['cflow_is','cflow_cfs','cflow_full']:
-        df[f'{v}_2la'] = df[v] / df['lag_atq']
-
-    # liquidity vars
-    df['cash_2a'] = df['cheq'] / df['atq']
-
-    # leverage vars
-    df['booklev'] = (df['dlttq'] + df['dlcq']) / df['atq']
-    df.loc[df.booklev<0, 'booklev'] = 0
-    df.loc[df.booklev>1, 'booklev'] = 1
-
-    # paydf vars
-    df['dividends_2la'] = (df['dvy_q'].fillna(0)+df['dvpq'].fillna(0)) / df['lag_atq']
-    df['repurchases_2la'] = (df['prstkcy_q'].fillna(0) - pdm.rdiff(df['pstkrq']).fillna(0)) / df['lag_atq']
+    """Converts YTD variables in `df` to quarterly (see `ytd_to_quarterly`) and adds `only` (or all features in `FEATURES`)"""
     
-    df = df.replace([np.inf, -np.inf], np.nan)
-    return df 
+    # convert ytd variables to quarterly (only those that are needed, if `only` is given)
+    ytd_vars = YTD_VARS if only is None else [v for v in feature_graph.raw_inputs(FEATURES, only) if v in YTD_VARS]
+    df = ytd_to_quarterly(df, vars=ytd_vars, suffix='_q')
 
+    df = df.join(feature_graph.compute(FEATURES, df, only))
+    return wrds_api.backend_like(df.replace([np.inf, -np.inf], np.nan), df)
@@ -10,13 +10,13 @@ import pandas as pd
 import numpy as np
 
 import pandasmore as pdm
-from . import wrds_api
+from . import wrds_api, crspm
 
 # %% auto 0
 __all__ = ['PROVIDER', 'URL', 'LIBRARY', 'TABLE', 'NAMES_TABLE', 'DELIST_TABLE', 'FREQ', 'MIN_YEAR', 'MAX_YEAR',
            'ENTITY_ID_IN_RAW_DSET', 'ENTITY_ID_IN_CLEAN_DSET', 'TIME_VAR_IN_RAW_DSET', 'TIME_VAR_IN_CLEAN_DSET',
-           'list_all_vars', 'default_raw_vars', 'parse_varlist', 'get_raw_data', 'process_raw_data', 'delist_adj_ret',
-           'features']
+           'DTYPES', 'list_all_vars', 'default_raw_vars', 'parse_varlist', 'get_raw_data', 'process_raw_data',
+           'delist_adj_ret', 'rolling_features', 'features']
 
 # %% ../../nbs/01_wrds/02_crspd.ipynb 4
 PROVIDER = 'Wharton Research Data Services (WRDS)'
@@ -32,18 +32,17 @@ ENTITY_ID_IN_RAW_DSET = 'permno'
 ENTITY_ID_IN_CLEAN_DSET = 'permno'
 TIME_VAR_IN_RAW_DSET = 'date'
 TIME_VAR_IN_CLEAN_DSET = f'{FREQ}date'
+# Compact dtypes of raw variables, applied while downloading with `get_raw_data(compact=True)` (see `wrds_api.dtype_plan`)
+DTYPES = {'permno': 'Int32', 'permco': 'Int32', 'shrcd': 'category', 'exchcd': 'category', 'siccd': 'category', 'naics': 'category', 
+          'cusip': 'category', 'ncusip': 'category', 'ticker': 'category', 'comnam': 'category', 'dlstcd': 'Int16'}
 
 # %% ../../nbs/01_wrds/02_crspd.ipynb 5
 def list_all_vars() -> pd.DataFrame:
     "Collects names of all available variables from WRDS `{LIBRARY}.{TABLE}` and `{LIBRARY}.{NAMES_TABLE}`"
 
-    try:
-        db = wrds_api.Connection()
-        msf = db.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
-        mse = db.describe_table(LIBRARY,NAMES_TABLE).assign(wrds_library=LIBRARY, wrds_table=NAMES_TABLE)
-        dlst = db.describe_table(LIBRARY,DELIST_TABLE).assign(wrds_library=LIBRARY, wrds_table=DELIST_TABLE)
-    finally:
-        db.close()
+    msf = wrds_api.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
+    mse = wrds_api.describe_table(LIBRARY,NAMES_TABLE).assign(wrds_library=LIBRARY, wrds_table=NAMES_TABLE)
+    dlst = wrds_api.describe_table(LIBRARY,DELIST_TABLE).assign(wrds_library=LIBRARY, wrds_table=DELIST_TABLE)
 
     return pd.concat([msf, mse, dlst])[['name','type','wrds_library','wrds_table']].copy()
 
@@ -66,7 +65,7 @@ def parse_varlist(vars: List[str]=None,
     # Get all available variables and add suffixes needed for the SQL query
     suffix_mapping = {TABLE: 'a.', NAMES_TABLE: 'b.', DELIST_TABLE: 'c.'}
     all_avail_vars = list_all_vars().drop_duplicates(subset='name',keep='first').copy()
-    all_avail_vars['w_prefix'] = all_avail_vars.apply(lambda row: suffix_mapping[row['wrds_table']] + row['name'] , axis=1)
+    all_avail_vars['w_prefix'] = all_avail_vars['wrds_table'].map(suffix_mapping) + all_avail_vars['name']
 
     if vars == '*': return ','.join(list(all_avail_vars['w_prefix']))
     
@@ -75,7 +74,8 @@ def parse_varlist(vars: List[str]=None,
     vars_to_get =  required_vars + [x for x in list(set(vars)) if x not in required_vars]
 
     # Validate variables to be downloaded (make sure that they are in the target database)
-    invalid_vars = [v for v in vars_to_get if v not in list(all_avail_vars.name)]
+    avail_names = set(all_avail_vars['name'])
+    invalid_vars = [v for v in vars_to_get if v not in avail_names]
     if invalid_vars: raise ValueError(f"These vars are not in the database: {invalid_vars}") 
 
     # Extract information on which variable comes from which wrds table, so we know what prefix to use
@@ -92,10 +92,21 @@ def get_raw_data(
         start_date: str="01/01/1950",  # Start date in MM/DD/YYYY format
         end_date: str=None,            # End date in MM/DD/YYYY format  
         shrcd_exchcd_filters: bool=True, # If true, keep only observations with shrcd in [10,11] and exchcd in [1,2,3]
+        chunksize: int=None, # If not None, returns an iterator of DataFrames with `chunksize` rows each
+        compact: bool=False, # If True, decodes columns into the compact dtypes in `DTYPES` (e.g. categoricals, 32-bit ids) while downloading
+        dtype_backend: str='numpy_nullable', # If 'pyarrow', columns are backed by pyarrow arrays, which `process_raw_data` and `features` keep (see `wrds_api.pyarrow_backed`)
+        shard_freq: str=None, # If 'Y' or 'M', splits the date range into yearly or monthly shards that are downloaded concurrently
+        max_workers: int=4, # Number of shards downloaded at the same time (if `shard_freq` is not None)
 ) -> pd.DataFrame:
     "Downloads `vars` from `start_date` to `end_date` from WRDS {LIBRARY}.{TABLE}, {LIBRARY}.{NAMES_TABLE} and {LIBRARY}.{DELIST_TABLE}." 
 
     wrds_api.validate_dates([start_date, end_date])
+    dtypes = wrds_api.dtype_plan(DTYPES, [(LIBRARY, TABLE), (LIBRARY, NAMES_TABLE), (LIBRARY, DELIST_TABLE)]) if compact else None
+    if shard_freq is not None: # shards need both ends of the date range
+        if nrows is not None or chunksize is not None: raise ValueError("`nrows` and `chunksize` can not be used with `shard_freq`")
+        start_date = start_date or f'01/01/{MIN_YEAR}'
+        end_date = end_date or pd.Timestamp.today().strftime('%m/%d/%Y')
+
     varlist_string = parse_varlist(vars, required_vars=required_vars)
     sql_string = f"""SELECT {varlist_string}
                         FROM {LIBRARY}.{TABLE} AS a 
@@ -110,12 +121,17 @@ def get_raw_data(
     if end_date is not None: sql_string += r"AND date <= %(end_date)s "
     if nrows is not None: sql_string += r" LIMIT %(nrows)s"
 
+    if shard_freq is not None:
+        return wrds_api.download_sharded(sql_string, shards=wrds_api.date_shards(start_date, end_date, freq=shard_freq),
+                                         max_workers=max_workers, dtypes=dtypes, dtype_backend=dtype_backend)
+
     df = wrds_api.download(sql_string,
-                             params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows})
+                             params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows},
+                             chunksize=chunksize, dtypes=dtypes, dtype_backend=dtype_backend)
     
     return df 
 
-# %% ../../nbs/01_wrds/02_crspd.ipynb 16
+# %% ../../nbs/01_wrds/02_crspd.ipynb 20
 def process_raw_data(
         df: pd.DataFrame=None,  # Must contain `permno` and `date` columns         
         clean_kwargs: dict={},  # Params to pass to `pdm.setup_panel` other than `panel_ids`, `time_var`, and `freq`
@@ -125,49 +141,117 @@ def process_raw_data(
     # Change some variables to categorical
     for col in ['shrcd','exchcd']:
         if col in df.columns:
-            df[col] = df[col].astype('Int64').astype('category')
+            df[col] = wrds_api.categorical(df[col], lambda x: x.astype('Int64'))
 
     for col in ['naics','cusip','ncusip']:
         if col in df.columns:
-            df[col] = df[col].astype('string').astype('category')
+            df[col] = wrds_api.categorical(df[col])
 
     if 'siccd' in df.columns:
-        df['siccd'] = df['siccd'].astype('Int64').astype('string').str.zfill(4).astype('category')
+        df['siccd'] = wrds_api.categorical(df['siccd'], lambda x: x.astype('Int64').astype('string').str.zfill(4))
 
     # Set up panel structure
     df = pdm.setup_panel(df, panel_ids=ENTITY_ID_IN_RAW_DSET, time_var=TIME_VAR_IN_RAW_DSET, freq=FREQ, panel_ids_toint=False, **clean_kwargs)
     return df 
 
-# %% ../../nbs/01_wrds/02_crspd.ipynb 19
+# %% ../../nbs/01_wrds/02_crspd.ipynb 23
 def delist_adj_ret(
-        df: pd.DataFrame, # Requires `ret`,`exchcd`,`dlret`,`dlstcd`, and `dlstdt` variables
+        df: pd.DataFrame, # Requires `ret`,`exchcd`,`dlret`, and `dlstcd` variables
         adj_ret_var: str='ret_adj' # Name of the adjusted return variable created by this function
 ) -> pd.DataFrame:
-    """Adjusts for returns for delisting using Shumway and Warther (1999) and Johnson and Zhao (2007)"""
+    """Adjusts for returns for delisting using Shumway and Warther (1999) and Johnson and Zhao (2007). 
+    Returns a new dataframe with `dlret` filled in and `adj_ret_var` added; `df` is not modified."""
+    
+    return crspm.delist_adj_ret(df, adj_ret_var=adj_ret_var)
+
+# %% ../../nbs/01_wrds/02_crspd.ipynb 26
+def _dense_positions(df: pd.DataFrame, pad: int) -> tuple:
+    "Position of each row of `df` (indexed by permno and date) on a grid of trading days with one segment per permno, and grid size"
+
+    ids, dates = df.index.get_level_values(0), df.index.get_level_values(1)
+    day = pd.factorize(dates, sort=True)[0] # trading day number
+    stock = pd.factorize(ids)[0]
+    first = np.full(stock.max() + 1 if len(stock) else 0, len(day))
+    last = np.zeros_like(first)
+    np.minimum.at(first, stock, day)
+    np.maximum.at(last, stock, day)
+    offset = np.concatenate([[0], np.cumsum(last - first + 1 + pad)]) 
+    return offset[stock] + pad + day - first[stock], offset[-1]
 
-    df['npdelist'] = (df['dlstcd']==500) | df['dlstcd'].between(520,584)
-    df['dlret'] = np.where(df['dlret'].isna() & df['npdelist'] & df['exchcd'].isin([1,2]), -0.35, df['dlret'])
-    df['dlret'] = np.where(df['dlret'].isna() & df['npdelist'] & df['exchcd'].isin([3]), -0.55, df['dlret'])
-    df['dlret'] = np.where(df['dlret'].notna() & df['dlret'] < -1, -1, df['dlret'])
-    df['dlret'] = df['dlret'].fillna(0)
+def _window_sum(cumsum: np.ndarray, w: int) -> np.ndarray:
+    out = cumsum.copy()
+    out[w:] -= cumsum[:-w]
+    return out
 
-    df[adj_ret_var] = (1 + df.ret) * (1 + df['dlret']) - 1
-    df[adj_ret_var] = np.where(df[adj_ret_var].isna() & (df['dlret']!=0), df['dlret'], df[adj_ret_var])
-    df = df.drop('npdelist', axis=1) 
-    return df
+def _rolling_max(x: np.ndarray, w: int) -> np.ndarray:
+    "Maximum of the non-missing values in each window of `w` elements of `x` (van Herk/Gil-Werman)"
+    n = len(x)
+    blocks = np.full(-(-n // w) * w, np.nan)
+    blocks[:n] = x
+    blocks = blocks.reshape(-1, w)
+    prefix = np.fmax.accumulate(blocks, axis=1).ravel()
+    suffix = np.fmax.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    out = np.full(n, np.nan)
+    out[w-1:] = np.fmax(suffix[:n-w+1], prefix[w-1:n])
+    return out
+
+# %% ../../nbs/01_wrds/02_crspd.ipynb 27
+def rolling_features(df: pd.DataFrame, # Daily panel (indexed by permno and date), e.g. output of `process_raw_data`
+                     windows: List[int]=[21, 63, 252], # Window lengths, in trading days
+                     ret_var: str='ret',
+                     market_var: str=None, # Market return variable. If given, adds rolling CAPM betas
+                     min_frac: float=0.8, # Minimum fraction of non-missing returns in a window
+                     ) -> pd.DataFrame:
+    """Buy-and-hold returns (`lbhret`), volatility (`retvol`), minimum and maximum daily returns (`minret`, `maxret`) 
+    and, if `market_var` is given, CAPM betas (`beta`) over rolling windows of trading days"""
+
+    pos, size = _dense_positions(df, pad=max(windows))
+    def dense(var):
+        out = np.full(size, np.nan)
+        out[pos] = df[var].to_numpy(dtype='float64', na_value=np.nan)
+        return out
+
+    ret = dense(ret_var)
+    valid = ~np.isnan(ret)
+    r = np.where(valid, ret, 0.0)
+    wiped_out = r <= -1
+    cums = {'n': np.cumsum(valid), 'r': np.cumsum(r), 'rr': np.cumsum(r * r), 'wiped_out': np.cumsum(wiped_out),
+            'logr': np.cumsum(np.log1p(np.where(wiped_out, 0.0, r)))}
+    if market_var is not None:
+        mkt = dense(market_var)
+        both = valid & ~np.isnan(mkt)
+        m, rb = np.where(both, mkt, 0.0), np.where(both, r, 0.0)
+        cums.update({'nb': np.cumsum(both), 'rb': np.cumsum(rb), 'm': np.cumsum(m), 'rm': np.cumsum(rb * m), 'mm': np.cumsum(m * m)})
+
+    out = pd.DataFrame(index=df.index)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for w in windows:
+            s = {k: _window_sum(v, w) for k, v in cums.items()}
+            enough = s['n'] >= min_frac * w
+            lbhret = np.where(s['wiped_out'] > 0, -1.0, np.expm1(s['logr']))
+            retvol = np.sqrt(np.maximum(s['rr'] - s['r']**2 / s['n'], 0) / (s['n'] - 1))
+            out[f'lbhret{w}'] = np.where(enough, lbhret, np.nan)[pos]
+            out[f'retvol{w}'] = np.where(enough, retvol, np.nan)[pos]
+            out[f'minret{w}'] = np.where(enough, -_rolling_max(-ret, w), np.nan)[pos]
+            out[f'maxret{w}'] = np.where(enough, _rolling_max(ret, w), np.nan)[pos]
+            if market_var is not None:
+                cov = s['rm'] - s['rb'] * s['m'] / s['nb']
+                var = s['mm'] - s['m']**2 / s['nb']
+                out[f'beta{w}'] = np.where(s['nb'] >= min_frac * w, cov / var, np.nan)[pos]
+    return out
 
-# %% ../../nbs/01_wrds/02_crspd.ipynb 21
+# %% ../../nbs/01_wrds/02_crspd.ipynb 30
 def features(
         df: pd.DataFrame,
+        windows: List[int]=[21, 63, 252], # Windows (in trading days) of the rolling features (see `rolling_features`)
+        market_var: str=None, # Market return variable. If given, adds rolling CAPM betas
 ) -> pd.DataFrame:
     
     out = pd.DataFrame(index=df.index)
 
-    out['ret_adj'] = delist_adj_ret(df, adj_ret_var='ret_adj')[['ret_adj']].copy()
+    out['ret_adj'] = crspm.delisting_adjustment(*[crspm._floats(df[v]) for v in ['ret','dlret','dlstcd','exchcd']])[0]
     
-    # Note that we are not using trading days below, but calendar days
-    #the rrolling method below is not feasible since it creates 30 lags all at once so it blows up the dataset
-    #out['lbhret12'] = pdm.rrolling(1+df['ret'], window=30, func='prod', skipna=True) - 1
-    #out['retvol12'] = pdm.rrolling(df['ret'], window=30, func='std', skipna=True) 
+    # Trading-day windows, without materializing one lag per day in the window (as `pdm.rrolling` would)
+    out = out.join(rolling_features(df, windows=windows, market_var=market_var))
 
-    return out 
+    return wrds_api.backend_like(out, df)
@@ -10,13 +10,14 @@ import pandas as pd
 import numpy as np
 
 import pandasmore as pdm
+from .. import polars_tools
 from . import wrds_api
 
 # %% auto 0
 __all__ = ['PROVIDER', 'URL', 'LIBRARY', 'TABLE', 'NAMES_TABLE', 'DELIST_TABLE', 'FREQ', 'MIN_YEAR', 'MAX_YEAR',
            'ENTITY_ID_IN_RAW_DSET', 'ENTITY_ID_IN_CLEAN_DSET', 'TIME_VAR_IN_RAW_DSET', 'TIME_VAR_IN_CLEAN_DSET',
-           'list_all_vars', 'default_raw_vars', 'parse_varlist', 'get_raw_data', 'process_raw_data', 'delist_adj_ret',
-           'features']
+           'DTYPES', 'list_all_vars', 'default_raw_vars', 'parse_varlist', 'get_raw_data', 'process_raw_data',
+           'delisting_adjustment', 'delist_adj_ret', 'features', 'polars_features']
 
 # %% ../../nbs/01_wrds/01_crspm.ipynb 4
 PROVIDER = 'Wharton Research Data Services (WRDS)'
@@ -32,18 +33,17 @@ ENTITY_ID_IN_RAW_DSET = 'permno'
 ENTITY_ID_IN_CLEAN_DSET = 'permno'
 TIME_VAR_IN_RAW_DSET = 'date'
 TIME_VAR_IN_CLEAN_DSET = f'{FREQ}date'
+# Compact dtypes of raw variables, applied while downloading with `get_raw_data(compact=True)` (see `wrds_api.dtype_plan`)
+DTYPES = {'permno': 'Int32', 'permco': 'Int32', 'shrcd': 'category', 'exchcd': 'category', 'siccd': 'category', 'naics': 'category', 
+          'cusip': 'category', 'ncusip': 'category', 'ticker': 'category', 'comnam': 'category', 'dlstcd': 'Int16'}
 
 # %% ../../nbs/01_wrds/01_crspm.ipynb 5
 def list_all_vars() -> pd.DataFrame:
     "Collects names of all available variables from WRDS `{LIBRARY}.{TABLE}` and `{LIBRARY}.{NAMES_TABLE}`"
 
-    try:
-        db = wrds_api.Connection()
-        msf = db.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
-        mse = db.describe_table(LIBRARY,NAMES_TABLE).assign(wrds_library=LIBRARY, wrds_table=NAMES_TABLE)
-        dlst = db.describe_table(LIBRARY,DELIST_TABLE).assign(wrds_library=LIBRARY, wrds_table=DELIST_TABLE)
-    finally:
-        db.close()
+    msf = wrds_api.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
+    mse = wrds_api.describe_table(LIBRARY,NAMES_TABLE).assign(wrds_library=LIBRARY, wrds_table=NAMES_TABLE)
+    dlst = wrds_api.describe_table(LIBRARY,DELIST_TABLE).assign(wrds_library=LIBRARY, wrds_table=DELIST_TABLE)
 
     return pd.concat([msf, mse, dlst])[['name','type','wrds_library','wrds_table']].copy()
 
@@ -65,7 +65,7 @@ def parse_varlist(vars: List[str]=None,
     # Get all available variables and add suffixes needed for the SQL query
     suffix_mapping = {TABLE: 'a.', NAMES_TABLE: 'b.', DELIST_TABLE: 'c.'}
     all_avail_vars = list_all_vars().drop_duplicates(subset='name',keep='first').copy()
-    all_avail_vars['w_prefix'] = all_avail_vars.apply(lambda row: suffix_mapping[row['wrds_table']] + row['name'] , axis=1)
+    all_avail_vars['w_prefix'] = all_avail_vars['wrds_table'].map(suffix_mapping) + all_avail_vars['name']
 
     if vars == '*': return ','.join(list(all_avail_vars['w_prefix']))
     
@@ -74,7 +74,8 @@ def parse_varlist(vars: List[str]=None,
     vars_to_get =  required_vars + [x for x in list(set(vars)) if x not in required_vars]
 
     # Validate variables to be downloaded (make sure that they are in the target database)
-    invalid_vars = [v for v in vars_to_get if v not in list(all_avail_vars.name)]
+    avail_names = set(all_avail_vars['name'])
+    invalid_vars = [v for v in vars_to_get if v not in avail_names]
     if invalid_vars: raise ValueError(f"These vars are not in the database: {invalid_vars}") 
 
     # Extract information on which variable comes from which wrds table, so we know what prefix to use
@@ -90,10 +91,14 @@ def get_raw_data(
         nrows: int=None,  #Number of rows to download. If None, full dataset will be downloaded             
         start_date: str=None,          # Start date in MM/DD/YYYY format
         end_date: str=None,            # End date in MM/DD/YYYY format  
+        chunksize: int=None, # If not None, returns an iterator of DataFrames with `chunksize` rows each
+        compact: bool=False, # If True, decodes columns into the compact dtypes in `DTYPES` (e.g. categoricals, 32-bit ids) while downloading
+        dtype_backend: str='numpy_nullable', # If 'pyarrow', columns are backed by pyarrow arrays, which `process_raw_data` and `features` keep (see `wrds_api.pyarrow_backed`)
 ) -> pd.DataFrame:
     "Downloads `vars` from `start_date` to `end_date` from WRDS {LIBRARY}.{TABLE}, {LIBRARY}.{NAMES_TABLE} and {LIBRARY}.{DELIST_TABLE}." 
 
     wrds_api.validate_dates([start_date, end_date])
+    dtypes = wrds_api.dtype_plan(DTYPES, [(LIBRARY, TABLE), (LIBRARY, NAMES_TABLE), (LIBRARY, DELIST_TABLE)]) if compact else None
     varlist_string = parse_varlist(vars, required_vars=required_vars)
     sql_string = f"""SELECT {varlist_string}
                         FROM {LIBRARY}.{TABLE} AS a 
@@ -108,7 +113,8 @@ def get_raw_data(
     if nrows is not None: sql_string += r" LIMIT %(nrows)s"
 
     df = wrds_api.download(sql_string,
-                             params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows})
+                             params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows},
+                             chunksize=chunksize, dtypes=dtypes, dtype_backend=dtype_backend)
     
     return df 
 
@@ -122,53 +128,91 @@ def process_raw_data(
     # Change some variables to categorical
     for col in ['shrcd','exchcd']:
         if col in df.columns:
-            df[col] = df[col].astype('Int64').astype('category')
+            df[col] = wrds_api.categorical(df[col], lambda x: x.astype('Int64'))
 
     for col in ['naics','cusip','ncusip']:
         if col in df.columns:
-            df[col] = df[col].astype('string').astype('category')
+            df[col] = wrds_api.categorical(df[col])
 
     if 'siccd' in df.columns:
-        df['siccd'] = df['siccd'].astype('Int64').astype('string').str.zfill(4).astype('category')
+        df['siccd'] = wrds_api.categorical(df['siccd'], lambda x: x.astype('Int64').astype('string').str.zfill(4))
 
     df = pdm.setup_panel(df, panel_ids=ENTITY_ID_IN_RAW_DSET, time_var=TIME_VAR_IN_RAW_DSET, freq=FREQ, 
                         panel_ids_toint=False, **clean_kwargs)
     return df 
 
 # %% ../../nbs/01_wrds/01_crspm.ipynb 19
+def _floats(s: pd.Series) -> np.ndarray:
+    "Values of `s` as a float64 array with missing values as NaN (also for nullable and categorical dtypes)"
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        s = s.astype(s.cat.categories.dtype)
+    return s.to_numpy(dtype='float64', na_value=np.nan)
+
+def delisting_adjustment(ret: np.ndarray, # Returns
+                         dlret: np.ndarray, # Delisting returns
+                         dlstcd: np.ndarray, # Delisting codes
+                         exchcd: np.ndarray, # Exchange codes
+                        ) -> tuple:
+    """Delisting-adjusted returns and filled-in delisting returns, computed from float arrays (NaN for missing values). 
+    Works row by row, so it can be applied to each chunk of a chunked download."""
+
+    dl = np.array(dlret, dtype='float64') # the only copy of the inputs
+    fill = np.isnan(dl) & ((dlstcd == 500) | ((dlstcd >= 520) & (dlstcd <= 584)))
+    dl[fill & ((exchcd == 1) | (exchcd == 2))] = -0.35
+    dl[fill & (exchcd == 3)] = -0.55
+    np.maximum(dl, -1, out=dl) # NaN stays NaN
+    dl[np.isnan(dl)] = 0
+
+    adj = np.add(ret, 1, dtype='float64')
+    adj *= 1 + dl
+    adj -= 1
+    no_ret = np.isnan(adj) & (dl != 0)
+    adj[no_ret] = dl[no_ret]
+    return adj, dl
+
+# %% ../../nbs/01_wrds/01_crspm.ipynb 20
 def delist_adj_ret(
-        df: pd.DataFrame, # Requires `ret`,`exchcd`,`dlret`,`dlstcd`, and `dlstdt` variables
+        df: pd.DataFrame, # Requires `ret`,`exchcd`,`dlret`, and `dlstcd` variables
         adj_ret_var: str='ret_adj' # Name of the adjusted return variable created by this function
 ) -> pd.DataFrame:
-    """Adjusts for returns for delisting using Shumway and Warther (1999) and Johnson and Zhao (2007)"""
+    """Adjusts for returns for delisting using Shumway and Warther (1999) and Johnson and Zhao (2007). 
+    Returns a new dataframe with `dlret` filled in and `adj_ret_var` added; `df` is not modified."""
 
-    df['npdelist'] = (df['dlstcd']==500) | df['dlstcd'].between(520,584)
-    
-    cond12 = df['dlret'].isna() & df['npdelist'].fillna(False) & df['exchcd'].isin([1, 2])
-    df.loc[cond12, 'dlret'] = -0.35
-    
-    cond3 = df['dlret'].isna() & df['npdelist'].fillna(False) & df['exchcd'].isin([3])
-    df.loc[cond3, 'dlret'] = -0.55
-    
-    df.loc[df['dlret'].notna() & (df['dlret'] < -1), 'dlret'] = -1
-    
-    df['dlret'] = df['dlret'].fillna(0)
-
-    df[adj_ret_var] = (1 + df.ret) * (1 + df['dlret']) - 1
-    df[adj_ret_var] = np.where(df[adj_ret_var].isna() & (df['dlret']!=0), df['dlret'], df[adj_ret_var])
-    df = df.drop('npdelist', axis=1) 
-    return df
+    adj, dl = delisting_adjustment(*[_floats(df[v]) for v in ['ret','dlret','dlstcd','exchcd']])
+    return df.assign(**{'dlret': dl, adj_ret_var: adj})
 
-# %% ../../nbs/01_wrds/01_crspm.ipynb 21
+# %% ../../nbs/01_wrds/01_crspm.ipynb 23
 def features(
         df: pd.DataFrame,
 ) -> pd.DataFrame:
     
     out = pd.DataFrame(index=df.index)
     
-    out['ret_adj'] = delist_adj_ret(df, adj_ret_var='ret_adj')[['ret_adj']].copy()
+    out['ret_adj'] = delisting_adjustment(*[_floats(df[v]) for v in ['ret','dlret','dlstcd','exchcd']])[0]
 
     out['lbhret12'] = pdm.rrolling(1+df['ret'], window=12, func='prod') - 1
     out['retvol12'] = pdm.rrolling(df['ret'], window=12, func='std') 
 
-    return out 
+    return wrds_api.backend_like(out, df)
+
+# %% ../../nbs/01_wrds/01_crspm.ipynb 27
+def polars_features(lf: pl.LazyFrame, # Output of `process_raw_data`, as a LazyFrame (see `polars_tools.from_pandas`)
+                    ) -> pl.LazyFrame:
+    """Polars version of `features`"""
+
+    pl = polars_tools.require_polars()
+    c = pl.col
+    p = polars_tools.Panel(ENTITY_ID_IN_CLEAN_DSET, TIME_VAR_IN_CLEAN_DSET, FREQ)
+
+    # Same rules as `delisting_adjustment`
+    dlstcd, exchcd = c('dlstcd'), c('exchcd')
+    fill = c('dlret').is_null() & ((dlstcd == 500) | dlstcd.is_between(520, 584))
+    dl = (pl.when(fill & exchcd.is_in([1, 2])).then(-0.35).when(fill & (exchcd == 3)).then(-0.55).otherwise(c('dlret'))
+          .clip(lower_bound=-1).fill_null(0))
+    adj = (1 + c('ret')) * (1 + dl) - 1
+
+    return lf.sort(p.index).select(p.index + [
+        pl.when(adj.is_null() & (dl != 0)).then(dl).otherwise(adj).alias('ret_adj'),
+        (p.rrolling(1 + c('ret'), 'prod', 12) - 1).alias('lbhret12'),
+        p.rrolling(c('ret'), 'std', 12).alias('retvol12'),
+    ])
@@ -0,0 +1,244 @@
+"""Synthetic stand-ins for WRDS tables, for testing and benchmarking `finsets.wrds` without WRDS credentials"""
+
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/01_wrds/10_fixtures.ipynb.
+
+# %% ../../nbs/01_wrds/10_fixtures.ipynb 2
+from __future__ import annotations
+import io
+import time
+from types import ModuleType
+from typing import List, Dict
+
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+
+from . import wrds_api, crspm, crspd, compa, compa_ccm, compq, compq_ccm, ibes_ltg
+
+# %% auto 0
+__all__ = ['ANNUAL_VARS', 'QUARTERLY_VARS', 'YTD_VARS', 'synthetic_tables', 'load_tables', 'benchmark']
+
+# %% ../../nbs/01_wrds/10_fixtures.ipynb 4
+ANNUAL_VARS = ['lt', 'at', 'txditc', 'pstkl', 'pstkrv', 'pstk', 'csho', 'ajex', 'rdip', 'act', 'dvc', 'xad', 'seq', 'che', 
+               'lct', 'dlc', 'ib', 'dvp', 'txdi', 'dp', 'txp', 'oancf', 'ivncf', 'fincf', 'dltt', 'mib', 'ceq', 'invt', 
+               'cogs', 'revt', 'sale', 'capx', 'xrd', 'txdb', 'prcc_f', 'sstk', 'prstkc', 'dltis', 'dltr', 'emp', 'dd1', 
+               'ppegt', 'ppent', 'xint', 'txt', 'sppe', 'gdwl', 'xrent', 're', 'dvpsx_f', 'tstk', 'wcap', 'rect', 'xsga', 
+               'aqc', 'oibdp', 'dpact', 'ni', 'ivao', 'ivst', 'dv', 'intan', 'pi', 'txfo', 'pifo', 'xpp', 'drc', 'drlt', 
+               'ap', 'xacc', 'itcb']
+QUARTERLY_VARS = ['atq', 'req', 'xrdq', 'cheq', 'saleq', 'revtq', 'dpq', 'ibq', 'cshoq', 'ceqq', 'seqq', 'txdiq', 'ltq', 
+                  'txditcq', 'pstkq', 'pstkrq', 'lctq', 'actq', 'piq', 'niq', 'cshprq', 'epsfxq', 'opepsq', 'epsfiq', 
+                  'epspiq', 'epspxq', 'dlttq', 'dlcq', 'txtq', 'xintq', 'ppegtq', 'ppentq', 'rectq', 'invtq', 'cogsq', 
+                  'xsgaq', 'ajexq', 'prccq', 'dvpq', 'wcapq', 'oibdpq', 'tstkq', 'intanq', 'gdwlq', 'mibq', 'oiadpq', 
+                  'ivaoq', 'npq', 'rectrq']
+YTD_VARS = ['capxy', 'oancfy', 'sstky', 'prstkcy', 'dltisy', 'dltry', 'dvy', 'sppey', 'aqcy', 'fopty', 'scstkcy', 'cdvcy']
+
+# %% ../../nbs/01_wrds/10_fixtures.ipynb 5
+def _panel(ids: pd.DataFrame, first: pd.Series, last: pd.Series, dates: pd.DatetimeIndex) -> pd.DataFrame:
+    "Rows of `ids` repeated for each of `dates` between their `first` and `last` date"
+    out = ids.loc[ids.index.repeat(len(dates))].reset_index(drop=True)
+    out['date'] = np.tile(dates.values, len(ids))
+    keep = (out['date'].values >= np.repeat(first.values, len(dates))) & (out['date'].values <= np.repeat(last.values, len(dates)))
+    return out[keep].reset_index(drop=True)
+
+def _values(rng, scale: np.ndarray, names: List[str], missing: float=0.05) -> pd.DataFrame:
+    "Random positive values proportional to `scale` (one row per element), a fraction `missing` of which is NaN"
+    out = pd.DataFrame(rng.random((len(scale), len(names))) * scale[:, None], columns=names)
+    return out.mask(rng.random(out.shape) < missing)
+
+def _month_end(months) -> pd.Series:
+    "Month-end dates from month ordinals (12 * year + month - 1)"
+    months = pd.Series(months)
+    return pd.to_datetime(dict(year=months // 12, month=months % 12 + 1, day=1)) + pd.offsets.MonthEnd(0)
+
+# %% ../../nbs/01_wrds/10_fixtures.ipynb 6
+def _companies(rng, n_firms: int, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    "Identifiers and listing period of each firm; firms beyond `n_firms` are in Compustat but not in CRSP"
+    n = int(n_firms * 1.25)
+    i = np.arange(n)
+    months = pd.date_range(start, end, freq='ME')
+    siccd = rng.integers(100, 9999, n)
+    naics = rng.integers(111110, 999999, n)
+    firms = pd.DataFrame({
+        'permno': 10000 + i, 'permco': 20000 + i, 'gvkey': [f'{100000 + x:06d}' for x in i],
+        'ticker': [f'T{x:05d}' for x in i], 'cusip': [f'{x:06d}10' for x in i], 'ncusip': [f'{x:06d}11' for x in i],
+        'comnam': [f'FIRM {x}' for x in i], 'conm': [f'FIRM {x} INC' for x in i], 'cik': [f'{x:010d}' for x in i],
+        'tic': [f'T{x:05d}' for x in i], 'fic': 'USA', 'exchg': rng.choice([11, 12, 14, 19], n),
+        'shrcd': rng.choice([10, 11, 12, 31], n, p=[0.3, 0.6, 0.05, 0.05]), 'exchcd': rng.choice([1, 2, 3], n, p=[0.3, 0.1, 0.6]),
+        'siccd': siccd, 'sich': siccd, 'sic': [f'{x:04d}' for x in siccd], 'naicsh': naics, 'naics': naics.astype(str),
+        'fyr': rng.choice([12, 3, 6, 9], n, p=[0.7, 0.1, 0.1, 0.1]),
+        'first': months[rng.integers(0, len(months) // 2 + 1, n)]})
+    # about a fifth of the firms delist before `end`
+    last = months[rng.integers(len(months) // 2, len(months), n)]
+    firms['last'] = last.where(rng.random(n) < 0.2, months[-1])
+    return firms
+
+# %% ../../nbs/01_wrds/10_fixtures.ipynb 7
+def _crsp(rng, firms: pd.DataFrame, dates: pd.DatetimeIndex, prefix: str) -> Dict[str, pd.DataFrame]:
+    "CRSP stock file, names and delisting tables (`prefix` is 'm' for monthly and 'd' for daily data)"
+    sf = _panel(firms[['permno','permco']], firms['first'], firms['last'], dates)
+    n, periods = len(sf), (12 if prefix == 'm' else 252)
+    sf['ret'] = rng.normal(0.1 / periods, 0.4 / np.sqrt(periods), n).round(6)
+    sf['retx'] = sf['ret'] - 0.02 / periods
+    sf.loc[rng.random(n) < 0.01, 'ret'] = np.nan
+    sf['prc'] = np.exp(rng.normal(3, 1, n)).round(2) * np.where(rng.random(n) < 0.05, -1, 1) # negative for bid-ask averages
+    sf['shrout'] = np.exp(rng.normal(10, 1.5, n)).round(0)
+    sf['vol'] = np.exp(rng.normal(10, 2, n)).round(0)
+    sf['cfacpr'], sf['cfacshr'] = 1.0, 1.0
+
+    names = firms[['permno','permco','ticker','cusip','ncusip','comnam','shrcd','exchcd','siccd','naics','first']]
+    names = names.rename(columns={'first': 'namedt'}).assign(nameendt=pd.Timestamp('2099-12-31'))
+
+    delist = firms.loc[firms['last'] < dates[-1], ['permno','permco','last']].rename(columns={'last': 'dlstdt'})
+    delist['dlstcd'] = rng.choice([231, 331, 500, 520, 552, 574, 584], len(delist))
+    delist['dlret'] = rng.normal(-0.1, 0.2, len(delist)).round(6)
+    delist.loc[rng.random(len(delist)) < 0.3, 'dlret'] = np.nan
+
+    return {f'crsp.{prefix}sf': sf, f'crsp.{prefix}senames': names, f'crsp.{prefix}sedelist': delist}
+
+# %% ../../nbs/01_wrds/10_fixtures.ipynb 8
+def _compustat(rng, firms: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    "Compustat annual and quarterly fundamentals and company header table"
+    header = ['gvkey','cusip','cik','tic','fic','exchg','fyr']
+    fiscal_year_ends = pd.DatetimeIndex([f'{y}-12-31' for y in range(firms['first'].dt.year.min(), firms['last'].dt.year.max() + 1)])
+    annual = _panel(firms[header + ['sich','naicsh']], firms['first'], firms['last'], fiscal_year_ends)
+    # fiscal years ending in January-May are labelled with the previous calendar year
+    annual['fyear'] = annual.pop('date').dt.year
+    annual['datadate'] = _month_end(12 * (annual['fyear'] + (annual['fyr'] < 6)) + annual['fyr'] - 1)
+    size = np.exp(rng.normal(6, 2, len(annual)))
+    annual = pd.concat([annual, _values(rng, size, ANNUAL_VARS)], axis=1)
+    annual['prcc_f'] = np.exp(rng.normal(3, 1, len(annual))).round(2)
+
+    quarterly = annual[header + ['fyear','datadate']].loc[annual.index.repeat(4)].reset_index(drop=True)
+    quarterly = quarterly.rename(columns={'fyear': 'fyearq'})
+    quarterly['fqtr'] = np.tile([1, 2, 3, 4], len(annual))
+    fiscal_year_end = 12 * quarterly['datadate'].dt.year + quarterly['datadate'].dt.month - 1
+    quarterly['datadate'] = _month_end(fiscal_year_end - 3 * (4 - quarterly['fqtr']))
+    quarterly['rdq'] = quarterly['datadate'] + pd.to_timedelta(rng.integers(20, 60, len(quarterly)), 'D')
+    quarterly['fdateq'] = quarterly['rdq'] - pd.Timedelta(days=5)
+    quarterly['apdedateq'] = quarterly['datadate']
+    size = np.exp(rng.normal(6, 2, len(quarterly)))
+    quarterly = pd.concat([quarterly, _values(rng, size, QUARTERLY_VARS)], axis=1)
+    quarterly['prccq'] = np.exp(rng.normal(3, 1, len(quarterly))).round(2)
+    # year-to-date variables accumulate within the fiscal year
+    flows = _values(rng, size / 4, YTD_VARS, missing=0)
+    quarterly[YTD_VARS] = flows.groupby([quarterly['gvkey'], quarterly['fyearq']]).cumsum()
+
+    for df in [annual, quarterly]:
+        df['indfmt'], df['datafmt'], df['popsrc'], df['consol'] = 'INDL', 'STD', 'D', 'C'
+
+    return {'comp.funda': annual, 'comp.fundq': quarterly, 'comp.company': firms[['gvkey','conm','cik','sic','naics']]}
+
+# %% ../../nbs/01_wrds/10_fixtures.ipynb 9
+def _links(rng, firms: pd.DataFrame, end: pd.Timestamp) -> Dict[str, pd.DataFrame]:
+    "CRSP-Compustat and IBES-CRSP link tables"
+    ccm = firms[['gvkey','permno','permco','first','last']].rename(
+        columns={'permno': 'lpermno', 'permco': 'lpermco', 'first': 'linkdt', 'last': 'linkenddt'})
+    ccm['linkenddt'] = ccm['linkenddt'].where(ccm['linkenddt'] < end)  # NULL for links that are still active
+    ccm['liid'] = '01'
+    ccm['linktype'] = rng.choice(['LU', 'LC', 'LD', 'NR'], len(ccm), p=[0.8, 0.1, 0.05, 0.05])
+    ccm['linkprim'] = rng.choice(['P', 'C', 'J'], len(ccm), p=[0.85, 0.1, 0.05])
+
+    # every tenth link (if it lasts over a year) is followed by another one for the same permno, from the day after it ends, 
+    # or (every other one) from the day it ends, a quarter end, so that both links are active on a `datadate`
+    long_lived = (ccm['linkenddt'].fillna(end) - ccm['linkdt']) > pd.Timedelta(days=365)
+    split = ccm[long_lived & (np.arange(len(ccm)) % 10 == 3)]
+    middle = split['linkdt'] + (split['linkenddt'].fillna(end) - split['linkdt']) // 2
+    same_day = np.arange(len(split)) % 2 == 1
+    boundary = middle.dt.normalize().where(~same_day, (middle + pd.offsets.QuarterEnd(0)).dt.normalize())
+    ccm.loc[split.index, 'linkenddt'] = boundary
+    later = split.assign(linkdt=boundary + pd.to_timedelta(np.where(same_day, 0, 1), 'D'), linktype='LU', linkprim='P')
+    # and every tenth firm has a secondary security (another permno) linked at the same time as the primary one
+    secondary = ccm[np.arange(len(ccm)) % 10 == 7].assign(lpermno=lambda df: df['lpermno'] + 50000, liid='02', 
+                                                        linktype='LU', linkprim='J')
+    ccm = pd.concat([ccm, later, secondary], ignore_index=True)
+
+    ibes = firms[['ticker','permno','ncusip','first','last']].rename(columns={'first': 'sdate', 'last': 'edate'})
+    ibes['score'] = rng.choice([1, 2, 6], len(ibes), p=[0.9, 0.05, 0.05])
+    return {'crsp.ccmxpf_lnkhist': ccm, 'wrdsapps_link_crsp_ibes.ibcrsphist': ibes}
+
+def _ibes_ltg(rng, firms: pd.DataFrame, months: pd.DatetimeIndex) -> pd.DataFrame:
+    "IBES detail file with long-term growth forecasts (`fpi` '0'), about one forecast per firm-quarter"
+    ltg = _panel(firms[['ticker']], firms['first'], firms['last'], months)
+    ltg = ltg[rng.random(len(ltg)) < 1/3].reset_index(drop=True)
+    ltg['anndats'] = ltg.pop('date') - pd.to_timedelta(rng.integers(0, 28, len(ltg)), 'D')
+    ltg['revdats'], ltg['actdats'] = ltg['anndats'], ltg['anndats']
+    ltg['fpedats'] = pd.NaT
+    ltg['value'] = rng.normal(15, 5, len(ltg)).round(2)
+    ltg['fpi'], ltg['measure'], ltg['pdf'] = '0', 'EPS', 'D'
+    ltg['estimator'] = rng.integers(1, 500, len(ltg))
+    ltg['analys'] = rng.integers(1, 10000, len(ltg))
+    return ltg
+
+# %% ../../nbs/01_wrds/10_fixtures.ipynb 10
+def synthetic_tables(n_firms: int=100, # Number of firms in CRSP (Compustat has 25% more)
+                     start_year: int=2000, 
+                     end_year: int=2004,
+                     daily: bool=True, # If False, skips the (large) daily CRSP tables
+                     seed: int=0,
+                     ) -> Dict[str, pd.DataFrame]:
+    "Random stand-ins for the WRDS tables used by `finsets.wrds`, keyed by '{library}.{table}'"
+
+    rng = np.random.default_rng(seed)
+    start, end = pd.Timestamp(f'{start_year}-01-01'), pd.Timestamp(f'{end_year}-12-31')
+    firms = _companies(rng, n_firms, start, end)
+    crsp_firms = firms.iloc[:n_firms]
+    months = pd.date_range(start, end, freq='ME')
+
+    tables = _crsp(rng, crsp_firms, months, 'm')
+    if daily: tables.update(_crsp(rng, crsp_firms, pd.bdate_range(start, end), 'd'))
+    tables.update(_compustat(rng, firms))
+    tables.update(_links(rng, crsp_firms, end))
+    tables['ibes.detu_epsus'] = _ibes_ltg(rng, crsp_firms, months)
+    return tables
+
+# %% ../../nbs/01_wrds/10_fixtures.ipynb 13
+def load_tables(tables: Dict[str, pd.DataFrame], # Output of `synthetic_tables`
+                ):
+    "Writes `tables` to the Postgres server that `wrds_api.Connection` connects to, replacing tables with the same name"
+
+    with wrds_api.connection() as db:
+        for name, df in tables.items():
+            library, table = name.split('.')
+            db.connection.exec_driver_sql(f"CREATE SCHEMA IF NOT EXISTS {library}")
+            dates = {c: sa.types.Date for c in df.columns if pd.api.types.is_datetime64_any_dtype(df[c])}
+            df.head(0).to_sql(table, db.connection, schema=library, if_exists='replace', index=False, dtype=dates)
+
+            buffer = io.StringIO()
+            df.to_csv(buffer, index=False, header=False, date_format='%Y-%m-%d')
+            buffer.seek(0)
+            with db.connection.connection.cursor() as cur:
+                cur.copy_expert(f"COPY {library}.{table} FROM STDIN WITH (FORMAT csv)", buffer)
+
+    # pooled connections and cached descriptions may still describe the old tables
+    wrds_api.POOL.close_all()
+    wrds_api.clear_schema_cache()
+
+# %% ../../nbs/01_wrds/10_fixtures.ipynb 17
+def benchmark(modules: List[ModuleType]=None, # `finsets.wrds` modules to time; if None, all modules with synthetic tables
+              scales: List[int]=[100, 1000], # Numbers of firms in the synthetic tables
+              start_year: int=2000,
+              end_year: int=2004,
+              repeat: int=1, # Number of times each module is timed at each scale
+              ) -> pd.DataFrame:
+    "Loads synthetic tables with each number of firms in `scales` and times `get_raw_data`, `process_raw_data` and `features` of each of `modules`"
+
+    if modules is None: modules = [crspm, crspd, compa, compa_ccm, compq, compq_ccm, ibes_ltg]
+
+    results = []
+    for n_firms in scales:
+        load_tables(synthetic_tables(n_firms, start_year, end_year, daily=crspd in modules))
+        for module in modules:
+            for _ in range(repeat):
+                tic = time.perf_counter()
+                df = module.get_raw_data()
+                timings = {'get_raw_data': time.perf_counter() - tic}
+                rows = len(df)
+                for step in ['process_raw_data', 'features']:
+                    if not hasattr(module, step): continue
+                    tic = time.perf_counter()
+                    df = getattr(module, step)(df)
+                    timings[step] = time.perf_counter() - tic
+                results += [{'module': module.__name__.split('.')[-1], 'n_firms': n_firms, 'rows': rows, 
+                             'step': step, 'seconds': seconds} for step, seconds in timings.items()]
+
+    return pd.DataFrame(results)
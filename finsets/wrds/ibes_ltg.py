@@ -28,18 +28,14 @@ MIN_YEAR = 1925
 MAX_YEAR = None
 ENTITY_ID_IN_RAW_DSET = 'permno'
 ENTITY_ID_IN_CLEAN_DSET = 'permno'
-TIME_VAR_IN_RAW_DSET = 'date'
+TIME_VAR_IN_RAW_DSET = 'anndats'
 TIME_VAR_IN_CLEAN_DSET = f'{FREQ}date'
 
 # %% ../../nbs/01_wrds/06_ibes_ltg.ipynb 5
 def list_all_vars() -> pd.DataFrame:
     "Collects names of all available variables from WRDS f`{LIBRARY}.{TABLE}`"
 
-    try:
-        db = wrds_api.Connection()
-        funda = db.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
-    finally:
-        db.close()
+    funda = wrds_api.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
 
     return funda[['name','type','wrds_library','wrds_table']]
 
@@ -75,6 +71,7 @@ def get_raw_data(vars: List[str]=None, # If None, downloads `default_raw_vars`;
              start_date: str=None, # Start date in MM/DD/YYYY format
              end_date: str=None, #End date in MM/DD/YYYY format; if None, defaults to current date
              permno_match_score: tuple=(1,), #accuracy of permno-ibes link. 1-6. 1 is best. use >1 with caution.
+             chunksize: int=None, # If not None, returns an iterator of DataFrames with `chunksize` rows each
              ) -> pd.DataFrame:
     """Downloads `vars` from `start_date` to `end_date` from WRDS `ibes.detu_epsus` library and adds PERMNO from CRSP"""
 
@@ -95,4 +92,5 @@ def get_raw_data(vars: List[str]=None, # If None, downloads `default_raw_vars`;
 
     return wrds_api.download(sql_string,
                              params={'permno_match_score': permno_match_score,
-                                 'start_date':start_date, 'end_date':end_date, 'nrows':nrows})
+                                 'start_date':start_date, 'end_date':end_date, 'nrows':nrows},
+                             chunksize=chunksize)
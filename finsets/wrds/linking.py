@@ -2,17 +2,24 @@
 
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/01_wrds/linking.ipynb.
 
-# %% auto 0
-__all__ = ['gvkey_permno_m', 'gvkey_permno_a', 'gvkey_permno_q', 'ibes_ticker_permno', 'bond_cusip_permno']
-
 # %% ../../nbs/01_wrds/linking.ipynb 3
+from __future__ import annotations
+from typing import List, Iterator, Callable
+import threading
+
+import numpy as np
 import pandas as pd
 
 import pandasmore as pdm
 from . import wrds_api
 
+# %% auto 0
+__all__ = ['CCM_LINK_TYPES', 'CCM_LINK_PRIMS', 'gvkey_permno_m', 'gvkey_permno_a', 'gvkey_permno_q', 'ccm_links',
+           'resolve_permno', 'resolve_gvkey', 'add_permno', 'link_chunks', 'ibes_ticker_permno', 'bond_cusip_permno']
+
 # %% ../../nbs/01_wrds/linking.ipynb 6
 def gvkey_permno_m(nrows: int=None, #Number of rows to download. If None, full dataset will be downloaded
+                   use_cache: bool=False, # If True, reuses the result of an identical earlier query (see `wrds_api.cached_query`)
                    ) -> pd.DataFrame:
     """CRSP Monthly ids, with gvkeys"""
 
@@ -27,7 +34,7 @@ def gvkey_permno_m(nrows: int=None, #Number of rows to download. If None, full d
                     {limit_clause}                                   
                 """
     
-    df = wrds_api.download(sql_string)
+    df = wrds_api.download(sql_string, use_cache=use_cache)
     df = pdm.setup_panel(df, panel_ids='permno', time_var='date', freq='M',
                          drop_index_duplicates=True, duplicates_which_keep='last')
     df['gvkey'] = df['gvkey'].astype('string')
@@ -35,6 +42,7 @@ def gvkey_permno_m(nrows: int=None, #Number of rows to download. If None, full d
 
 # %% ../../nbs/01_wrds/linking.ipynb 9
 def gvkey_permno_a(nrows: int=None, #Number of rows to download. If None, full dataset will be downloaded
+                   use_cache: bool=False, # If True, reuses the result of an identical earlier query (see `wrds_api.cached_query`)
                    ) -> pd.DataFrame:
     """qvkey to permno correspondence at the annual frequency. As done by CCM."""
 
@@ -48,7 +56,7 @@ def gvkey_permno_a(nrows: int=None, #Number of rows to download. If None, full d
                     {limit_clause}            
                 """
     
-    df = wrds_api.download(sql_string)
+    df = wrds_api.download(sql_string, use_cache=use_cache)
     df = pdm.setup_panel(df, panel_ids='permno', time_var='datadate', freq='Y',
                          drop_index_duplicates=True, duplicates_which_keep='last')
     df['gvkey'] = df['gvkey'].astype('string')
@@ -56,6 +64,7 @@ def gvkey_permno_a(nrows: int=None, #Number of rows to download. If None, full d
 
 # %% ../../nbs/01_wrds/linking.ipynb 12
 def gvkey_permno_q(nrows : int=None, #Number of rows to download. If None, full dataset will be downloaded
+                   use_cache: bool=False, # If True, reuses the result of an identical earlier query (see `wrds_api.cached_query`)
                    ) -> pd.DataFrame:
     """qvkey to permno correspondence at the quarterly frequency. As done by CCM."""
     
@@ -69,20 +78,182 @@ def gvkey_permno_q(nrows : int=None, #Number of rows to download. If None, full
                     {limit_clause}
                 """
     
-    df = wrds_api.download(sql_string)
+    df = wrds_api.download(sql_string, use_cache=use_cache)
     df = pdm.setup_panel(df, panel_ids='permno', time_var='datadate', freq='Q',
                          drop_index_duplicates=True, duplicates_which_keep='last')
     df['gvkey'] = df['gvkey'].astype('string')
     return df.reset_index()[['permno','Qdate','gvkey']].copy()    
 
 # %% ../../nbs/01_wrds/linking.ipynb 16
-def ibes_ticker_permno(nrows: int=None):
+CCM_LINK_TYPES = ['LU','LC'] # Default `linktype`s, as in the queries above
+CCM_LINK_PRIMS = ['P','C'] # Default `linkprim`s, as in the queries above
+
+_ccm_links = {} # link table and interval indexes, built the first time they are needed
+_ccm_lock = threading.RLock() # lets concurrent downloads (e.g. in `panel.build`) share one copy of the links
+
+# %% ../../nbs/01_wrds/linking.ipynb 17
+def ccm_links(refresh: bool=False, # If True, downloads the link table again
+              use_cache: bool=False, # If True, reuses the result of an identical earlier query (see `wrds_api.cached_query`)
+              ) -> pd.DataFrame:
+    """CRSP-Compustat link table (`crsp.ccmxpf_lnkhist`), downloaded once and kept in memory"""
+
+    with _ccm_lock:
+        if refresh or 'links' not in _ccm_links:
+            df = wrds_api.download("""SELECT gvkey, lpermno AS permno, lpermco AS permco, liid, linktype, linkprim, linkdt, linkenddt
+                                      FROM crsp.ccmxpf_lnkhist 
+                                      WHERE lpermno IS NOT NULL""", use_cache=use_cache)
+            df['gvkey'] = df['gvkey'].astype('string')
+            df[['permno','permco']] = df[['permno','permco']].astype('Int64')
+            df['linkdt'] = pd.to_datetime(df['linkdt'])
+            df['linkenddt'] = pd.to_datetime(df['linkenddt']).fillna(pd.Timestamp.today().normalize())
+            _ccm_links.clear()
+            _ccm_links['links'] = df
+        return _ccm_links['links']
+
+# %% ../../nbs/01_wrds/linking.ipynb 18
+_DAYS_PER_ID = 2**20 # larger than the number of days between any two dates in the link table
+
+def _days(dates) -> np.ndarray:
+    return pd.to_datetime(pd.Series(dates)).values.astype('datetime64[D]').astype('int64') + _DAYS_PER_ID // 2
+
+def _link_index(id_var: str, linktype: List[str], linkprim: List[str]) -> dict:
+    "Links that follow the `linktype` and `linkprim` rules, sorted by `id_var` and start date"
+
+    key = (id_var, tuple(linktype or ()), tuple(linkprim or ()))
+    with _ccm_lock:
+        if key not in _ccm_links:
+            links = ccm_links().dropna(subset=[id_var])
+            if linktype: links = links[links['linktype'].isin(linktype)]
+            if linkprim: links = links[links['linkprim'].isin(linkprim)]
+            links = links.sort_values([id_var, 'linkdt']).reset_index(drop=True)
+            ids = pd.Index(links[id_var].unique())
+            codes = ids.get_indexer(links[id_var])
+            start, end = _days(links['linkdt']), _days(links['linkenddt'])
+            # ids with links that start before (or on the day) an earlier link ends
+            overlaps = pd.Series(end).groupby(codes).cummax().groupby(codes).shift().values >= start
+            _ccm_links[key] = dict(links=links, ids=ids, codes=codes, start=start, end=end,
+                                   search_keys=codes * _DAYS_PER_ID + start, overlapping=np.unique(codes[overlaps]))
+        return _ccm_links[key]
+
+# %% ../../nbs/01_wrds/linking.ipynb 19
+def _active_links(index: dict, rows: np.ndarray, codes: np.ndarray, days: np.ndarray) -> pd.DataFrame:
+    "Every (`row`, `pos`) pair where link `pos` of the link index is active for the id `codes` on `days` of `rows`"
+
+    candidates = pd.DataFrame({'row': rows, 'code': codes, 'day': days}).merge(
+        pd.DataFrame({'code': index['codes'], 'start': index['start'], 'end': index['end'], 
+                      'pos': np.arange(len(index['codes']))}), on='code')
+    return candidates[(candidates['start'] <= candidates['day']) & (candidates['day'] <= candidates['end'])]
+
+def _resolve(id_var: str, ids, dates, linktype: List[str], linkprim: List[str]) -> np.ndarray:
+    "Position in the link index of the link active for each (`ids`, `dates`) pair (the latest-starting one if several are); -1 where there is none"
+
+    index = _link_index(id_var, linktype, linkprim)
+    codes = index['ids'].get_indexer(pd.Index(ids))
+    days = _days(dates)
+    pos = np.searchsorted(index['search_keys'], codes * _DAYS_PER_ID + days, side='right') - 1
+    found = (codes >= 0) & (pos >= 0)
+    pos = np.where(found, pos, 0)
+    found &= (index['codes'][pos] == codes) & (days <= index['end'][pos])
+    pos = np.where(found, pos, -1)
+
+    # the most recent link may have ended while an older one is still active
+    missed = np.flatnonzero(~found & np.isin(codes, index['overlapping']))
+    if len(missed):
+        candidates = _active_links(index, missed, codes[missed], days[missed])
+        candidates = candidates.sort_values('start').drop_duplicates('row', keep='last')
+        pos[candidates['row'].values] = candidates['pos'].values
+    return pos
+
+def _resolve_all(id_var: str, ids, dates, linktype: List[str], linkprim: List[str]) -> tuple:
+    "Row of (`ids`, `dates`) and position in the link index of every link active for it, sorted by row and link start date"
+
+    index = _link_index(id_var, linktype, linkprim)
+    codes = index['ids'].get_indexer(pd.Index(ids))
+    pos = _resolve(id_var, ids, dates, linktype, linkprim)
+
+    # ids with overlapping links can have several active links on the same date
+    overlapping = np.isin(codes, index['overlapping'])
+    single, multi = np.flatnonzero(~overlapping & (pos >= 0)), np.flatnonzero(overlapping)
+    candidates = _active_links(index, multi, codes[multi], _days(dates)[multi])
+    rows = np.concatenate([single, candidates['row'].values]).astype('int64')
+    pos = np.concatenate([pos[single], candidates['pos'].values]).astype('int64')
+    order = np.lexsort((pos, rows))
+    return rows[order], pos[order]
+
+# %% ../../nbs/01_wrds/linking.ipynb 20
+def resolve_permno(gvkey, # Compustat gvkeys (array-like)
+                   date, # Dates on which the link must be active (array-like, same length as `gvkey`)
+                   linktype: List[str]=CCM_LINK_TYPES, # If None, links of all types are used
+                   linkprim: List[str]=CCM_LINK_PRIMS, # If None, primary and secondary links are used
+                   ) -> pd.Series:
+    "PERMNO linked to each `gvkey` on each `date` (missing if there is no link)"
+
+    pos = _resolve('gvkey', gvkey, date, linktype, linkprim)
+    permno = _link_index('gvkey', linktype, linkprim)['links']['permno'].array.take(pos, allow_fill=True)
+    return pd.Series(permno, index=gvkey.index if isinstance(gvkey, pd.Series) else None, name='permno')
+
+def resolve_gvkey(permno, # CRSP permnos (array-like)
+                  date, # Dates on which the link must be active (array-like, same length as `permno`)
+                  linktype: List[str]=CCM_LINK_TYPES, # If None, links of all types are used
+                  linkprim: List[str]=CCM_LINK_PRIMS, # If None, primary and secondary links are used
+                  ) -> pd.Series:
+    "Compustat gvkey linked to each `permno` on each `date` (missing if there is no link)"
+
+    pos = _resolve('permno', permno, date, linktype, linkprim)
+    gvkey = _link_index('permno', linktype, linkprim)['links']['gvkey'].array.take(pos, allow_fill=True)
+    return pd.Series(gvkey, index=permno.index if isinstance(permno, pd.Series) else None, name='gvkey')
+
+# %% ../../nbs/01_wrds/linking.ipynb 21
+def add_permno(df: pd.DataFrame, # Compustat data, e.g. from `compa.get_raw_data` 
+               gvkey_var: str='gvkey',
+               date_var: str='datadate',
+               linktype: List[str]=CCM_LINK_TYPES, # If None, links of all types are used
+               linkprim: List[str]=CCM_LINK_PRIMS, # If None, primary and secondary links are used
+               dropna: bool=True, # If True, drops rows without a link (as an inner join would)
+               ) -> pd.DataFrame:
+    """Adds `permno`, `permco`, `liid` and `linkprim` from the CCM links active for each row of `df`, without querying WRDS.
+    Rows with several active links are repeated once per link, as in an inner join with the link table."""
+
+    rows, pos = _resolve_all('gvkey', df[gvkey_var], df[date_var], linktype, linkprim)
+    if not dropna:
+        unlinked = np.setdiff1d(np.arange(len(df)), rows)
+        rows, pos = np.concatenate([rows, unlinked]), np.concatenate([pos, np.full(len(unlinked), -1)])
+        order = np.argsort(rows, kind='stable')
+        rows, pos = rows[order], pos[order]
+    links = _link_index('gvkey', linktype, linkprim)['links']
+    out = df.drop(columns=['permno','permco','liid','linkprim'], errors='ignore').iloc[rows]
+    link_vars = {v: links[v].array.take(pos, allow_fill=True) for v in ['permno','permco','liid','linkprim']}
+    return pd.concat([pd.DataFrame(link_vars, index=out.index), out], axis=1)
+
+# %% ../../nbs/01_wrds/linking.ipynb 25
+def link_chunks(chunks: Iterator[pd.DataFrame], # Chunks of unlinked data, e.g. from `wrds_api.stream`
+                link: Callable=add_permno, # Applied to each chunk, e.g. `add_permno` with some `linkprim`
+                nrows: int=None, # If not None, stops (and closes `chunks`) once this many linked rows have been yielded
+                ) -> Iterator[pd.DataFrame]:
+    "`link` applied to each of `chunks`, keeping at most `nrows` linked rows in total"
+
+    try:
+        for chunk in chunks:
+            linked = link(chunk)
+            if nrows is not None: linked, nrows = linked.iloc[:nrows], nrows - min(nrows, len(linked))
+            yield linked
+            if nrows == 0: return
+    finally:
+        if hasattr(chunks, 'close'): chunks.close()
+
+# %% ../../nbs/01_wrds/linking.ipynb 28
+def ibes_ticker_permno(nrows: int=None, #Number of rows to download. If None, full dataset will be downloaded
+                       use_cache: bool=False, # If True, reuses the result of an identical earlier query (see `wrds_api.cached_query`)
+                       ):
     limit_clause = ''
     if nrows is not None: limit_clause = f' LIMIT {nrows}'
-    return wrds_api.download('SELECT * FROM wrdsapps_link_crsp_ibes.ibcrsphist' + limit_clause)
+    return wrds_api.download('SELECT * FROM wrdsapps_link_crsp_ibes.ibcrsphist' + limit_clause, use_cache=use_cache)
 
-# %% ../../nbs/01_wrds/linking.ipynb 20
-def bond_cusip_permno(nrows: int=None):
+# %% ../../nbs/01_wrds/linking.ipynb 32
+def bond_cusip_permno(nrows: int=None, #Number of rows to download. If None, full dataset will be downloaded
+                      use_cache: bool=False, # If True, reuses the result of an identical earlier query (see `wrds_api.cached_query`)
+                      use_copy: bool=False, # If True, downloads through Postgres `COPY` (see `wrds_api.copy_query`)
+                      ):
     limit_clause = ''
     if nrows is not None: limit_clause = f' LIMIT {nrows}'
-    return wrds_api.download('SELECT * FROM wrdsapps.bondcrsp_link' + limit_clause)
+    return wrds_api.download('SELECT * FROM wrdsapps.bondcrsp_link' + limit_clause, use_cache=use_cache, use_copy=use_copy)
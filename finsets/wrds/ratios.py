@@ -33,11 +33,7 @@ TIME_VAR_IN_CLEAN_DSET = f'{FREQ}date'
 def list_all_vars() -> pd.DataFrame:
     "Collects names of all available variables from WRDS f`{LIBRARY}.{TABLE}`"
 
-    try:
-        db = wrds_api.Connection()
-        funda = db.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
-    finally:
-        db.close()
+    funda = wrds_api.describe_table(LIBRARY,TABLE).assign(wrds_library=LIBRARY, wrds_table=TABLE)
 
     return funda[['name','type','wrds_library','wrds_table']]
 
@@ -45,7 +41,9 @@ def list_all_vars() -> pd.DataFrame:
 def get_raw_data(vars: List[str]=None, # If None or '*', downloads all variables
              nrows: int=None, #Number of rows to download. If None, full dataset will be downloaded
              start_date: str=None, # Start date in MM/DD/YYYY format
-             end_date: str=None #End date in MM/DD/YYYY format
+             end_date: str=None, #End date in MM/DD/YYYY format
+             chunksize: int=None, # If not None, returns an iterator of DataFrames with `chunksize` rows each
+             use_copy: bool=False, # If True, downloads through Postgres `COPY` (faster for many variables, see `wrds_api.copy_query`)
              ) -> pd.DataFrame:
     """Downloads `vars` from `start_date` to `end_date` from WRDS `{LIBRARY}.{TABLE}` library"""
 
@@ -59,7 +57,8 @@ def get_raw_data(vars: List[str]=None, # If None or '*', downloads all variables
     if nrows is not None: sql_string += r" LIMIT %(nrows)s"
 
     return wrds_api.download(sql_string,
-                            params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows})
+                            params={'start_date':start_date, 'end_date':end_date, 'nrows':nrows},
+                            chunksize=chunksize, use_copy=use_copy)
 
 # %% ../../nbs/01_wrds/05_ratios.ipynb 11
 def process_raw_data(
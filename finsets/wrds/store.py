@@ -0,0 +1,195 @@
+"""Local Parquet store for raw WRDS data"""
+
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/01_wrds/09_store.ipynb.
+
+# %% ../../nbs/01_wrds/09_store.ipynb 2
+from __future__ import annotations
+import json
+import inspect
+import datetime
+from pathlib import Path
+from types import ModuleType
+from typing import List
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from .. import cache_tools
+from . import wrds_api
+
+# %% auto 0
+__all__ = ['PARTITION_VAR', 'META_FILE', 'dataset_path', 'read_meta', 'save', 'load', 'get_raw_data', 'high_water_mark',
+           'refresh']
+
+# %% ../../nbs/01_wrds/09_store.ipynb 4
+PARTITION_VAR = 'year'
+META_FILE = '_finsets_meta.json'
+
+# %% ../../nbs/01_wrds/09_store.ipynb 5
+def dataset_path(module: ModuleType, # A `finsets.wrds` module, e.g. `crspm`
+                 ) -> Path:
+    "Returns the directory that holds the local dataset for `module`"
+
+    return cache_tools.cache_path('wrds_store', module.__name__.split('.')[-1])
+
+# %% ../../nbs/01_wrds/09_store.ipynb 6
+def read_meta(module: ModuleType, # A `finsets.wrds` module, e.g. `crspm`
+              ) -> dict:
+    "Returns the description of what is stored locally for `module`, or None if nothing is"
+
+    path = dataset_path(module) / META_FILE
+    if not path.exists(): return None
+    with open(path) as f:
+        return json.load(f)
+
+def _write_meta(module, meta):
+    with open(dataset_path(module) / META_FILE, 'w') as f:
+        json.dump(meta, f, indent=1)
+
+# %% ../../nbs/01_wrds/09_store.ipynb 7
+def _partition_years(module, df):
+    return pd.to_datetime(df[module.TIME_VAR_IN_RAW_DSET]).dt.year.astype('int32')
+
+def save(module: ModuleType, # A `finsets.wrds` module, e.g. `crspm`
+         df: pd.DataFrame, # Raw data, as returned by `module.get_raw_data`
+         ):
+    "Writes `df` to the local dataset of `module`. Years already stored that also appear in `df` are replaced."
+
+    table = pa.Table.from_pandas(df.assign(**{PARTITION_VAR: _partition_years(module, df)}), preserve_index=False)
+    ds.write_dataset(table, dataset_path(module), format='parquet',
+                     partitioning=ds.partitioning(pa.schema([(PARTITION_VAR, pa.int32())]), flavor='hive'),
+                     existing_data_behavior='delete_matching')
+
+# %% ../../nbs/01_wrds/09_store.ipynb 8
+def _as_date(date_string: str) -> datetime.date:
+    return datetime.datetime.strptime(date_string, '%m/%d/%Y').date()
+
+def _resolve_vars(module, vars):
+    if vars is None and hasattr(module, 'default_raw_vars'): vars = module.default_raw_vars()
+    return '*' if vars is None or vars == '*' else list(vars)
+
+def load(module: ModuleType, # A `finsets.wrds` module, e.g. `crspm`
+         vars: List[str]=None, # If None, loads `default_raw_vars`; use '*' to get all stored variables
+         start_date: str=None, # Start date in MM/DD/YYYY format
+         end_date: str=None, #End date in MM/DD/YYYY format
+         ) -> pd.DataFrame:
+    "Reads `vars` from `start_date` to `end_date` from the local dataset of `module`, without touching WRDS"
+
+    wrds_api.validate_dates([start_date, end_date])
+    meta = read_meta(module)
+    if meta is None: raise FileNotFoundError(f"No local data stored for {module.__name__}")
+
+    vars = _resolve_vars(module, vars)
+    columns = None if vars == '*' else [c for c in meta['columns'] if c in meta['fixed_columns'] or c in vars]
+
+    filters = []
+    if start_date: filters.append((PARTITION_VAR, '>=', _as_date(start_date).year))
+    if end_date: filters.append((PARTITION_VAR, '<=', _as_date(end_date).year))
+    df = pd.read_parquet(dataset_path(module), columns=columns, filters=filters or None,
+                         dtype_backend='numpy_nullable')
+    df = df.drop(columns=PARTITION_VAR, errors='ignore')
+
+    dates = pd.to_datetime(df[module.TIME_VAR_IN_RAW_DSET])
+    keep = pd.Series(True, index=df.index)
+    if start_date: keep &= dates >= pd.Timestamp(_as_date(start_date))
+    if end_date: keep &= dates <= pd.Timestamp(_as_date(end_date))
+    return df[keep].reset_index(drop=True)
+
+# %% ../../nbs/01_wrds/09_store.ipynb 10
+def _has_vars(meta, vars):
+    return meta['vars'] == '*' or (vars != '*' and set(vars) <= set(meta['vars']))
+
+def _fixed_columns(module, df, vars, kwargs):
+    params = inspect.signature(module.get_raw_data).parameters
+    required = kwargs.get('required_vars', params['required_vars'].default if 'required_vars' in params else [])
+    required = set(required) | {module.ENTITY_ID_IN_RAW_DSET, module.TIME_VAR_IN_RAW_DSET}
+    return [c for c in df.columns if c in required or (vars != '*' and c not in vars)]
+
+def _fetch(module, vars, start, end, kwargs):
+    df = module.get_raw_data(vars=vars, start_date=start.strftime('%m/%d/%Y'), end_date=end.strftime('%m/%d/%Y'), **kwargs)
+    if module.TIME_VAR_IN_RAW_DSET not in df.columns:
+        raise ValueError(f"{module.__name__} can not be stored locally: its raw data has no {module.TIME_VAR_IN_RAW_DSET} column (TIME_VAR_IN_RAW_DSET) to partition it by")
+    return df
+
+def get_raw_data(module: ModuleType, # A `finsets.wrds` module, e.g. `crspm`
+                 vars: List[str]=None, # If None, uses `default_raw_vars`; use '*' to get all available variables
+                 start_date: str=None, # Start date in MM/DD/YYYY format
+                 end_date: str=None, #End date in MM/DD/YYYY format
+                 refresh: bool=False, # If True, discards the local dataset and downloads everything again
+                 **kwargs, # Passed on to `module.get_raw_data`, except `chunksize` and `nrows`
+                 ) -> pd.DataFrame:
+    "Returns `module.get_raw_data(vars, start_date=start_date, end_date=end_date, **kwargs)`, downloading from WRDS only what is not in the local dataset"
+
+    wrds_api.validate_dates([start_date, end_date])
+    unsupported = [k for k in ('chunksize', 'nrows') if kwargs.get(k) is not None]
+    if unsupported: raise ValueError(f"The local store keeps whole datasets, so {unsupported} can not be used with it")
+    requested = _resolve_vars(module, vars)
+    start = datetime.date((_as_date(start_date) if start_date else datetime.date(module.MIN_YEAR, 1, 1)).year, 1, 1)
+    end = _as_date(end_date) if end_date else datetime.date.today()
+
+    meta = None if refresh else read_meta(module)
+    # Compared as stored in the metadata, where e.g. tuples have become lists
+    if meta is not None and meta['kwargs'] != json.loads(json.dumps(kwargs)): meta = None
+
+    if meta is not None and _has_vars(meta, requested):
+        stored_start, stored_end = _as_date(meta['start_date']), _as_date(meta['end_date'])
+        if stored_start <= start and end <= stored_end:
+            return load(module, requested, start_date, end_date)
+        if start < stored_start:
+            save(module, _fetch(module, meta['vars'], start, stored_start - datetime.timedelta(days=1), kwargs))
+        if end > stored_end:
+            save(module, _fetch(module, meta['vars'], datetime.date(stored_end.year, 1, 1), end, kwargs))
+        start, end = min(start, stored_start), max(end, stored_end)
+    else:
+        vars = requested
+        if meta is not None:
+            vars = '*' if '*' in (vars, meta['vars']) else meta['vars'] + [v for v in vars if v not in meta['vars']]
+            start, end = min(start, _as_date(meta['start_date'])), max(end, _as_date(meta['end_date']))
+        df = _fetch(module, vars, start, end, kwargs)
+        cache_tools.clear_cache('wrds_store', dataset_path(module).name)
+        save(module, df)
+        meta = {'vars': vars, 'kwargs': kwargs, 'columns': list(df.columns),
+                'fixed_columns': _fixed_columns(module, df, vars, kwargs)}
+
+    meta.update(start_date=start.strftime('%m/%d/%Y'), end_date=end.strftime('%m/%d/%Y'))
+    _write_meta(module, meta)
+    return load(module, requested, start_date, end_date)
+
+# %% ../../nbs/01_wrds/09_store.ipynb 14
+def high_water_mark(module: ModuleType, # A `finsets.wrds` module, e.g. `crspm`
+                    ) -> datetime.date:
+    "Returns the latest `module.TIME_VAR_IN_RAW_DSET` stored locally for `module`"
+
+    path = dataset_path(module)
+    last_year = max(int(p.name.split('=')[1]) for p in path.glob(f'{PARTITION_VAR}=*'))
+    dates = pd.read_parquet(path, columns=[module.TIME_VAR_IN_RAW_DSET], filters=[(PARTITION_VAR, '==', last_year)])
+    return pd.to_datetime(dates[module.TIME_VAR_IN_RAW_DSET]).max().date()
+
+# %% ../../nbs/01_wrds/09_store.ipynb 15
+def refresh(module: ModuleType, # A `finsets.wrds` module, e.g. `crspm`
+            revision_months: int=0, # Number of months before the high-water mark that are downloaded again
+            end_date: str=None, # End date in MM/DD/YYYY format. If None, downloads up to today
+            ) -> pd.DataFrame:
+    "Downloads data newer than the local dataset of `module` holds (plus a trailing revision window), merges it into the local dataset and returns it"
+
+    wrds_api.validate_dates([end_date])
+    meta = read_meta(module)
+    if meta is None: raise FileNotFoundError(f"No local data stored for {module.__name__}")
+
+    start = (pd.Timestamp(high_water_mark(module)) - pd.DateOffset(months=revision_months)).date()
+    if revision_months == 0: start += datetime.timedelta(days=1)
+    end = _as_date(end_date) if end_date else datetime.date.today()
+    delta = _fetch(module, meta['vars'], start, end, meta['kwargs'])
+
+    keys = [module.ENTITY_ID_IN_RAW_DSET, module.TIME_VAR_IN_RAW_DSET]
+    stored = pd.read_parquet(dataset_path(module), filters=[(PARTITION_VAR, '>=', start.year)],
+                             dtype_backend='numpy_nullable').drop(columns=PARTITION_VAR)
+    # The delta replaces everything stored in its date range, including rows that WRDS has since deleted or re-keyed
+    dates = pd.to_datetime(stored[module.TIME_VAR_IN_RAW_DSET])
+    stored = stored[(dates < pd.Timestamp(start)) | (dates > pd.Timestamp(end))]
+    save(module, wrds_api.concat([stored, delta]).sort_values(keys, kind='stable'))
+
+    meta['end_date'] = max(end, _as_date(meta['end_date'])).strftime('%m/%d/%Y')
+    _write_meta(module, meta)
+    return delta
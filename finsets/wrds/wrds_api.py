@@ -2,41 +2,494 @@
 
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../../nbs/01_wrds/00_wrds_api.ipynb.
 
-# %% auto 0
-__all__ = ['Connection', 'download', 'validate_dates']
-
 # %% ../../nbs/01_wrds/00_wrds_api.ipynb 2
-from typing import Sequence, List
+from __future__ import annotations
+from typing import Sequence, List, Iterator, Tuple, Callable
 import os 
+import json
+import hashlib
+import re
+import time
+import atexit
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd 
+from pandas.api.types import union_categoricals
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import psycopg2
 import wrds 
 from datetime import datetime
 
+from .. import cache_tools
+
+# %% auto 0
+__all__ = ['POOL', 'RAW_SQL_CHUNKSIZE', 'PG_ARROW_TYPES', 'SCHEMA_TTL', 'QUERY_CACHE_MAX_BYTES', 'QUERY_TTL', 'Connection',
+           'ConnectionPool', 'connection', 'download', 'stream', 'copy_query', 'date_shards', 'download_sharded',
+           'describe_table', 'clear_schema_cache', 'query_key', 'cached_query', 'clear_query_cache', 'dtype_plan',
+           'apply_dtypes', 'concat', 'categorical', 'pyarrow_backed', 'backend_like', 'to_arrow', 'validate_dates']
+
 # %% ../../nbs/01_wrds/00_wrds_api.ipynb 3
 def Connection(): 
+    # WRDS_HOSTNAME, WRDS_PORT and WRDS_DBNAME point `finsets` to another Postgres server, e.g. a local stand-in for WRDS
+    server = {}
+    connect_args = dict(wrds.sql.WRDS_CONNECT_ARGS) # SSL and other settings of the `wrds` package, which we only add to
+    hostname = os.getenv("WRDS_HOSTNAME")
+    if hostname is not None:
+        # a path is the directory of a Unix socket, which `psycopg2` only takes as the `host` connect arg
+        server['wrds_hostname'] = 'localhost' if hostname.startswith('/') else hostname
+        if hostname.startswith('/'): connect_args['host'] = hostname
+    # e.g. 'disable' for a local server without SSL (connections through Unix sockets never use SSL)
+    if os.getenv("WRDS_SSLMODE") is not None: connect_args['sslmode'] = os.getenv("WRDS_SSLMODE")
+    server['wrds_connect_args'] = connect_args
+    if os.getenv("WRDS_PORT") is not None: server['wrds_port'] = int(os.getenv("WRDS_PORT"))
+    if os.getenv("WRDS_DBNAME") is not None: server['wrds_dbname'] = os.getenv("WRDS_DBNAME")
+
     return wrds.Connection(
         wrds_username=os.getenv("WRDS_USERNAME"), 
         wrds_password=os.getenv("WRDS_PASSWORD"),
         dtype_backend = "pyarrow",
+        **server,
         )
 
-# %% ../../nbs/01_wrds/00_wrds_api.ipynb 4
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 6
+class ConnectionPool:
+    "Thread-safe pool of open WRDS connections that are reused across queries"
+
+    def __init__(self,
+                 max_size: int=4, # Maximum number of connections that can be open at the same time
+                 idle_timeout: float=300, # Idle connections older than this (in seconds) are closed
+                 ):
+        self.max_size, self.idle_timeout = max_size, idle_timeout
+        self._idle = [] # List of (connection, time it was returned to the pool)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    @staticmethod
+    def _close(db):
+        try: db.close()
+        except Exception: pass
+
+    @staticmethod
+    def _is_healthy(db) -> bool:
+        try:
+            db.connection.exec_driver_sql('SELECT 1')
+            return True
+        except Exception:
+            return False
+
+    def _pop_idle(self):
+        "Returns the most recently used idle connection that has not timed out (closes the ones that have)"
+        with self._lock:
+            now = time.monotonic()
+            expired = [db for db, since in self._idle if now - since > self.idle_timeout]
+            self._idle = [(db, since) for db, since in self._idle if now - since <= self.idle_timeout]
+            db = self._idle.pop()[0] if self._idle else None
+        for old in expired: self._close(old)
+        return db
+
+    def acquire(self):
+        "Returns a healthy connection from the pool or a new one. Blocks if `max_size` connections are in use."
+        self._slots.acquire()
+        try:
+            db = self._pop_idle()
+            while db is not None:
+                if self._is_healthy(db): return db
+                self._close(db)
+                db = self._pop_idle()
+            return Connection()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, db, 
+                discard: bool=False, # If True, closes `db` instead of returning it to the pool
+                ):
+        "Returns `db` to the pool"
+        try:
+            if discard: self._close(db)
+            else:
+                with self._lock: self._idle.append((db, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        "Closes all idle connections"
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for db, _ in idle: self._close(db)
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 7
+POOL = ConnectionPool()
+atexit.register(lambda: POOL.close_all())
+
+@contextmanager
+def connection():
+    "Borrows a connection from `POOL` and returns it when done (connections that raised an error are closed instead)"
+
+    db = POOL.acquire()
+    ok = False
+    try:
+        yield db
+        ok = True
+    except GeneratorExit: # a generator that holds the connection (e.g. `stream`) was closed before it was exhausted
+        ok = True
+        raise
+    finally:
+        POOL.release(db, discard=not ok)
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 10
+RAW_SQL_CHUNKSIZE = 500_000 # Rows decoded at a time by `raw_sql`, each converted to the planned dtypes before the next one is decoded
+
+def _raw_sql(db, sql_string: str, params: Sequence=None, dtypes: dict=None, dtype_backend: str='numpy_nullable') -> pd.DataFrame:
+    "Results of `sql_string` on `db`, decoded by `raw_sql` in chunks of `RAW_SQL_CHUNKSIZE` rows that are converted to `dtypes` one at a time"
+    chunks = db.raw_sql(sql=sql_string, params=params, chunksize=RAW_SQL_CHUNKSIZE, return_iter=True, dtype_backend=dtype_backend)
+    return concat(apply_dtypes(chunk, dtypes, dtype_backend) for chunk in chunks)
+
 def download(sql_string: str=None,
-             params: Sequence=None # Params cited in the `sql_string`
-             ) -> pd.DataFrame:
+             params: Sequence=None, # Params cited in the `sql_string`
+             chunksize: int=None, # If not None, returns an iterator of DataFrames with `chunksize` rows each (see `stream`)
+             use_cache: bool=False, # If True, reuses the stored result of an identical earlier query (see `cached_query`). Ignored if `chunksize` is given
+             use_copy: bool=False, # If True, downloads through Postgres `COPY` (see `copy_query`). Ignored if `chunksize` is given
+             dtypes: dict=None, # Column name -> dtype to decode the results into (see `dtype_plan`)
+             dtype_backend: str='numpy_nullable', # 'pyarrow' for columns backed by pyarrow arrays (see `pyarrow_backed`)
+             ) -> pd.DataFrame|Iterator[pd.DataFrame]:
     """Downloads data from WRDS using the given PostgreSQL `sql_string`"""
 
+    if chunksize is not None: return stream(sql_string, params=params, chunksize=chunksize, dtypes=dtypes, dtype_backend=dtype_backend)
+    if use_cache: return cached_query(sql_string, params=params, use_copy=use_copy, dtypes=dtypes, dtype_backend=dtype_backend)
+    if use_copy: return copy_query(sql_string, params=params, dtypes=dtypes, dtype_backend=dtype_backend)
+
+    with connection() as db:
+        return _raw_sql(db, sql_string, params, dtypes, dtype_backend)
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 13
+def stream(sql_string: str=None,
+           params: Sequence=None, # Params cited in the `sql_string`
+           chunksize: int=500_000, # Number of rows in each yielded DataFrame
+           dtypes: dict=None, # Column name -> dtype that each chunk is converted to (see `dtype_plan`)
+           dtype_backend: str='numpy_nullable', # 'pyarrow' for columns backed by pyarrow arrays (see `pyarrow_backed`)
+           ) -> Iterator[pd.DataFrame]:
+    """Yields the results of `sql_string` in DataFrames of `chunksize` rows, fetched from WRDS with a server-side cursor.
+    The stream holds a connection from `POOL` until it is exhausted or closed (`close()`), so code that needs another connection
+    while it consumes a stream (e.g. to download the CCM links) should get what it needs before the stream starts."""
+
+    with connection() as db:
+        # Named (server-side) cursors need a transaction, so we can not use the AUTOCOMMIT level set by `wrds`
+        db.connection.rollback() # ends any transaction left open on this connection (e.g. by `wrds` loading the library list)
+        db.connection.execution_options(isolation_level='READ COMMITTED', stream_results=True, max_row_buffer=chunksize)
+        try:
+            for chunk in db.raw_sql(sql=sql_string, params=params, chunksize=chunksize, return_iter=True, dtype_backend=dtype_backend):
+                yield apply_dtypes(chunk, dtypes, dtype_backend)
+        finally:
+            # Restore the connection to its original state before it goes back to the pool
+            db.connection.rollback()
+            db.connection.execution_options(isolation_level='AUTOCOMMIT', stream_results=False)
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 16
+PG_ARROW_TYPES = {16: pa.bool_(), 20: pa.int64(), 21: pa.int16(), 23: pa.int32(), 
+                  700: pa.float32(), 701: pa.float64(), 1700: pa.float64(),
+                  1082: pa.date32(), 1114: pa.timestamp('us')} # Postgres type OID -> Arrow type
+
+_NULLABLE_DTYPES = {pa.bool_(): pd.BooleanDtype(), pa.int16(): pd.Int16Dtype(), pa.int32(): pd.Int32Dtype(), 
+                    pa.int64(): pd.Int64Dtype(), pa.float32(): pd.Float32Dtype(), pa.float64(): pd.Float64Dtype(), 
+                    pa.string(): pd.StringDtype()}
+
+def _pyarrow_dtype(arrow_type: pa.DataType):
+    "pandas dtype of Arrow columns with `dtype_backend='pyarrow'`: dictionaries become categoricals, all else `pd.ArrowDtype`"
+    return None if pa.types.is_dictionary(arrow_type) else pd.ArrowDtype(arrow_type)
+
+def _types_mapper(dtype_backend: str) -> Callable:
+    return _pyarrow_dtype if dtype_backend == 'pyarrow' else _NULLABLE_DTYPES.get
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 17
+def _read_copy(cur, query: str, convert_options: pa_csv.ConvertOptions) -> pa.Table:
+    "Results of `query` exported by `COPY ... TO STDOUT` into a pipe (from another thread) and parsed by `pyarrow` block by block, as they arrive"
+
+    read_fd, write_fd = os.pipe()
+    errors = []
+    def _copy():
+        try:
+            with open(write_fd, 'wb') as pipe: cur.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)", pipe)
+        except BaseException as e: errors.append(e)
+
+    thread = threading.Thread(target=_copy, daemon=True)
+    thread.start()
     try:
-        db = Connection()
-        df = db.raw_sql(sql=sql_string, params=params)
-    except Exception as err:
-        raise err 
+        with open(read_fd, 'rb') as pipe: return pa_csv.open_csv(pipe, convert_options=convert_options).read_all()
     finally:
-        db.close()
+        thread.join() # closing the pipe above stops the export if parsing failed
+        # An export that failed (even halfway through) raises its error instead of returning what was parsed
+        if errors and not isinstance(errors[0], BrokenPipeError): raise errors[0]
+
+def copy_query(sql_string: str,
+               params: Sequence=None, # Params cited in the `sql_string`
+               dtypes: dict=None, # Column name -> dtype to decode the results into (see `dtype_plan`)
+               dtype_backend: str='numpy_nullable', # 'pyarrow' for columns backed by pyarrow arrays (see `pyarrow_backed`)
+               ) -> pd.DataFrame:
+    "Downloads the results of `sql_string` through Postgres `COPY ... TO STDOUT`, parsed with `pyarrow`. Falls back on `raw_sql` if `COPY` fails."
+
+    with connection() as db:
+        try:
+            with db.connection.connection.cursor() as cur:
+                query = cur.mogrify(sql_string, params).decode()
+                cur.execute(f"SELECT * FROM ({query}) AS q LIMIT 0")
+                column_types = {c.name: PG_ARROW_TYPES.get(c.type_code, pa.string()) for c in cur.description}
+                column_types.update(_decode_types(dtypes, column_types))
+                table = _read_copy(cur, query, pa_csv.ConvertOptions(
+                    column_types=column_types, strings_can_be_null=True, quoted_strings_can_be_null=False,
+                    true_values=['t'], false_values=['f']))
+        except psycopg2.Error:
+            db.connection.rollback()
+            return _raw_sql(db, sql_string, params, dtypes, dtype_backend)
+
+    return apply_dtypes(table.to_pandas(types_mapper=_types_mapper(dtype_backend)), dtypes, dtype_backend)
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 20
+def date_shards(start_date: str, # Start date in MM/DD/YYYY format
+                end_date: str=None, # End date in MM/DD/YYYY format; if None, uses today's date
+                freq: str='Y', # 'Y' for yearly shards, 'M' for monthly shards
+                ) -> List[Tuple[str, str]]:
+    "Splits [`start_date`, `end_date`] into consecutive (start, end) date ranges, one per calendar year or month"
+
+    start = pd.to_datetime(start_date, format='%m/%d/%Y')
+    end = pd.Timestamp.today().normalize() if end_date is None else pd.to_datetime(end_date, format='%m/%d/%Y')
+
+    shards = []
+    for p in pd.period_range(start, end, freq=freq):
+        shard_start, shard_end = max(p.start_time, start), min(p.end_time.normalize(), end)
+        shards.append((shard_start.strftime('%m/%d/%Y'), shard_end.strftime('%m/%d/%Y')))
+    return shards
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 22
+def download_sharded(sql_string: str=None, # Must filter on both `%(start_date)s` and `%(end_date)s`
+                     params: dict=None, # Params cited in the `sql_string` (other than `start_date` and `end_date`)
+                     shards: List[Tuple[str, str]]=None, # (start_date, end_date) pairs, e.g. from `date_shards`
+                     max_workers: int=4, # Number of shards downloaded at the same time
+                     retries: int=2, # Number of times a failed shard is retried
+                     dtypes: dict=None, # Column name -> dtype to decode the results into (see `dtype_plan`)
+                     dtype_backend: str='numpy_nullable', # 'pyarrow' for columns backed by pyarrow arrays (see `pyarrow_backed`)
+                     ) -> pd.DataFrame:
+    """Downloads `sql_string` once per date shard, concurrently, and stacks the results in the order of `shards`"""
 
+    def _download_shard(shard):
+        shard_params = {**(params or {}), 'start_date': shard[0], 'end_date': shard[1]}
+        for attempt in range(retries + 1):
+            try:
+                return download(sql_string, params=shard_params, dtypes=dtypes, dtype_backend=dtype_backend)
+            except Exception:
+                if attempt == retries: raise
+                time.sleep(2 ** attempt)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        dfs = list(executor.map(_download_shard, shards))
+
+    return concat(dfs)
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 24
+SCHEMA_TTL = 7 * 24 * 3600 # Seconds after which cached table descriptions are downloaded again
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 25
+def describe_table(library: str, # WRDS library (Postgres schema), e.g. 'crsp'
+                   table: str, # WRDS table, e.g. 'msf'
+                   refresh: bool=False, # If True, ignores the cached description and downloads it again
+                   ttl: float=None, # Maximum age (in seconds) of the cached description; if None, uses `SCHEMA_TTL`
+                   ) -> pd.DataFrame:
+    """Names, types and nullability of all the columns in WRDS `{library}.{table}`. Cached on disk."""
+
+    path = cache_tools.cache_path('wrds_schema', f'{library}.{table}.json')
+    if not refresh and cache_tools.is_fresh(path, SCHEMA_TTL if ttl is None else ttl):
+        with open(path) as f: return pd.DataFrame(json.load(f))
+
+    with connection() as db:
+        columns = db.insp.get_columns(table, schema=library)
+    out = pd.DataFrame({'name': [c['name'] for c in columns], 
+                        'type': [str(c['type']) for c in columns], 
+                        'nullable': [c['nullable'] for c in columns]})
+
+    # written to a temporary file first, so that concurrent readers never see a partly written description
+    tmp_path = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(tmp_path, 'w') as f: json.dump(out.to_dict(orient='list'), f)
+    os.replace(tmp_path, path)
+    return out
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 27
+def clear_schema_cache():
+    "Deletes all cached table descriptions, so they are downloaded again the next time they are needed"
+    cache_tools.clear_cache('wrds_schema')
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 29
+QUERY_CACHE_MAX_BYTES = 2 * 1024**3 # Total size of stored query results above which the least recently used are deleted
+QUERY_TTL = 7 * 24 * 3600 # Seconds after which stored query results are downloaded again
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 30
+def query_key(sql_string: str,
+              params: Sequence=None, # Params cited in the `sql_string`
+              dtypes: dict=None, # Dtypes the results are decoded into (see `dtype_plan`)
+              ) -> str:
+    "Hash that identifies the result of running `sql_string` with `params`"
+
+    # Whitespace is only normalized outside of quotes, so that queries that differ in their string literals get different keys
+    parts = re.split(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""", sql_string)
+    sql = ''.join(part if i % 2 else re.sub(r'\s+', ' ', part) for i, part in enumerate(parts)).strip()
+    normalized = {'sql': sql, 'params': params}
+    if dtypes: normalized['dtypes'] = dtypes
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True, default=str).encode()).hexdigest()
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 32
+def _evict_query_results(max_bytes: int):
+    "Deletes the least recently used query results until their total size is at most `max_bytes`. The most recent one is always kept, however large."
+
+    paths = sorted(Path(cache_tools.CACHE_DIR, 'wrds_queries').glob('*.parquet'),
+                   key=lambda p: p.stat().st_atime, reverse=True)
+    total = 0
+    for i, path in enumerate(paths):
+        total += path.stat().st_size
+        if total > max_bytes and i > 0: path.unlink()
+
+def cached_query(sql_string: str,
+                 params: Sequence=None, # Params cited in the `sql_string`
+                 use_copy: bool=False, # If True, downloads through Postgres `COPY` (see `copy_query`)
+                 dtypes: dict=None, # Column name -> dtype to decode the results into (see `dtype_plan`)
+                 dtype_backend: str='numpy_nullable', # 'pyarrow' for columns backed by pyarrow arrays (see `pyarrow_backed`)
+                 ttl: float=None, # Maximum age (in seconds) of the stored result; if None, uses `QUERY_TTL`
+                 ) -> pd.DataFrame:
+    "Returns the stored result of `sql_string` with `params` if there is one that is fresh enough; otherwise downloads and stores it"
+
+    path = cache_tools.cache_path('wrds_queries', f'{query_key(sql_string, params, dtypes)}.parquet')
+    if cache_tools.is_fresh(path, QUERY_TTL if ttl is None else ttl):
+        os.utime(path, (time.time(), path.stat().st_mtime)) # marks it as recently used; its age is still that of the download
+        if dtype_backend == 'pyarrow': return apply_dtypes(pq.read_table(path).to_pandas(types_mapper=_pyarrow_dtype), dtypes, dtype_backend)
+        return apply_dtypes(pd.read_parquet(path, dtype_backend='numpy_nullable'), dtypes)
+
+    if use_copy: df = copy_query(sql_string, params=params, dtypes=dtypes, dtype_backend=dtype_backend)
+    else:
+        with connection() as db:
+            df = _raw_sql(db, sql_string, params, dtypes, dtype_backend)
+
+    tmp_path = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    _evict_query_results(QUERY_CACHE_MAX_BYTES)
     return df
 
-# %% ../../nbs/01_wrds/00_wrds_api.ipynb 13
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 33
+def clear_query_cache():
+    "Deletes all stored query results"
+    cache_tools.clear_cache('wrds_queries')
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 36
+def dtype_plan(dtypes: dict, # Column name -> dtype, e.g. 'category', 'Int32', 'Float32'
+               tables: List[Tuple[str, str]], # (library, table) pairs that the columns are downloaded from
+               ) -> dict:
+    "Entries of `dtypes` that apply to columns of `tables`, based on their WRDS types (numeric dtypes only apply to numeric columns)"
+
+    types = pd.concat([describe_table(library, table) for library, table in tables]).drop_duplicates('name').set_index('name')['type']
+    numeric = types.str.upper().str.contains('INT|DOUBLE|NUMERIC|REAL|FLOAT|DECIMAL')
+    return {col: dtype for col, dtype in dtypes.items() 
+            if col in types.index and (dtype in ('category', 'string') or numeric[col])}
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 37
+_ARROW_DTYPES = {'Int16': pa.int16(), 'Int32': pa.int32(), 'Int64': pa.int64(), 'Float32': pa.float32(), 'Float64': pa.float64(), 
+                 'string': pa.string()}
+
+def _decode_types(dtypes: dict, column_types: dict) -> dict:
+    "Arrow types that parse the columns of a `COPY` export (with Arrow types `column_types`) straight into `dtypes`"
+
+    out = {}
+    for col, dtype in (dtypes or {}).items():
+        if col not in column_types: continue
+        if dtype == 'category': 
+            if column_types[col] == pa.string(): out[col] = pa.dictionary(pa.int32(), pa.string())
+        elif dtype in _ARROW_DTYPES: out[col] = _ARROW_DTYPES[dtype]
+    return out
+
+def apply_dtypes(df: pd.DataFrame, 
+                 dtypes: dict=None, # Column name -> dtype; columns that are not in `df` are ignored
+                 dtype_backend: str='numpy_nullable', # If 'pyarrow', numeric `dtypes` are pyarrow-backed and all other columns are converted with `pyarrow_backed`
+                 ) -> pd.DataFrame:
+    "Converts the columns of `df` (in place) to `dtypes` and returns `df`"
+
+    pyarrow = dtype_backend == 'pyarrow'
+    for col, dtype in (dtypes or {}).items():
+        if pyarrow and dtype in _ARROW_DTYPES: dtype = pd.ArrowDtype(_ARROW_DTYPES[dtype])
+        if col in df.columns and df[col].dtype != dtype:
+            df[col] = df[col].astype(dtype)
+    return pyarrow_backed(df) if pyarrow else df
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 38
+def concat(dfs: List[pd.DataFrame]) -> pd.DataFrame:
+    "Same as `pd.concat(dfs, ignore_index=True)`, but categorical columns stay categorical, with the union of the categories in `dfs`"
+
+    dfs = list(dfs)
+    cat_cols = dict.fromkeys(c for df in dfs for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype))
+    for col in cat_cols:
+        parts = [df[col] for df in dfs if col in df.columns]
+        if not all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts): continue
+        categories = union_categoricals([pd.Categorical(part.cat.categories) for part in parts]).categories
+        dfs = [df.assign(**{col: df[col].cat.set_categories(categories)}) if col in df.columns else df for df in dfs]
+    return pd.concat(dfs, ignore_index=True)
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 41
+def categorical(s: pd.Series,
+                convert: Callable=None, # Applied to a Series with the distinct values of `s`. Default: `lambda x: x.astype('string')`
+                ) -> pd.Series:
+    "Same as `convert(s).astype('category')`, but `convert` is only applied to the categories of `s` (or its distinct values, if `s` is not categorical)"
+
+    if isinstance(s.dtype, pd.CategoricalDtype): 
+        s = s.cat.remove_unused_categories()
+        codes, uniques = s.cat.codes.to_numpy(), s.cat.categories
+    elif isinstance(s.dtype, pd.ArrowDtype): # factorized by Arrow, without going through numpy objects
+        encoded = pc.dictionary_encode(pa.array(s.array))
+        codes = pc.fill_null(encoded.indices, -1).to_numpy()
+        uniques = pd.Series(encoded.dictionary.to_pandas(types_mapper=pd.ArrowDtype))
+    else: codes, uniques = pd.factorize(s)
+    values = pd.Series(uniques)
+    values = values.astype('string') if convert is None else convert(values)
+
+    # Converted values can coincide (or be missing), so they are factorized again
+    value_codes, categories = pd.factorize(values, sort=True)
+    codes = np.append(value_codes, -1)[codes]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=categories), index=s.index, name=s.name)
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 45
+def pyarrow_backed(df: pd.DataFrame) -> pd.DataFrame:
+    "Copy of `df` whose columns are backed by pyarrow arrays (`pd.ArrowDtype`), except for categoricals and periods. NaN values become missing values."
+
+    df = df.copy(deep=False)
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, (pd.CategoricalDtype, pd.PeriodDtype)): continue # no Arrow equivalent for periods
+        if not isinstance(dtype, pd.ArrowDtype):
+            df[col] = pd.arrays.ArrowExtensionArray(pa.array(df[col], from_pandas=True))
+        elif pa.types.is_floating(dtype.pyarrow_dtype): # Arrow arithmetic can produce NaN values (e.g. 0/0)
+            values = pa.array(df[col].array)
+            nan = pc.is_nan(values)
+            if pc.any(nan).as_py(): df[col] = pd.arrays.ArrowExtensionArray(pc.if_else(nan, pa.scalar(None, values.type), values))
+    return df
+
+def backend_like(out: pd.DataFrame, 
+                 df: pd.DataFrame, # DataFrame that `out` was computed from
+                 ) -> pd.DataFrame:
+    "`out` with pyarrow-backed columns (see `pyarrow_backed`) if `df` has any, otherwise `out` itself"
+    return pyarrow_backed(out) if any(isinstance(dtype, pd.ArrowDtype) for dtype in df.dtypes) else out
+
+def to_arrow(df: pd.DataFrame,
+             index: bool=True, # If True, the index levels become the first columns of the table
+             ) -> pa.Table:
+    "`df` as a `pyarrow.Table` (e.g. for `polars.from_arrow` or DuckDB). Pyarrow-backed columns are not copied; period columns become the timestamps of their start."
+
+    df = df.reset_index() if index else df.copy(deep=False)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.PeriodDtype): df[col] = df[col].dt.start_time
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+# %% ../../nbs/01_wrds/00_wrds_api.ipynb 54
 def validate_dates(date_strings: List[str]) -> bool:
     for date in date_strings:
         if date is not None: